@@ -0,0 +1,172 @@
+"""
+多进程活动跟踪
+每个检测周期用一份窗口快照和一份音频会话表，一次判断所有候选进程（前台、窗口可见、正在播放声音）是否在使用，
+各进程的去抖状态跨周期保留，前台和后台（可见的侧边窗口、后台音乐）的时长分开累计
+"""
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from audio_sessions import AUDIBLE_THRESHOLD, get_audio_sessions
+from enhanced_monitor import EnhancedMonitor
+from process_cache import get_process_cache
+from window_snapshot import get_snapshot_provider
+
+VISIBLE_THRESHOLD = 0.3   # 窗口可见比例达到该值视为在使用
+MAX_TRACKED = 32          # 最多同时跟踪的进程数
+MAX_ELAPSED = 60          # 单个周期最多计入的秒数（休眠唤醒后不补算）
+
+FOREGROUND = "foreground"
+BACKGROUND = "background"
+
+
+def debounce_for(process_name):
+    """按应用类型取去抖参数"""
+    try:
+        from debounce_config import get_debounce_config, determine_app_type
+        config = get_debounce_config(determine_app_type(process_name or ""))
+        return config["start_req"], config["stop_req"]
+    except ImportError:
+        return 2, 3
+
+
+class ActivityTracker:
+    """
+    跟踪一组候选进程的活动状态
+    - 候选进程：前台进程、有可见窗口（比例达到 v_thresh）的进程、正在播放声音的进程
+    - 每个周期的开销与可见窗口数和候选数成正比，与跟踪的进程数 × 枚举次数无关
+    - 进程按 (pid, 创建时间) 区分，退出后自动移除；超过 max_tracked 时淘汰最久未活动的
+    - drain() 取出累计的整秒数 {(进程key, 模式): 秒数}，不足一秒的部分留到下次
+    """
+
+    def __init__(self, snapshots=None, audio=None, processes=None, v_thresh=VISIBLE_THRESHOLD,
+                 max_tracked=MAX_TRACKED, max_elapsed=MAX_ELAPSED):
+        self.snapshots = snapshots
+        self.audio = audio
+        self.processes = processes or get_process_cache()
+        self.v_thresh = v_thresh
+        self.max_tracked = max_tracked
+        self.max_elapsed = max_elapsed
+        self._monitors = OrderedDict()   # (pid, create_time) -> EnhancedMonitor，按最近活动排序
+        self._usage = defaultdict(float)
+        self._last_tick = None
+        self._lock = threading.Lock()
+        self.stats = {"ticks": 0, "candidates": 0, "evicted": 0}
+        self.processes.on_exit(self.forget)
+
+    def _monitor(self, key, name):
+        monitor = self._monitors.get(key)
+        if monitor is None:
+            start_req, stop_req = debounce_for(name)
+            monitor = EnhancedMonitor(key[0], v_thresh=self.v_thresh, start_req=start_req, stop_req=stop_req,
+                                      snapshots=self.snapshots, audio=self.audio)
+            self._monitors[key] = monitor
+        return monitor
+
+    def monitor(self, pid):
+        """进程的监控器（去抖状态跨周期保留），进程不存在时返回 None"""
+        info = self.processes.get(pid)
+        if info is None:
+            return None
+        with self._lock:
+            monitor = self._monitor(info["key"], info["name"])
+            self._evict()
+            return monitor
+
+    def _evict(self):
+        while len(self._monitors) > self.max_tracked:
+            self._monitors.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def forget(self, key):
+        """进程退出时移除其状态"""
+        with self._lock:
+            self._monitors.pop(key, None)
+            # 已退出进程不足一秒的余数不会再凑满，一并清理
+            for mode in (FOREGROUND, BACKGROUND):
+                if self._usage.get((key, mode), 1) < 1:
+                    del self._usage[(key, mode)]
+
+    def tick(self, now=None, idle=False):
+        """
+        执行一个周期的检测，返回 {(pid, create_time): "foreground"/"background"}（正在计时的进程）
+        挂机时（idle=True）窗口可见不再算作使用，只有正在播放声音的进程继续计时
+        """
+        now = time.monotonic() if now is None else now
+        snapshot = (self.snapshots or get_snapshot_provider()).current()
+        peaks = (self.audio or get_audio_sessions()).peaks()
+        foreground = snapshot.foreground_pid
+
+        # 候选进程按优先级排序：前台、可见比例、音量
+        scores = {} if idle else {pid: (1, ratio) for pid, ratio in snapshot.visible_pids(self.v_thresh).items()}
+        for pid, peak in peaks.items():
+            if peak > AUDIBLE_THRESHOLD and pid not in scores:
+                scores[pid] = (0, peak)
+        if foreground is not None and not idle:
+            scores[foreground] = (2, 1.0)
+        candidates = sorted(scores, key=scores.get, reverse=True)[:self.max_tracked]
+        self.stats["ticks"] += 1
+        self.stats["candidates"] += len(candidates)
+
+        active_keys = {}
+        for pid in candidates:
+            info = self.processes.get(pid)
+            if info is not None:
+                active_keys[info["key"]] = info["name"]
+
+        elapsed = 0.0
+        if self._last_tick is not None:
+            elapsed = min(max(0.0, now - self._last_tick), self.max_elapsed)
+        self._last_tick = now
+
+        running = {}
+        with self._lock:
+            for key, name in active_keys.items():
+                self._monitor(key, name)
+                self._monitors.move_to_end(key)
+            for key, monitor in list(self._monitors.items()):
+                # 挂机时不等去抖结束，不发声的进程立即停止计时
+                if monitor.update(key in active_keys) and (not idle or key in active_keys):
+                    mode = FOREGROUND if key[0] == foreground else BACKGROUND
+                    running[key] = mode
+                    self._usage[(key, mode)] += elapsed
+                elif key not in active_keys:
+                    # 已停止计时且不再是候选，不必继续跟踪
+                    del self._monitors[key]
+            self._evict()
+        return running
+
+    def drain(self):
+        """
+        取出累计的整秒时长 {(进程key, 模式): 秒数}
+        不足一秒的余数按进程保留到下次，每个周期都取出时短周期的时长也不会因取整丢失
+        """
+        usage = {}
+        with self._lock:
+            remainders = defaultdict(float)
+            for k, v in self._usage.items():
+                whole = int(v)
+                if whole > 0:
+                    usage[k] = whole
+                if v - whole > 0:
+                    remainders[k] = v - whole
+            self._usage = remainders
+        return usage
+
+    def tracked(self):
+        with self._lock:
+            return list(self._monitors)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_activity_tracker():
+    """进程内共享的活动跟踪器"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = ActivityTracker()
+        return _tracker
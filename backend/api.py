@@ -1,9 +1,16 @@
 from fastapi import APIRouter
 from typing import Any, Dict
 from monitor import get_foreground_app
-from db_utils import get_recent_logs
+from datetime import datetime, timedelta
+from db_utils import get_recent_logs, get_usage_totals, get_background_totals
 from routes.apps import router as apps_router
 from logger import log_to_file
+from cache import get_stats as get_cache_stats
+from identity_warmup import get_warmup
+from sampling_scheduler import get_stats as get_sampling_stats
+
+# 统计周期对应的天数
+STATS_PERIOD_DAYS = {"day": 1, "week": 7, "month": 30}
 
 # 创建主路由器
 router = APIRouter()
@@ -85,15 +92,26 @@ def stats(period: str = "day"):
     """
     返回统计数据：
     /api/stats?period=day
+    background_time / background_apps 为后台活动时长（总计 / 按应用），不计入 work_time
     """
     try:
-        # 暂只支持当日统计
-        # 这里提供一个简单的统计实现
+        # 从每日汇总表读取，开销与应用数 × 天数相关，与原始记录数无关
+        days = STATS_PERIOD_DAYS.get(period, 1)
+        today = datetime.now()
+        start_day = (today - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        end_day = today.strftime("%Y-%m-%d")
+        totals = get_usage_totals(start_day, end_day)
+        # 后台活动（可见的非前台窗口、后台播放声音）与前台使用时长分开统计
+        background = get_background_totals(start_day, end_day)
         stats_data = {
             "period": period,
-            "work_time": 0,
+            "work_time": totals["seconds"],
             "rest_time": 0,
-            "blocked_apps": 0
+            "blocked_apps": 0,
+            "sessions": totals["sessions"],
+            "apps": totals["apps"],
+            "background_time": sum(background.values()),
+            "background_apps": background
         }
         return unified_response(
             success=True,
@@ -105,4 +123,37 @@ def stats(period: str = "day"):
             success=False,
             message="获取统计数据失败",
             error=str(e)
-        )
\ No newline at end of file
+        )
+
+@router.get("/cache_stats")
+def cache_stats():
+    """
+    返回各缓存的命中、未命中、淘汰等统计
+    """
+    return unified_response(
+        success=True,
+        data=get_cache_stats(),
+        message="成功获取缓存统计"
+    )
+
+@router.get("/sampling_stats")
+def sampling_stats():
+    """
+    返回各监控循环的采样次数、当前间隔、截止事件延迟和采样 CPU 耗时
+    """
+    return unified_response(
+        success=True,
+        data=get_sampling_stats(),
+        message="成功获取采样统计"
+    )
+
+@router.get("/identity_warmup")
+def identity_warmup_status():
+    """
+    返回识别缓存预热进度
+    """
+    return unified_response(
+        success=True,
+        data=get_warmup().progress(),
+        message="成功获取预热进度"
+    )
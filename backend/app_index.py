@@ -0,0 +1,158 @@
+import re
+from collections import deque
+
+# 参与子串匹配的最短模式长度，太短的名称容易误匹配
+MIN_PATTERN_LENGTH = 4
+# 参与分词匹配的最短词长
+MIN_TOKEN_LENGTH = 3
+# 不能单独代表一个应用的常见词
+STOP_TOKENS = frozenset({
+    "the", "and", "for", "inc", "ltd", "corp", "corporation", "software", "version", "update",
+    "setup", "installer", "runtime", "redistributable", "x64", "x86", "amd64", "bit", "edition",
+    "microsoft", "windows", "app", "tool", "tools", "client", "service",
+})
+# 未知安装位置
+UNKNOWN_LOCATIONS = frozenset({"", "unknown"})
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def process_stem(process_name):
+    """进程名去掉扩展名并小写：Chrome.exe -> chrome"""
+    name = (process_name or "").strip().lower()
+    if name.endswith(".exe"):
+        name = name[:-4]
+    return name
+
+
+def compact(text):
+    """只保留字母数字：7-Zip File Manager -> 7zipfilemanager"""
+    return "".join(_TOKEN_RE.findall((text or "").lower()))
+
+
+def tokens(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower())
+            if len(t) >= MIN_TOKEN_LENGTH and not t.isdigit() and t not in STOP_TOKENS]
+
+
+def normalize_dir(path):
+    """统一目录格式（与平台无关）：小写、正斜杠、去掉结尾斜杠"""
+    return (path or "").strip().strip('"').replace("\\", "/").rstrip("/").lower()
+
+
+class AhoCorasick:
+    """多模式子串匹配自动机，一次扫描找出文本中出现的所有模式，耗时与模式数量无关"""
+
+    def __init__(self, patterns):
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append(index)
+
+        # 按层（BFS）计算失败指针
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def find(self, text):
+        """返回文本中出现的所有模式"""
+        found = []
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for index in self._out[state]:
+                found.append(self.patterns[index])
+        return found
+
+    def __len__(self):
+        return len(self.patterns)
+
+
+def _rank(app):
+    """同一个键对应多个应用时的优先级：名称词数少、名称短的优先"""
+    return (len(tokens(app["name"])), len(app["name"]))
+
+
+class InstalledAppIndex:
+    """
+    已安装应用索引，按应用列表构建一次，查找耗时与已安装应用数量无关
+    匹配顺序（方向：用进程名/路径去找注册表中的应用）：
+    1. 可执行文件位于某应用的安装目录下
+    2. 进程名（去扩展名、只保留字母数字）与显示名称完全相同
+    3. 进程名与显示名称中的某个词相同（chrome.exe -> Google Chrome）
+    4. 显示名称或其中的词出现在进程名中（discordptb.exe -> Discord），取最长的匹配
+    """
+
+    def __init__(self, apps):
+        by_location = {}
+        by_name = {}
+        by_token = {}
+        for app in apps:
+            name = app.get("name")
+            if not name:
+                continue
+            location = normalize_dir(app.get("install_location"))
+            # 至少两级目录，避免 C:\Program Files 这类目录匹配所有程序
+            if location not in UNKNOWN_LOCATIONS and location.count("/") >= 2:
+                by_location.setdefault(location, []).append(app)
+            key = compact(name)
+            if key:
+                by_name.setdefault(key, []).append(app)
+            for token in set(tokens(name)):
+                by_token.setdefault(token, []).append(app)
+
+        pick = lambda groups: {k: min(v, key=_rank) for k, v in groups.items()}
+        self.by_location = pick(by_location)
+        self.by_name = pick(by_name)
+        self.by_token = pick(by_token)
+        self._substrings = {k: v for k, v in {**self.by_token, **self.by_name}.items()
+                            if len(k) >= MIN_PATTERN_LENGTH}
+        self._automaton = AhoCorasick(self._substrings)
+        self.size = len(apps)
+
+    def match(self, process_name, executable_path=None):
+        """查找进程对应的已安装应用，找不到时返回 None"""
+        if executable_path and self.by_location:
+            directory = normalize_dir(executable_path)
+            while "/" in directory:
+                directory = directory.rsplit("/", 1)[0]
+                app = self.by_location.get(directory)
+                if app is not None:
+                    return app
+
+        stem = process_stem(process_name)
+        key = compact(stem)
+        if not key:
+            return None
+        app = self.by_name.get(key) or self.by_token.get(key)
+        if app is not None:
+            return app
+
+        found = self._automaton.find(key)
+        if found:
+            return self._substrings[max(found, key=len)]
+        return None
+
+    def __len__(self):
+        return self.size
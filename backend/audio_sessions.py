@@ -0,0 +1,120 @@
+"""
+音频会话缓存
+每个刷新周期最多枚举一次音频会话（GetAllSessions + QueryInterface），得到 pid -> 音量表 的映射，
+同一周期内所有监控器的"进程是否在播放声音"判断都查这份结果（O(1)）
+COM 层可以替换，非 Windows 环境下用假数据源测试
+"""
+
+import threading
+import time
+
+from logger import log_to_file
+
+# pycaw for audio
+try:
+    from pycaw.pycaw import AudioUtilities, IAudioMeterInformation
+    PYCaw_AVAILABLE = True
+except Exception:
+    PYCaw_AVAILABLE = False
+
+REFRESH_INTERVAL = 1.0  # 会话表刷新间隔（秒）
+AUDIBLE_THRESHOLD = 0.001
+
+
+class PycawSessionSource:
+    """pycaw 音频会话数据源"""
+
+    def sessions(self):
+        """返回 [(pid, meter), ...]，meter.GetPeakValue() 为当前峰值"""
+        result = []
+        for session in AudioUtilities.GetAllSessions():
+            proc = session.Process
+            if not proc:
+                continue
+            try:
+                result.append((proc.pid, session._ctl.QueryInterface(IAudioMeterInformation)))
+            except Exception:
+                continue
+        return result
+
+
+class AudioSessionService:
+    """
+    按周期缓存的音频会话表
+    - 每 interval 秒最多枚举一次会话，并读取一次所有会话的峰值
+    - is_audible(pid) 查表，peaks() 一次返回所有进程的峰值（同一进程多个会话取最大值）
+    """
+
+    def __init__(self, source, interval=REFRESH_INTERVAL):
+        """
+        Args:
+            source: 会话数据源（sessions() -> [(pid, meter)]），None 表示无法检测音频
+        """
+        self.source = source
+        self.interval = interval
+        self._peaks = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self.stats = {"refreshes": 0, "reuses": 0, "errors": 0}
+
+    def peaks(self):
+        """所有有音频会话的进程的峰值 {pid: peak}"""
+        with self._lock:
+            now = time.monotonic()
+            if self._refreshed_at is not None and now - self._refreshed_at < self.interval:
+                self.stats["reuses"] += 1
+                return self._peaks
+            self._refreshed_at = now
+            self._peaks = self._read()
+            self.stats["refreshes"] += 1
+            return self._peaks
+
+    def _read(self):
+        if self.source is None:
+            return {}
+        try:
+            sessions = self.source.sessions()
+        except Exception as e:
+            self.stats["errors"] += 1
+            log_to_file(f"枚举音频会话失败: {str(e)}", "WARNING")
+            return {}
+        peaks = {}
+        for pid, meter in sessions:
+            try:
+                peak = meter.GetPeakValue() or 0.0
+            except Exception:
+                continue
+            if peak > peaks.get(pid, 0.0):
+                peaks[pid] = peak
+            else:
+                peaks.setdefault(pid, 0.0)
+        return peaks
+
+    def peak(self, pid):
+        return self.peaks().get(pid, 0.0)
+
+    def is_audible(self, pid, threshold=AUDIBLE_THRESHOLD):
+        """进程是否正在播放声音"""
+        return self.peak(pid) > threshold
+
+    def audible_pids(self, threshold=AUDIBLE_THRESHOLD):
+        """正在播放声音的所有进程，用于一次性归属后台播放"""
+        return {pid for pid, peak in self.peaks().items() if peak > threshold}
+
+    def invalidate(self):
+        """下次查询时重新枚举会话"""
+        with self._lock:
+            self._refreshed_at = None
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_audio_sessions():
+    """进程内共享的音频会话缓存（未安装 pycaw 时始终无声音）"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = AudioSessionService(PycawSessionSource() if PYCaw_AVAILABLE else None)
+        return _service
@@ -0,0 +1,406 @@
+"""
+进程内 Authenticode 签名校验
+解析证书表中的 PKCS#7 SignedData，核对 PE 映像哈希和签名者签名，
+并把签名者证书链验证到受信任的根证书，证书链受信任时才提取签名组织
+纯 Python 实现（cryptography），不依赖 PowerShell/WinVerifyTrust
+"""
+
+import hashlib
+import hmac
+import ssl
+import threading
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature, UnsupportedAlgorithm
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+import pe_metadata
+
+# 校验结果（Signed/Unsigned/Unknown 与原 PowerShell 检查的返回值保持一致）
+SIGNED = "Signed"
+UNSIGNED = "Unsigned"
+UNKNOWN = "Unknown"
+UNTRUSTED = "Untrusted"  # 签名完整，但证书链不能验证到受信任的根证书（如自签名）
+
+MAX_CHAIN_DEPTH = 8
+
+WIN_CERT_TYPE_PKCS_SIGNED_DATA = 0x0002
+
+OID_SIGNED_DATA = "1.2.840.113549.1.7.2"
+OID_SPC_INDIRECT_DATA = "1.3.6.1.4.1.311.2.1.4"
+OID_MESSAGE_DIGEST = "1.2.840.113549.1.9.4"
+
+# 摘要算法 OID -> (hashlib 名称, cryptography 哈希类)
+DIGEST_ALGORITHMS = {
+    "1.2.840.113549.2.5": ("md5", hashes.MD5),
+    "1.3.14.3.2.26": ("sha1", hashes.SHA1),
+    "2.16.840.1.101.3.4.2.1": ("sha256", hashes.SHA256),
+    "2.16.840.1.101.3.4.2.2": ("sha384", hashes.SHA384),
+    "2.16.840.1.101.3.4.2.3": ("sha512", hashes.SHA512),
+}
+
+TAG_INTEGER = 0x02
+TAG_OCTET_STRING = 0x04
+TAG_OID = 0x06
+TAG_SEQUENCE = 0x30
+TAG_SET = 0x31
+TAG_CONTEXT_0 = 0xA0
+TAG_CONTEXT_1 = 0xA1
+
+
+class AuthenticodeError(Exception):
+    """签名结构无法解析或使用了不支持的算法"""
+
+
+def _tlv(buf, offset, end):
+    """读取一个 DER TLV，返回 (tag, 起始偏移, 内容起始, 内容结束)"""
+    if offset + 2 > end:
+        raise AuthenticodeError("DER 数据被截断")
+    tag = buf[offset]
+    length = buf[offset + 1]
+    pos = offset + 2
+    if length & 0x80:
+        count = length & 0x7F
+        if count == 0 or count > 4:
+            raise AuthenticodeError("不支持的 DER 长度编码")
+        length = int.from_bytes(buf[pos:pos + count], "big")
+        pos += count
+    if pos + length > end:
+        raise AuthenticodeError("DER 长度超出范围")
+    return tag, offset, pos, pos + length
+
+
+def _expect(node, tag):
+    if node[0] != tag:
+        raise AuthenticodeError(f"期望 DER 标签 0x{tag:02x}，实际为 0x{node[0]:02x}")
+    return node
+
+
+def _children(buf, node):
+    _, _, pos, end = node
+    items = []
+    while pos < end:
+        item = _tlv(buf, pos, end)
+        items.append(item)
+        pos = item[3]
+    return items
+
+
+def _oid(buf, node):
+    _expect(node, TAG_OID)
+    data = buf[node[2]:node[3]]
+    if not data:
+        raise AuthenticodeError("空的 OID")
+    parts = [data[0] // 40, data[0] % 40]
+    value = 0
+    for byte in data[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return ".".join(str(p) for p in parts)
+
+
+def _raw(buf, node):
+    return bytes(buf[node[1]:node[3]])
+
+
+def _content(buf, node):
+    return bytes(buf[node[2]:node[3]])
+
+
+def _digest_algorithm(buf, algorithm_identifier):
+    oid = _oid(buf, _children(buf, _expect(algorithm_identifier, TAG_SEQUENCE))[0])
+    if oid not in DIGEST_ALGORITHMS:
+        raise AuthenticodeError(f"不支持的摘要算法 {oid}")
+    return DIGEST_ALGORITHMS[oid]
+
+
+def parse_signed_data(data):
+    """
+    解析 Authenticode 的 PKCS#7 SignedData
+    返回 dict：image_digest/image_algorithm（SpcIndirectDataContent 中的映像摘要）、
+    content（被签名的 SpcIndirectDataContent 内容）、certificates、signer
+    """
+    end = len(data)
+    content_info = _children(data, _expect(_tlv(data, 0, end), TAG_SEQUENCE))
+    if len(content_info) < 2 or _oid(data, content_info[0]) != OID_SIGNED_DATA:
+        raise AuthenticodeError("不是 PKCS#7 SignedData")
+    signed_data = _children(data, _expect(_children(data, _expect(content_info[1], TAG_CONTEXT_0))[0], TAG_SEQUENCE))
+    if len(signed_data) < 4:
+        raise AuthenticodeError("SignedData 结构不完整")
+
+    # encapContentInfo: SpcIndirectDataContent
+    encap = _children(data, _expect(signed_data[2], TAG_SEQUENCE))
+    if len(encap) < 2 or _oid(data, encap[0]) != OID_SPC_INDIRECT_DATA:
+        raise AuthenticodeError("不是 Authenticode 签名（缺少 SpcIndirectDataContent）")
+    spc = _expect(_children(data, _expect(encap[1], TAG_CONTEXT_0))[0], TAG_SEQUENCE)
+    spc_items = _children(data, spc)
+    if len(spc_items) < 2:
+        raise AuthenticodeError("SpcIndirectDataContent 结构不完整")
+    digest_info = _children(data, _expect(spc_items[1], TAG_SEQUENCE))
+    image_algorithm = _digest_algorithm(data, digest_info[0])
+    image_digest = _content(data, _expect(digest_info[1], TAG_OCTET_STRING))
+
+    certificates = []
+    for item in signed_data[3:-1]:
+        if item[0] == TAG_CONTEXT_0:
+            for cert in _children(data, item):
+                if cert[0] == TAG_SEQUENCE:
+                    certificates.append(x509.load_der_x509_certificate(_raw(data, cert)))
+
+    signer_infos = _children(data, _expect(signed_data[-1], TAG_SET))
+    if not signer_infos:
+        raise AuthenticodeError("没有签名者信息")
+    signer = _children(data, _expect(signer_infos[0], TAG_SEQUENCE))
+    issuer_and_serial = _children(data, _expect(signer[1], TAG_SEQUENCE))
+    serial = int.from_bytes(_content(data, _expect(issuer_and_serial[1], TAG_INTEGER)), "big", signed=True)
+
+    pos = 3
+    authenticated = None
+    if signer[pos][0] == TAG_CONTEXT_0:
+        authenticated = signer[pos]
+        pos += 1
+    if authenticated is None:
+        raise AuthenticodeError("缺少认证属性")
+    message_digest = None
+    for attribute in _children(data, authenticated):
+        items = _children(data, _expect(attribute, TAG_SEQUENCE))
+        if _oid(data, items[0]) == OID_MESSAGE_DIGEST:
+            message_digest = _content(data, _expect(_children(data, _expect(items[1], TAG_SET))[0], TAG_OCTET_STRING))
+    # 签名针对的是以 SET 标签重新编码的认证属性
+    signed_attributes = b"\x31" + _raw(data, authenticated)[1:]
+
+    return {
+        "image_algorithm": image_algorithm,
+        "image_digest": image_digest,
+        "content": _content(data, spc),
+        "certificates": certificates,
+        "signer": {
+            "issuer": _raw(data, issuer_and_serial[0]),
+            "serial": serial,
+            "digest_algorithm": _digest_algorithm(data, signer[2]),
+            "message_digest": message_digest,
+            "signed_attributes": signed_attributes,
+            "signature": _content(data, _expect(signer[pos + 1], TAG_OCTET_STRING)),
+        },
+    }
+
+
+def image_hash(buf, metadata, algorithm):
+    """
+    计算 Authenticode 映像哈希
+    跳过可选头中的 CheckSum、安全目录项和证书表本身，其余字节按文件顺序参与计算
+    """
+    checksum = metadata["checksum_offset"]
+    security_dir = metadata["security_dir_offset"]
+    table_offset, table_size = metadata["certificate_table"]
+    if security_dir is None or not (checksum + 4 <= security_dir and security_dir + 8 <= table_offset):
+        raise AuthenticodeError("证书表位置无效")
+    ranges = ((0, checksum), (checksum + 4, security_dir), (security_dir + 8, table_offset),
+              (table_offset + table_size, metadata["file_size"]))
+    digest = hashlib.new(algorithm)
+    view = memoryview(buf)
+    try:
+        for start, end in ranges:
+            if end > start:
+                digest.update(view[start:end])
+    finally:
+        view.release()
+    return digest.digest()
+
+
+def _find_signer_certificate(certificates, issuer, serial):
+    candidates = [c for c in certificates if c.serial_number == serial]
+    for cert in candidates:
+        if cert.issuer.public_bytes() == issuer:
+            return cert
+    return candidates[0] if candidates else None
+
+
+def _verify_signature(cert, signature, data, hash_class):
+    public_key = cert.public_key()
+    if isinstance(public_key, rsa.RSAPublicKey):
+        public_key.verify(signature, data, padding.PKCS1v15(), hash_class())
+    elif isinstance(public_key, ec.EllipticCurvePublicKey):
+        public_key.verify(signature, data, ec.ECDSA(hash_class()))
+    else:
+        raise AuthenticodeError("不支持的签名公钥类型")
+
+
+def _organization(cert):
+    names = cert.subject.get_attributes_for_oid(NameOID.ORGANIZATION_NAME)
+    return names[0].value if names else "Unknown Organization"
+
+
+# ------------------------------
+# 证书链
+# ------------------------------
+class TrustStore:
+    """受信任的根证书，以及可用于补全证书链的中间证书"""
+
+    def __init__(self, roots=(), intermediates=()):
+        self._roots = set()
+        self._by_subject = {}  # subject DER -> [证书]
+        for cert in roots:
+            self._roots.add(cert.fingerprint(hashes.SHA256()))
+            self._by_subject.setdefault(cert.subject.public_bytes(), []).append(cert)
+        for cert in intermediates:
+            self._by_subject.setdefault(cert.subject.public_bytes(), []).append(cert)
+
+    def is_root(self, cert):
+        return cert.fingerprint(hashes.SHA256()) in self._roots
+
+    def issuers(self, cert):
+        return self._by_subject.get(cert.issuer.public_bytes(), [])
+
+    def __len__(self):
+        return len(self._roots)
+
+
+def _load_system_store(name):
+    """读取 Windows 系统证书库（ROOT/CA），其他平台返回空列表"""
+    certs = []
+    if not hasattr(ssl, "enum_certificates"):
+        return certs
+    try:
+        entries = ssl.enum_certificates(name)
+    except OSError:
+        return certs
+    for data, encoding, trust in entries:
+        if encoding != "x509_asn":
+            continue
+        try:
+            certs.append(x509.load_der_x509_certificate(data))
+        except ValueError:
+            continue
+    return certs
+
+
+_system_store = None
+_system_store_lock = threading.Lock()
+
+
+def get_trust_store():
+    """进程内共享的系统信任库（首次使用时读取，非 Windows 平台为空，任何签名都不受信任）"""
+    global _system_store
+    with _system_store_lock:
+        if _system_store is None:
+            _system_store = TrustStore(_load_system_store("ROOT"), _load_system_store("CA"))
+        return _system_store
+
+
+def _issued_by(cert, issuer):
+    try:
+        cert.verify_directly_issued_by(issuer)
+        return True
+    except (ValueError, TypeError, InvalidSignature, UnsupportedAlgorithm):
+        return False
+
+
+def _is_ca(cert):
+    try:
+        return cert.extensions.get_extension_for_class(x509.BasicConstraints).value.ca
+    except x509.ExtensionNotFound:
+        return False
+
+
+def _allows_code_signing(cert):
+    try:
+        usages = cert.extensions.get_extension_for_class(x509.ExtendedKeyUsage).value
+    except x509.ExtensionNotFound:
+        return True
+    return ExtendedKeyUsageOID.CODE_SIGNING in usages
+
+
+def chain_is_trusted(cert, certificates, trust):
+    """
+    签名者证书能否经由签名中附带的证书（或信任库中的中间证书）验证到受信任的根证书
+    不检查有效期：代码签名通常带时间戳，证书过期后签名仍然有效
+    """
+    if not _allows_code_signing(cert):
+        return False
+    by_subject = {}
+    for candidate in certificates:
+        by_subject.setdefault(candidate.subject.public_bytes(), []).append(candidate)
+    current = cert
+    for _ in range(MAX_CHAIN_DEPTH):
+        if trust.is_root(current):
+            return True
+        issuer = None
+        for candidate in trust.issuers(current) + by_subject.get(current.issuer.public_bytes(), []):
+            if candidate is current or not _issued_by(current, candidate):
+                continue
+            if trust.is_root(candidate):
+                return True
+            if _is_ca(candidate):
+                issuer = candidate
+                break
+        if issuer is None:
+            return False
+        current = issuer
+    return False
+
+
+def _result(status, reason, organization=None, metadata=None):
+    return {"status": status, "reason": reason, "organization": organization, "metadata": metadata}
+
+
+def verify_image(buf, metadata=None, trust=None):
+    """
+    校验已映射的 PE 映像（bytes/mmap）
+    返回 dict：status（Signed/Untrusted/Unsigned/Unknown）、reason、organization、metadata
+    证书链不受信任时为 Untrusted，organization 为 None（自签名证书的组织名可以随意填写）
+    看不到系统目录（catalog）签名，这类文件会被判为 Unsigned
+
+    Args:
+        trust: TrustStore，默认使用系统信任库
+    """
+    if metadata is None:
+        metadata = pe_metadata.parse_pe(buf)
+    certificates = metadata["certificates"]
+    if not certificates:
+        return _result(UNSIGNED, "没有嵌入签名", metadata=metadata)
+    certificate = certificates[0]
+    if certificate["type"] != WIN_CERT_TYPE_PKCS_SIGNED_DATA:
+        return _result(UNKNOWN, f"不支持的证书类型 {certificate['type']}", metadata=metadata)
+
+    try:
+        signed = parse_signed_data(certificate["data"])
+        digest = image_hash(buf, metadata, signed["image_algorithm"][0])
+    except (AuthenticodeError, ValueError, IndexError, UnsupportedAlgorithm) as e:
+        return _result(UNKNOWN, str(e), metadata=metadata)
+    if not hmac.compare_digest(digest, signed["image_digest"]):
+        return _result(UNSIGNED, "映像哈希不匹配", metadata=metadata)
+
+    signer = signed["signer"]
+    cert = _find_signer_certificate(signed["certificates"], signer["issuer"], signer["serial"])
+    if cert is None:
+        return _result(UNKNOWN, "找不到签名者证书", metadata=metadata)
+    hash_name, hash_class = signer["digest_algorithm"]
+    content_digest = hashlib.new(hash_name, signed["content"]).digest()
+    if signer["message_digest"] is None or not hmac.compare_digest(content_digest, signer["message_digest"]):
+        return _result(UNSIGNED, "签名内容摘要不匹配", metadata=metadata)
+    try:
+        _verify_signature(cert, signer["signature"], signer["signed_attributes"], hash_class)
+    except InvalidSignature:
+        return _result(UNSIGNED, "签名无效", metadata=metadata)
+    except (AuthenticodeError, UnsupportedAlgorithm, ValueError) as e:
+        return _result(UNKNOWN, str(e), metadata=metadata)
+    if not chain_is_trusted(cert, signed["certificates"], trust or get_trust_store()):
+        return _result(UNTRUSTED, "证书链不受信任", metadata=metadata)
+    return _result(SIGNED, "签名有效", _organization(cert), metadata)
+
+
+def verify_file(filepath, trust=None):
+    """映射文件一次，同时解析 PE 元数据并校验签名"""
+    try:
+        with pe_metadata.map_file(filepath) as mm:
+            return verify_image(mm, trust=trust)
+    except pe_metadata.PEFormatError as e:
+        # 不是 PE 文件，不可能带嵌入签名
+        return _result(UNSIGNED, str(e))
+    except (OSError, ValueError) as e:
+        return _result(UNKNOWN, str(e))
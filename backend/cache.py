@@ -0,0 +1,169 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+# 默认参数
+DEFAULT_MAXSIZE = 512
+DEFAULT_TTL = 10 * 60  # 10分钟
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    带过期时间的 LRU 缓存
+    - 超过 maxsize 时淘汰最久未使用的项，内存有上限
+    - 过期项在访问时惰性删除，不需要全量扫描
+    - 每项可带一个 scope（例如应用ID），用于定向失效
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, name=""):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()  # key -> (value, expires_at, scope)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, scope=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl, scope)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, scope=None):
+        """
+        定向失效
+        scope 为 None 时清空全部；否则删除该 scope 的项以及不区分 scope 的项
+        """
+        with self._lock:
+            if scope is None:
+                removed = len(self._data)
+                self._data.clear()
+            else:
+                keys = [k for k, (_, _, s) in self._data.items() if s is None or s == scope]
+                for k in keys:
+                    del self._data[k]
+                removed = len(keys)
+            self.invalidations += removed
+            return removed
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+# 已注册的缓存：name -> (TTLCache, tags)
+_registry = {}
+_registry_lock = threading.Lock()
+# 其他组件的统计：name -> stats()
+_stats_providers = {}
+
+
+def default_key(*args, **kwargs):
+    """默认缓存键：忽略数据库连接参数，其余参数须可哈希"""
+    args = tuple(a for a in args if not isinstance(a, sqlite3.Connection))
+    return args + tuple(sorted(kwargs.items())) if kwargs else args
+
+
+def cached(maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, key=None, scope=None, tags=()):
+    """
+    装饰器：缓存函数结果
+
+    Args:
+        key: key(*args, **kwargs) -> 可哈希的缓存键，默认 default_key
+        scope: scope(*args, **kwargs) -> 失效范围（如应用ID），None 表示全局项
+        tags: 失效标签，invalidate(tag) 会作用于带该标签的所有缓存
+    """
+    key_func = key or default_key
+
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+        store = TTLCache(maxsize=maxsize, ttl=ttl, name=name)
+        with _registry_lock:
+            _registry[name] = (store, tuple(tags))
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = key_func(*args, **kwargs)
+            result = store.get(cache_key, _MISSING)
+            if result is not _MISSING:
+                return result
+            result = func(*args, **kwargs)
+            store.set(cache_key, result, scope(*args, **kwargs) if scope else None)
+            return result
+
+        wrapper.cache = store
+        return wrapper
+
+    return decorator
+
+
+def invalidate(tag, scope=None):
+    """
+    失效带指定标签的缓存
+    usage 写入后调用 invalidate("usage", scope=unique_id)
+    设置不经过本模块缓存：读取设置及由设置派生的数据（黑白名单、匹配器）由 SettingsStore 按版本失效
+    返回删除的项数
+    """
+    removed = 0
+    with _registry_lock:
+        stores = [store for store, tags in _registry.values() if tag in tags]
+    for store in stores:
+        removed += store.invalidate(scope)
+    return removed
+
+
+def register_stats_provider(name, provider):
+    """登记其他缓存组件的统计函数，一并出现在 get_stats() 中"""
+    with _registry_lock:
+        _stats_providers[name] = provider
+    return provider
+
+
+def get_stats():
+    """所有缓存的统计信息"""
+    with _registry_lock:
+        items = list(_registry.items())
+        providers = list(_stats_providers.items())
+    stats = {name: store.stats() for name, (store, _) in items}
+    for name, provider in providers:
+        stats[name] = provider()
+    return stats
@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+import atexit
+from contextlib import contextmanager
+
+DB_FILE = "time_tracker.db"
+
+# 连接参数（所有连接共用）
+BUSY_TIMEOUT_MS = 5000           # 遇到锁时最多等待5秒，而不是立即报 database is locked
+CACHE_SIZE_KB = 16 * 1024        # 每个连接的页缓存大小（16MB）
+MMAP_SIZE = 128 * 1024 * 1024    # 内存映射读取（128MB）
+
+
+class ConnectionManager:
+    """
+    长连接管理器
+    - 每个线程一个只读连接（读连接池），互不阻塞
+    - 全进程唯一的写连接，所有写操作串行化
+    数据库以 WAL 模式打开，读写可以并发进行
+    """
+
+    def __init__(self, db_file=DB_FILE, busy_timeout_ms=BUSY_TIMEOUT_MS,
+                 cache_size_kb=CACHE_SIZE_KB, mmap_size=MMAP_SIZE):
+        self.db_file = db_file
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._pool_lock = threading.Lock()
+        self._writer = None
+        self._readers = []
+
+    def _connect(self, readonly):
+        """创建连接并设置 PRAGMA"""
+        # isolation_level=None：由我们显式控制事务，读连接不会长期持有快照
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row  # 结果既可按下标也可按列名访问
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        # 负数表示以KB为单位
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def reader(self):
+        """获取当前线程的只读连接（首次调用时创建）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect(readonly=True)
+            self._local.conn = conn
+            with self._pool_lock:
+                self._readers.append(conn)
+        return conn
+
+    def _get_writer(self):
+        if self._writer is None:
+            self._writer = self._connect(readonly=False)
+        return self._writer
+
+    @contextmanager
+    def write(self):
+        """
+        获取写连接并开启事务
+        正常退出时提交，异常时回滚；同一时刻只有一个线程能写
+        """
+        with self._write_lock:
+            conn = self._get_writer()
+            if conn.in_transaction:
+                # 嵌套调用时复用外层事务
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    def close_all(self):
+        """关闭所有连接（进程退出时调用）"""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._pool_lock:
+            for conn in self._readers:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._readers = []
+        self._local = threading.local()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    """获取全局连接管理器"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ConnectionManager(DB_FILE)
+    return _manager
+
+
+def configure(db_file):
+    """切换数据库文件（测试用），会关闭现有连接"""
+    global _manager, DB_FILE
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close_all()
+        DB_FILE = db_file
+        _manager = ConnectionManager(db_file)
+    return _manager
+
+
+def get_read_connection():
+    """当前线程的只读连接，不要关闭它"""
+    return get_manager().reader()
+
+
+def write_transaction():
+    """写事务上下文：with write_transaction() as conn: ..."""
+    return get_manager().write()
+
+
+@atexit.register
+def _close_on_exit():
+    if _manager is not None:
+        _manager.close_all()
@@ -1,179 +1,229 @@
-import sqlite3
 import json
+import time
 from datetime import datetime
 
-DB_FILE = "time_tracker.db"
+from db_pool import DB_FILE, get_read_connection, write_transaction
+import write_queue
+import cache
+from settings_store import SettingsStore
+from rule_matcher import build_matcher
+from identity_registry import IdentityRegistry
+from exe_identity_cache import ExeIdentityCache
+import rollup
+from migrations import run_migrations
 
 def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    # 应用使用日志（更新表结构以支持存储应用唯一标识符和标识类型）
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS app_usage (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        start_time TEXT,
-        exe_name TEXT,
-        app_name TEXT,
-        duration INTEGER,
-        unique_id TEXT,
-        identifier_type TEXT
-    )
-    ''')
-
-    # 黑名单应用（保留旧结构，兼容）
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS blacklist_apps (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        exe_name TEXT,
-        app_name TEXT
-    )
-    ''')
-
-    # 白名单应用（保留旧结构，兼容）
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS whitelist_apps (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        exe_name TEXT,
-        app_name TEXT
-    )
-    ''')
-
-    # 休息日设置（保留旧结构，兼容）
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS rest_days (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        date TEXT
-    )
-    ''')
-
-    # 🔹 新的 settings 表（存 JSON 配置，只有一条记录）
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS settings (
-        id INTEGER PRIMARY KEY CHECK (id = 1),
-        data TEXT
-    )
-    ''')
-
-    # 插入默认配置（如果为空）
-    cursor.execute("SELECT COUNT(*) FROM settings WHERE id = 1")
-    if cursor.fetchone()[0] == 0:
-        default_settings = {
-            "workPeriods": [{"start": "09:00", "end": "18:00"}],
-            "blacklist": [],
-            "whitelist": [],
-            "restDays": [],
-            "resetPolicy": "daily"
-        }
-        cursor.execute("INSERT INTO settings (id, data) VALUES (1, ?)",
-                       (json.dumps(default_settings),))
-
-    conn.commit()
-    conn.close()
+    # 建表、加列、建索引都由迁移完成
+    run_migrations()
+
+    with write_transaction() as conn:
+        cursor = conn.cursor()
+
+        # 插入默认配置（如果为空）
+        cursor.execute("SELECT COUNT(*) FROM settings WHERE id = 1")
+        if cursor.fetchone()[0] == 0:
+            default_settings = {
+                "workPeriods": [{"start": "09:00", "end": "18:00"}],
+                "blacklist": [],
+                "whitelist": [],
+                "restDays": [],
+                "resetPolicy": "daily"
+            }
+            cursor.execute("INSERT INTO settings (id, data) VALUES (1, ?)",
+                           (json.dumps(default_settings),))
+    settings_store.invalidate()
+    identity_registry.load()
+    exe_identity_cache.load()
 
 
 # ------------------------
 # 日志接口
 # ------------------------
-def log_usage(exe_name: str, app_name: str, duration: int, unique_id: str = None, identifier_type: str = None):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO app_usage (start_time, exe_name, app_name, duration, unique_id, identifier_type) VALUES (?, ?, ?, ?, ?, ?)",
-        (datetime.now().isoformat(), exe_name, app_name, duration, unique_id, identifier_type)
-    )
-    conn.commit()
-    conn.close()
-
-def store_app_identifier(pid, identifier_value, identifier_type):
-    """
-    存储应用唯一标识符信息到数据库
-    如果已存在该进程ID的记录，则更新标识符信息
-    """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # 检查是否已存在该进程ID的记录
-    cursor.execute(
-        "SELECT id FROM app_usage WHERE unique_id = ? AND identifier_type = ?",
-        (identifier_value, identifier_type)
-    )
-    existing_record = cursor.fetchone()
-    
-    if not existing_record:
-        # 记录不存在，插入新记录（只记录标识符，不记录持续时间）
-        cursor.execute(
-            "INSERT INTO app_usage (start_time, exe_name, app_name, duration, unique_id, identifier_type) VALUES (?, ?, ?, ?, ?, ?)",
-            (datetime.now().isoformat(), "", "", 0, identifier_value, identifier_type)
+USAGE_COLUMNS = "start_time, exe_name, app_name, duration, unique_id, identifier_type, start_ts, end_ts, day"
+
+def day_key(ts) -> str:
+    """epoch 秒对应的本地日期键（YYYY-MM-DD）"""
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+def _usage_row(exe_name, app_name, duration, unique_id, identifier_type, end_ts=None):
+    """
+    构造一行使用记录
+    会话区间为 [end_ts - duration, end_ts]，day 取会话开始的本地日期
+    start_time 保留旧含义（写入时刻的 ISO 字符串）以兼容旧接口
+    """
+    if end_ts is None:
+        end_ts = int(time.time())
+    duration = int(duration or 0)
+    start_ts = end_ts - duration
+    return (datetime.fromtimestamp(end_ts).isoformat(), exe_name, app_name, duration,
+            unique_id, identifier_type, start_ts, end_ts, day_key(start_ts))
+
+def _insert_usage_rows(rows):
+    """在一个事务中批量写入使用记录，并同步累加每日汇总（由写后队列调用）"""
+    with write_transaction() as conn:
+        conn.executemany(
+            f"INSERT INTO app_usage ({USAGE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
         )
-    
-    conn.commit()
-    conn.close()
+        rollup.apply_intervals(conn, [(r[4], r[6], r[7]) for r in rows])
+        new_apps = rollup.apply_metadata(conn, [(r[4], r[1], r[2], r[5], r[7]) for r in rows])
+    # 提交后只失效受影响应用的缓存；应用列表只在出现新应用时失效，时长的更新由列表缓存的短 TTL 体现
+    for unique_id in {r[4] for r in rows if r[4]}:
+        cache.invalidate("usage", scope=unique_id)
+    if new_apps:
+        cache.invalidate("apps_list")
+
+def _merge_usage_rows(prev, row):
+    """积压时合并同一应用的相邻记录；挂机标记（System）保持原样"""
+    if prev[1] == "System" or row[1] == "System":
+        return None
+    if (prev[1], prev[2], prev[4], prev[5]) != (row[1], row[2], row[4], row[5]):
+        return None
+    return _usage_row(row[1], row[2], prev[3] + row[3], row[4], row[5], end_ts=row[7])
+
+# 使用记录写后队列：监控线程只入队，后台线程批量提交
+usage_queue = write_queue.register(
+    write_queue.WriteBehindQueue(_insert_usage_rows, merge_func=_merge_usage_rows, name="usage-writer")
+)
+
+# 应用标识注册表：已知标识常驻内存，新标识批量写入 app_identity
+identity_registry = IdentityRegistry()
+
+# 可执行文件识别结果缓存（EnhancedAppIdentifier 使用）
+exe_identity_cache = ExeIdentityCache()
+cache.register_stats_provider("exe_identity_cache", exe_identity_cache.stats)
+
+def log_usage(exe_name: str, app_name: str, duration: int, unique_id: str = None, identifier_type: str = None,
+              end_ts=None):
+    """记录一条使用日志（异步写入，会话在 end_ts 结束，默认为调用时刻）"""
+    usage_queue.put(_usage_row(exe_name, app_name, duration, unique_id, identifier_type, end_ts))
+
+def flush_usage():
+    """立即把缓冲的使用记录写盘"""
+    return usage_queue.flush()
+
+def _insert_background_rows(rows):
+    """批量累加后台活动时长 (unique_id, exe_name, start_ts, end_ts)，跨零点的拆到两天"""
+    totals = {}
+    for unique_id, exe_name, start_ts, end_ts in rows:
+        for day, seconds in rollup.split_by_day(start_ts, end_ts):
+            entry = totals.setdefault((unique_id, day), [exe_name, 0])
+            entry[1] += seconds
+    with write_transaction() as conn:
+        conn.executemany("""
+            INSERT INTO app_background_usage (unique_id, day, exe_name, seconds)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (unique_id, day) DO UPDATE SET
+                seconds = seconds + excluded.seconds,
+                exe_name = excluded.exe_name
+        """, [(uid, day, exe_name, seconds) for (uid, day), (exe_name, seconds) in totals.items()])
+
+# 后台活动写后队列，与前台使用记录分开
+background_queue = write_queue.register(
+    write_queue.WriteBehindQueue(_insert_background_rows, name="background-usage-writer")
+)
+
+def log_background_usage(unique_id: str, exe_name: str, seconds: float, end_ts=None):
+    """记录一段后台活动（异步写入，区间在 end_ts 结束）"""
+    if not unique_id or seconds <= 0:
+        return
+    end_ts = int(time.time()) if end_ts is None else int(end_ts)
+    background_queue.put((unique_id, exe_name, end_ts - int(round(seconds)), end_ts))
+
+def store_app_identifier(pid, identifier_value, identifier_type, exe_name=None, executable_path=None, app_info=None):
+    """
+    存储应用唯一标识符信息到 app_identity 表（批量异步写入）
+    已存在时只更新 last_seen；返回是否为新标识
+    """
+    return identity_registry.record(identifier_value, identifier_type, exe_name, executable_path, app_info)
 
 def check_app_identifier_exists(identifier_value, identifier_type):
     """
-    检查数据库中是否已存在指定的应用标识符
+    检查是否已存在指定的应用标识符（内存查找，不访问数据库）
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        "SELECT id FROM app_usage WHERE unique_id = ? AND identifier_type = ?",
-        (identifier_value, identifier_type)
-    )
-    result = cursor.fetchone()
-    
-    conn.close()
-    return result is not None
+    return identity_registry.is_known(identifier_value, identifier_type)
 
 def get_recent_logs(limit=50):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT start_time, exe_name, app_name, duration, unique_id, identifier_type FROM app_usage ORDER BY id DESC LIMIT ?", (limit,))
-    rows = cursor.fetchall()
-    conn.close()
+    flush_usage()
+    conn = get_read_connection()
+    rows = conn.execute("SELECT start_time, exe_name, app_name, duration, unique_id, identifier_type FROM app_usage ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
     return [
         {"time": r[0], "exe": r[1], "app": r[2], "duration": r[3], "unique_id": r[4], "identifier_type": r[5]} for r in rows
     ]
 
 
+def get_usage_totals(start_day: str, end_day: str):
+    """
+    从每日汇总表读取 [start_day, end_day] 内的使用时长
+    返回 {"seconds": 总秒数, "sessions": 会话数, "apps": 应用数}
+    """
+    conn = get_read_connection()
+    row = conn.execute("""
+        SELECT COALESCE(SUM(seconds), 0), COALESCE(SUM(sessions), 0), COUNT(DISTINCT unique_id)
+        FROM app_daily_usage WHERE day BETWEEN ? AND ?
+    """, (start_day, end_day)).fetchone()
+    return {"seconds": row[0], "sessions": row[1], "apps": row[2]}
+
+
+def get_background_totals(start_day: str, end_day: str):
+    """[start_day, end_day] 内各应用的后台活动时长 {unique_id: 秒数}"""
+    background_queue.flush()
+    conn = get_read_connection()
+    rows = conn.execute("""
+        SELECT unique_id, SUM(seconds) FROM app_background_usage
+        WHERE day BETWEEN ? AND ? GROUP BY unique_id
+    """, (start_day, end_day)).fetchall()
+    return {r[0]: r[1] for r in rows}
+
+
 # ------------------------
 # 黑白名单（兼容旧接口）
 # ------------------------
 def get_blocked_apps_count():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM blacklist_apps")
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    conn = get_read_connection()
+    return conn.execute("SELECT COUNT(*) FROM blacklist_apps").fetchone()[0]
+
+def _build_list(settings, name):
+    return [(x["exe_name"], x.get("app_name", x["exe_name"])) for x in settings.get(name, [])]
 
 def get_blacklist():
-    settings = load_settings()
-    return [(x["exe_name"], x.get("app_name", x["exe_name"])) for x in settings.get("blacklist", [])]
+    return _blacklist()
 
 def get_whitelist():
-    settings = load_settings()
-    return [(x["exe_name"], x.get("app_name", x["exe_name"])) for x in settings.get("whitelist", [])]
+    return _whitelist()
 
 
 # ------------------------
 # 设置管理
 # ------------------------
+def _read_settings_json():
+    conn = get_read_connection()
+    row = conn.execute("SELECT data FROM settings WHERE id = 1").fetchone()
+    return row[0] if row else None
+
+# 进程内设置缓存：读取不访问数据库，保存时递增版本并通知订阅者
+settings_store = SettingsStore(_read_settings_json)
+
+# 黑白名单只在设置版本变化时重建
+_blacklist = settings_store.derive(lambda s: _build_list(s, "blacklist"))
+_whitelist = settings_store.derive(lambda s: _build_list(s, "whitelist"))
+
+# 编译后的黑白名单匹配器，两个监控循环共用，设置变化时重建
+get_rule_matcher = settings_store.derive(build_matcher)
+
 def load_settings():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT data FROM settings WHERE id = 1")
-    row = cursor.fetchone()
-    conn.close()
-    return json.loads(row[0]) if row else {}
+    """返回设置副本（来自内存缓存）"""
+    return settings_store.get()
 
 def save_settings(data: dict):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE settings SET data = ? WHERE id = 1", (json.dumps(data),))
-    conn.commit()
-    conn.close()
+    """
+    保存设置，返回新的设置版本号
+    递增版本后，load_settings 和 settings_store.derive 派生的数据（黑白名单、匹配器）在下次读取时重建，
+    不需要另外失效缓存
+    """
+    with write_transaction() as conn:
+        conn.execute("UPDATE settings SET data = ? WHERE id = 1", (json.dumps(data),))
+    return settings_store.update(data)
 
 
 # ------------------------
@@ -183,41 +233,28 @@ def save_app_identifier(unique_id: str, exe_name: str, app_name: str, identifier
     """
     保存应用标识符信息到数据库
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # 使用 INSERT OR REPLACE 来确保记录存在且是最新的
-    cursor.execute("""
-        INSERT OR REPLACE INTO app_identifiers 
-        (unique_id, exe_name, app_name, identifier_type, cooling_days)
-        VALUES (?, ?, ?, ?, ?)
-    """, (unique_id, exe_name, app_name, identifier_type, cooling_days))
-    
-    conn.commit()
-    conn.close()
+    with write_transaction() as conn:
+        # 使用 INSERT OR REPLACE 来确保记录存在且是最新的
+        conn.execute("""
+            INSERT OR REPLACE INTO app_identifiers 
+            (unique_id, exe_name, app_name, identifier_type, cooling_days)
+            VALUES (?, ?, ?, ?, ?)
+        """, (unique_id, exe_name, app_name, identifier_type, cooling_days))
+    cache.invalidate("apps", scope=unique_id)
+    cache.invalidate("apps_list")  # 列表中的冷却天数
 
 def get_cooling_days(unique_id: str) -> int:
     """
     获取应用的冷却天数
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT cooling_days FROM app_identifiers WHERE unique_id = ?", (unique_id,))
-    result = cursor.fetchone()
-    
-    conn.close()
+    conn = get_read_connection()
+    result = conn.execute("SELECT cooling_days FROM app_identifiers WHERE unique_id = ?", (unique_id,)).fetchone()
     return result[0] if result else 0
 
 def has_black_history(unique_id: str) -> bool:
     """
     检查应用是否有黑名单历史
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT COUNT(*) FROM app_usage WHERE unique_id = ? AND is_blocked = 1", (unique_id,))
-    result = cursor.fetchone()
-    
-    conn.close()
+    conn = get_read_connection()
+    result = conn.execute("SELECT COUNT(*) FROM app_usage WHERE unique_id = ? AND is_blocked = 1", (unique_id,)).fetchone()
     return result[0] > 0
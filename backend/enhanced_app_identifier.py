@@ -1,65 +1,34 @@
-import winreg
 import win32api
-import pefile
 import os
 import re
-from cryptography.hazmat.primitives.serialization import pkcs7
+
+import file_identity
+import installed_apps
 
 class EnhancedAppIdentifier:
     """增强版应用唯一标识符识别类"""
     
-    def __init__(self):
-        self.installed_apps = self._get_installed_apps()
+    def __init__(self, file_cache=None, catalog=None):
+        """
+        Args:
+            file_cache: 可执行文件识别结果缓存（ExeIdentityCache），为 None 时每次都重新识别
+            catalog: 已安装应用目录（InstalledAppsCatalog），默认使用进程内共享的目录，在后台加载
+        """
+        self.catalog = catalog or installed_apps.get_catalog()
+        self.file_cache = file_cache
     
-    def _get_installed_apps(self):
-        """获取已安装应用程序列表"""
-        apps = []
-        reg_paths = [
-            r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall",
-            r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"
-        ]
-        
-        for reg_path in reg_paths:
-            try:
-                key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, reg_path)
-                for i in range(0, winreg.QueryInfoKey(key)[0]):
-                    subkey_name = winreg.EnumKey(key, i)
-                    subkey_path = f"{reg_path}\\{subkey_name}"
-                    try:
-                        subkey = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, subkey_path)
-                        display_name = winreg.QueryValueEx(subkey, "DisplayName")[0]
-                        try:
-                            display_version = winreg.QueryValueEx(subkey, "DisplayVersion")[0]
-                        except FileNotFoundError:
-                            display_version = "Unknown"
-                        
-                        try:
-                            install_location = winreg.QueryValueEx(subkey, "InstallLocation")[0]
-                        except FileNotFoundError:
-                            install_location = "Unknown"
-                        
-                        apps.append({
-                            "name": display_name,
-                            "version": display_version,
-                            "install_location": install_location
-                        })
-                        winreg.CloseKey(subkey)
-                    except (WindowsError, FileNotFoundError):
-                        continue
-                winreg.CloseKey(key)
-            except WindowsError:
-                continue
-        return apps
+    @property
+    def installed_apps(self):
+        """已安装应用程序列表（后台加载完成前为空）"""
+        return self.catalog.apps()
     
     def _get_file_version_info(self, filepath):
-        """获取文件版本信息"""
+        """用 Windows 版本资源 API 读取产品名称和公司名称（pe_metadata 无法解析文件时的后备）"""
         try:
-            info = win32api.GetFileVersionInfo(filepath, '\\')
             lang, codepage = win32api.GetFileVersionInfo(filepath, '\\VarFileInfo\\Translation')[0]
             string_file_info = f'\\StringFileInfo\\{lang:04x}{codepage:04x}'
             product_name = win32api.GetFileVersionInfo(filepath, f'{string_file_info}\\ProductName')
             company_name = win32api.GetFileVersionInfo(filepath, f'{string_file_info}\\CompanyName')
-            # 不获取文件版本信息，因为我们不需要在唯一标识符中包含版本号
             return {
                 "product_name": product_name,
                 "company_name": company_name
@@ -67,132 +36,20 @@ class EnhancedAppIdentifier:
         except Exception:
             return {}
     
-    def _get_pe_signature(self, filepath):
-        """获取PE文件数字签名状态"""
-        try:
-            # 使用PowerShell检查数字签名状态，这是最准确的方法
-            import subprocess
-            import json
-            
-            # PowerShell命令检查签名状态
-            ps_command = f'''
-            $sig = Get-AuthenticodeSignature -FilePath "{filepath}"
-            if ($sig.Status -eq "Valid") {{
-                "Signed"
-            }} elseif ($sig.Status -eq "UnknownError" -or $sig.Status -eq "HashMismatch" -or $sig.Status -eq "NotSigned") {{
-                "Unsigned"
-            }} else {{
-                "Unknown"
-            }}
-            '''
-            
-            # 执行PowerShell命令
-            result = subprocess.run(
-                ["powershell", "-Command", ps_command],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode == 0 and result.stdout.strip():
-                return result.stdout.strip()
-            
-            # 如果PowerShell方法失败，回退到其他方法
-            # 首先尝试使用pywin32检查签名状态
-            try:
-                import win32api
-                sig = win32api.GetFileVersionInfo(filepath, "\\")
-                if sig:
-                    # 使用WinVerifyTrust API检查签名
-                    try:
-                        import win32crypt
-                        import win32con
-                        from win32api import GetFileVersionInfo, VerQueryValue
-                        # 获取文件版本信息
-                        info = GetFileVersionInfo(filepath, "\\")
-                        if info:
-                            # 尝试验证签名
-                            hfile = win32api.CreateFile(filepath, win32con.GENERIC_READ, win32con.FILE_SHARE_READ, None, win32con.OPEN_EXISTING, 0, None)
-                            win32api.CloseHandle(hfile)
-                            # 如果能成功打开文件，很可能有签名
-                            return "Signed"
-                    except:
-                        pass
-            except:
-                pass
-            
-            # 然后尝试使用pefile检查嵌入签名
-            try:
-                pe = pefile.PE(filepath)
-                security_dir = pe.OPTIONAL_HEADER.DATA_DIRECTORY[pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_SECURITY']]
-                
-                # 检查安全目录是否有效（嵌入签名）
-                if security_dir.VirtualAddress != 0 and security_dir.Size != 0:
-                    # 获取数字签名数据并转换为bytes
-                    data = bytes(pe.write()[security_dir.VirtualAddress:security_dir.VirtualAddress + security_dir.Size])
-                    
-                    # 跳过 WIN_CERTIFICATE 结构头（8字节长度 + 2字节修订版 + 2字节类型）
-                    if len(data) >= 8:
-                        pkcs7_data = bytes(data[8:])
-                        
-                        try:
-                            # 解析 PKCS#7 签名块，获取证书列表
-                            certs = pkcs7.load_der_pkcs7_certificates(pkcs7_data)
-                            
-                            if certs:
-                                pe.close()
-                                return "Signed"
-                            pe.close()
-                            return "Signed but no certificate found"
-                        except Exception:
-                            pe.close()
-                            return "Signed but parse error"
-                
-                pe.close()
-            except:
-                pass
-            
-            return "Unsigned"
-        except Exception:
-            return "Unknown"
+    def _probe_file(self, filepath):
+        """读取文件版本信息、签名状态和签名组织（耗时操作）"""
+        # 与预热任务使用同一个函数，缓存结果一致
+        identity = file_identity.probe_file(filepath)
+        if not identity["pe_parsed"]:
+            # 无法解析 PE 结构时，版本信息交给系统 API 读取（子进程中不可用，只在这里做）
+            identity["version_info"] = self._get_file_version_info(filepath)
+        return identity
     
-    def _extract_organization_from_signature(self, filepath):
-        """从PE文件数字签名中提取组织名称"""
-        try:
-            pe = pefile.PE(filepath)
-            security_dir = pe.OPTIONAL_HEADER.DATA_DIRECTORY[pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_SECURITY']]
-            
-            # 检查安全目录是否有效
-            if security_dir.VirtualAddress != 0 and security_dir.Size != 0:
-                # 获取数字签名数据并转换为bytes
-                data = bytes(pe.write()[security_dir.VirtualAddress:security_dir.VirtualAddress + security_dir.Size])
-                
-                # 跳过 WIN_CERTIFICATE 结构头（8字节长度 + 2字节修订版 + 2字节类型）
-                if len(data) >= 8:
-                    pkcs7_data = bytes(data[8:])
-                    
-                    try:
-                        # 解析 PKCS#7 签名块，获取证书列表
-                        certs = pkcs7.load_der_pkcs7_certificates(pkcs7_data)
-                        
-                        if certs:
-                            # 获取第一个证书（通常是签名者的证书）
-                            signer_cert = certs[0]
-                            subject = signer_cert.subject.rfc4514_string()
-                            
-                            # 从主题中提取组织名称（O=字段）
-                            import re
-                            org_match = re.search(r'O=([^,]+)', subject)
-                            if org_match:
-                                return org_match.group(1)
-                            return "Unknown Organization"
-                        return None
-                    except Exception:
-                        return None
-            
-            return None
-        except Exception:
-            return None
+    def _get_file_identity(self, filepath):
+        """获取文件识别结果，文件未变化时直接使用缓存"""
+        if self.file_cache is None:
+            return self._probe_file(filepath)
+        return self.file_cache.get_or_compute(filepath, self._probe_file)
     
     def identify_app(self, process_name, executable_path=None):
         """
@@ -213,22 +70,22 @@ class EnhancedAppIdentifier:
             "identifier_type": "APPID"   # 默认标识符类型为APPID
         }
         
-        # 第二层：基于注册表信息匹配
-        for app in self.installed_apps:
-            if process_name.lower() in app["name"].lower():
-                identifier.update({
-                    "display_name": app["name"],
-                    "version": app["version"],
-                    "install_location": app["install_location"],
-                    "confidence_level": "high",  # 注册表匹配也是高置信度
-                    "identifier_type": "APPID"   # 注册表匹配的标识符类型为APPID
-                })
-                break
+        # 第二层：基于注册表信息匹配（索引查找：安装目录 > 完整名称 > 名称中的词 > 名称出现在进程名中）
+        app = self.catalog.index().match(process_name, executable_path)
+        if app is not None:
+            identifier.update({
+                "display_name": app["name"],
+                "version": app["version"],
+                "install_location": app["install_location"],
+                "confidence_level": "high",  # 注册表匹配也是高置信度
+                "identifier_type": "APPID"   # 注册表匹配的标识符类型为APPID
+            })
         
         # 第三层：基于文件属性匹配
         if executable_path and os.path.exists(executable_path):
-            version_info = self._get_file_version_info(executable_path)
-            signature_status = self._get_pe_signature(executable_path)
+            file_identity = self._get_file_identity(executable_path)
+            version_info = file_identity["version_info"]
+            signature_status = file_identity["signature_status"]
             
             identifier.update({
                 "executable_path": executable_path,
@@ -240,8 +97,8 @@ class EnhancedAppIdentifier:
             # 如果文件有数字签名，将标识符类型设置为数字签名
             if signature_status == "Signed":
                 identifier["identifier_type"] = "数字签名"
-                # 尝试提取组织名称
-                organization = self._extract_organization_from_signature(executable_path)
+                # 组织名称已在识别文件时提取
+                organization = file_identity.get("organization")
                 if organization:
                     identifier["organization"] = organization
             elif executable_path:
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+
+from db_pool import write_transaction, get_read_connection
+import write_queue
+
+
+def normalize_path(path):
+    """规范化路径：绝对路径 + 大小写规范（Windows 下不区分大小写）"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+class ExeIdentityCache:
+    """
+    可执行文件识别结果的持久化缓存
+    - 键为规范化路径，同时记录文件大小和修改时间；文件变化后自动失效
+    - 启动时整体加载到内存，命中时只需一次 stat + 字典查找
+    - 新结果通过写后队列写入 exe_identity_cache 表
+    """
+
+    def __init__(self):
+        self._entries = {}  # path -> (size, mtime_ns, result)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.queue = write_queue.register(
+            write_queue.WriteBehindQueue(self._upsert_rows, batch_size=16, name="exe-identity-writer")
+        )
+
+    def load(self):
+        """从数据库加载全部缓存项"""
+        conn = get_read_connection()
+        rows = conn.execute("SELECT path, size, mtime_ns, result FROM exe_identity_cache").fetchall()
+        entries = {}
+        for path, size, mtime_ns, result in rows:
+            try:
+                entries[path] = (size, mtime_ns, json.loads(result))
+            except (TypeError, ValueError):
+                continue
+        with self._lock:
+            self._entries = entries
+            self._loaded = True
+        return len(entries)
+
+    def get(self, path):
+        """
+        查找缓存，返回 (key, result)
+        key 为 (规范化路径, size, mtime_ns)，文件不存在时为 None；未命中或已过期时 result 为 None
+        """
+        if not self._loaded:
+            self.load()
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None, None
+        key = (normalize_path(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is not None and entry[0] == key[1] and entry[1] == key[2]:
+                self.hits += 1
+                return key, entry[2]
+            if entry is not None:
+                # 文件已更新（大小或修改时间变化）
+                self.stale += 1
+            self.misses += 1
+        return key, None
+
+    def put(self, key, result):
+        """保存识别结果（内存立即生效，数据库异步写入）"""
+        if key is None:
+            return
+        path, size, mtime_ns = key
+        with self._lock:
+            self._entries[path] = (size, mtime_ns, result)
+        self.queue.put((path, size, mtime_ns, json.dumps(result, ensure_ascii=False, default=str), int(time.time())))
+
+    def get_or_compute(self, path, compute):
+        """命中时直接返回，否则调用 compute(path) 并缓存"""
+        key, result = self.get(path)
+        if result is not None:
+            return result
+        result = compute(path)
+        self.put(key, result)
+        return result
+
+    def _upsert_rows(self, rows):
+        with write_transaction() as conn:
+            conn.executemany("""
+                INSERT INTO exe_identity_cache (path, size, mtime_ns, result, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    size = excluded.size,
+                    mtime_ns = excluded.mtime_ns,
+                    result = excluded.result,
+                    updated_at = excluded.updated_at
+            """, rows)
+
+    def flush(self):
+        return self.queue.flush()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,31 @@
+"""
+可执行文件识别（版本资源 + 签名状态 + 签名组织）
+只依赖 pe_metadata/authenticode，不依赖 Windows API，可以在子进程中运行
+"""
+
+import authenticode
+
+
+def version_fields(metadata):
+    """从 PE 元数据中取出用于生成唯一标识的版本信息（不含版本号）"""
+    version_info = (metadata or {}).get("version_info") or {}
+    if not (version_info.get("product_name") or version_info.get("company_name")):
+        return {}
+    return {
+        "product_name": version_info.get("product_name", ""),
+        "company_name": version_info.get("company_name", "")
+    }
+
+
+def probe_file(filepath):
+    """
+    读取文件版本信息、签名状态和签名组织（耗时操作，只映射一次文件）
+    pe_parsed 为 False 表示无法解析 PE 结构，版本信息需要由调用方用系统 API 补充
+    """
+    signature = authenticode.verify_file(filepath)
+    return {
+        "version_info": version_fields(signature["metadata"]),
+        "signature_status": signature["status"],
+        "organization": signature["organization"],
+        "pe_parsed": signature["metadata"] is not None
+    }
@@ -0,0 +1,217 @@
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from logger import log_to_file
+
+# 默认参数
+MAX_WORKERS = 2            # 同时识别的文件数
+MAX_PENDING = 64           # 排队+执行中的任务上限，超过后暂不提交
+RESULT_CACHE_SIZE = 1024   # 已识别结果的内存缓存条数
+RESULT_TTL = 10 * 60       # 已识别结果超过该时间（秒）后在后台重新识别，期间继续返回旧结果
+RETRY_INTERVAL = 60        # 识别失败后多久允许重试（秒）
+
+
+def _normalize(process_name, executable_path):
+    path = os.path.normcase(os.path.abspath(executable_path)) if executable_path else ""
+    return (path, (process_name or "").lower())
+
+
+def provisional_identity(process_name, executable_path=None):
+    """
+    临时标识：与无版本信息、无签名时 identify_app 的结果一致（以进程名为唯一标识）
+    识别完成后由正式结果替换
+    """
+    identity = {
+        "process_name": process_name,
+        "unique_id": process_name,
+        "confidence_level": "low",
+        "identifier_type": "APPID",
+        "provisional": True
+    }
+    if executable_path:
+        identity["executable_path"] = executable_path
+    return identity
+
+
+class IdentificationService:
+    """
+    后台应用识别服务
+    - 识别（读文件、校验签名、查注册表）在有界线程池中执行，监控线程只做内存查找
+    - 同一文件同时只有一个识别任务，重复请求直接复用
+    - 未识别完成时返回临时标识，完成后 lookup 返回正式结果并回调 on_resolved
+    - 结果按 LRU 保留 result_cache_size 条，过期的结果先继续使用，同时在后台刷新
+    """
+
+    def __init__(self, identify, max_workers=MAX_WORKERS, max_pending=MAX_PENDING,
+                 on_resolved=None, result_cache_size=RESULT_CACHE_SIZE, result_ttl=RESULT_TTL,
+                 name="identify"):
+        """
+        Args:
+            identify: identify(process_name, executable_path) -> app_info（可能很慢）
+            on_resolved: on_resolved(process_name, executable_path, app_info)，在工作线程中调用
+        """
+        self.identify = identify
+        self.max_pending = max_pending
+        self.on_resolved = on_resolved
+        self.result_cache_size = result_cache_size
+        self.result_ttl = result_ttl
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._results = OrderedDict()  # key -> (app_info, 识别完成时间)
+        self._inflight = {}  # key -> Future
+        self._failed = {}    # key -> 失败时间
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.stats = {"submitted": 0, "resolved": 0, "deduplicated": 0, "rejected": 0, "errors": 0,
+                      "hits": 0, "provisional": 0, "refreshes": 0, "primed": 0}
+
+    def submit(self, process_name, executable_path=None):
+        """
+        提交识别任务（不等待）
+        返回 True 表示任务已在执行或排队
+        """
+        key = _normalize(process_name, executable_path)
+        with self._lock:
+            if self._stopped:
+                return False
+            if key in self._inflight:
+                self.stats["deduplicated"] += 1
+                return True
+            failed_at = self._failed.get(key)
+            if failed_at is not None and time.monotonic() - failed_at < RETRY_INTERVAL:
+                return False
+            if len(self._inflight) >= self.max_pending:
+                # 积压时不再排队，下次 lookup 再提交
+                self.stats["rejected"] += 1
+                return False
+            self.stats["submitted"] += 1
+            self._inflight[key] = self._executor.submit(self._run, key, process_name, executable_path)
+            return True
+
+    def prime(self, process_name, executable_path=None):
+        """
+        在调用方线程中识别并保存结果（供预热任务使用，不占用识别线程池和排队上限）
+        已有结果或正在识别时跳过，返回是否得到了新结果
+        """
+        key = _normalize(process_name, executable_path)
+        with self._lock:
+            if self._stopped or key in self._results or key in self._inflight:
+                return False
+            self.stats["primed"] += 1
+        return self._run(key, process_name, executable_path) is not None
+
+    def _run(self, key, process_name, executable_path):
+        try:
+            app_info = self.identify(process_name, executable_path)
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._failed[key] = time.monotonic()
+                self.stats["errors"] += 1
+            log_to_file(f"应用识别失败: {process_name}", "ERROR", {"path": executable_path, "error": str(e)})
+            return None
+
+        with self._lock:
+            self._results[key] = (app_info, time.monotonic())
+            self._results.move_to_end(key)
+            while len(self._results) > self.result_cache_size:
+                self._results.popitem(last=False)
+            self._inflight.pop(key, None)
+            self._failed.pop(key, None)
+            self.stats["resolved"] += 1
+        if self.on_resolved:
+            try:
+                self.on_resolved(process_name, executable_path, app_info)
+            except Exception as e:
+                log_to_file(f"识别结果回调失败: {process_name}", "ERROR", {"error": str(e)})
+        return app_info
+
+    def get(self, process_name, executable_path=None):
+        """只查已识别的结果，没有时返回 None（不提交任务）"""
+        key = _normalize(process_name, executable_path)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            self._results.move_to_end(key)
+            return entry[0]
+
+    def lookup(self, process_name, executable_path=None):
+        """
+        获取应用识别结果，不阻塞
+        已识别时返回正式结果；否则提交识别任务并返回临时标识（带 provisional=True）
+        """
+        key = _normalize(process_name, executable_path)
+        with self._lock:
+            entry = self._results.get(key)
+            refresh = False
+            if entry is not None:
+                self._results.move_to_end(key)
+                self.stats["hits"] += 1
+                refresh = time.monotonic() - entry[1] > self.result_ttl and key not in self._inflight
+        if entry is not None:
+            if refresh and self.submit(process_name, executable_path):
+                self.stats["refreshes"] += 1
+            return entry[0]
+        self.stats["provisional"] += 1
+        self.submit(process_name, executable_path)
+        return provisional_identity(process_name, executable_path)
+
+    def wait(self, timeout=None):
+        """等待当前所有任务完成（测试和退出时使用）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                futures = list(self._inflight.values())
+            if not futures:
+                return True
+            for future in futures:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    future.result(timeout=remaining)
+                except Exception:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        return False
+
+    def pending(self):
+        with self._lock:
+            return len(self._inflight)
+
+    def stop(self, timeout=None):
+        """
+        停止服务，丢弃尚未开始的任务
+        timeout 不为 None 时最多等待这么久，让正在执行的识别完成（结果回调会写入标识队列）
+        """
+        with self._lock:
+            self._stopped = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._inflight = {k: f for k, f in self._inflight.items() if not f.cancelled()}
+        if timeout is not None:
+            self.wait(timeout)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["pending"] = self.pending()
+        stats["size"] = len(self._results)
+        return stats
+
+
+# 所有服务实例，进程退出时统一停止
+_services = []
+
+
+def register(service):
+    _services.append(service)
+    return service
+
+
+@atexit.register
+def stop_all(timeout=None):
+    """停止所有已登记的服务（应用关闭时显式调用，atexit 只作兜底）"""
+    for service in list(_services):
+        service.stop(timeout)
@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+
+from db_pool import write_transaction, get_read_connection
+import write_queue
+
+# 已知应用的 last_seen 最多每隔这么久写一次（秒）
+TOUCH_INTERVAL = 60
+
+# 写入 metadata 的识别结果字段
+METADATA_FIELDS = ("display_name", "version", "install_location", "version_info",
+                   "signature_status", "organization", "confidence_level")
+
+
+class IdentityRegistry:
+    """
+    应用标识注册表（app_identity 表的内存视图）
+    - 启动时把所有已知 (unique_id, identifier_type) 读入内存，判断"是否新应用"不访问磁盘
+    - 新标识和 last_seen 更新通过写后队列批量 upsert
+    """
+
+    def __init__(self, touch_interval=TOUCH_INTERVAL):
+        self.touch_interval = touch_interval
+        self._known = {}  # (unique_id, identifier_type) -> 上次写 last_seen 的时间
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.queue = write_queue.register(
+            write_queue.WriteBehindQueue(self._upsert_rows, batch_size=32, name="identity-writer")
+        )
+
+    def load(self):
+        """从数据库加载已知标识集合"""
+        conn = get_read_connection()
+        rows = conn.execute("SELECT unique_id, identifier_type FROM app_identity").fetchall()
+        with self._lock:
+            self._known = {(r[0], r[1]): 0.0 for r in rows}
+            self._loaded = True
+        return len(rows)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def is_known(self, unique_id, identifier_type):
+        self._ensure_loaded()
+        return (unique_id, identifier_type or "") in self._known
+
+    def record(self, unique_id, identifier_type, exe_name=None, executable_path=None, app_info=None):
+        """
+        记录一次应用出现
+        新标识立即入队；已知标识每 touch_interval 秒才更新一次 last_seen
+        返回是否为新标识
+        """
+        if not unique_id:
+            return False
+        identifier_type = identifier_type or ""
+        self._ensure_loaded()
+        key = (unique_id, identifier_type)
+        now = time.monotonic()
+        with self._lock:
+            last_touch = self._known.get(key)
+            is_new = last_touch is None
+            if not is_new and now - last_touch < self.touch_interval:
+                return False
+            self._known[key] = now
+
+        metadata = None
+        if app_info:
+            fields = {k: app_info[k] for k in METADATA_FIELDS if app_info.get(k)}
+            metadata = json.dumps(fields, ensure_ascii=False, default=str) if fields else None
+        self.queue.put((unique_id, identifier_type, exe_name or None, executable_path or None,
+                        metadata, int(time.time())))
+        return is_new
+
+    def _upsert_rows(self, rows):
+        with write_transaction() as conn:
+            conn.executemany("""
+                INSERT INTO app_identity
+                    (unique_id, identifier_type, exe_name, executable_path, metadata, first_seen, last_seen)
+                VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?6)
+                ON CONFLICT (unique_id, identifier_type) DO UPDATE SET
+                    exe_name = COALESCE(excluded.exe_name, exe_name),
+                    executable_path = COALESCE(excluded.executable_path, executable_path),
+                    metadata = COALESCE(excluded.metadata, metadata),
+                    last_seen = MAX(last_seen, excluded.last_seen)
+            """, rows)
+
+    def flush(self):
+        return self.queue.flush()
+
+    def __len__(self):
+        return len(self._known)
@@ -0,0 +1,224 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import psutil
+
+import db_utils
+import file_identity
+from logger import log_to_file
+
+CPU_BUDGET = 0.25            # 预热最多使用的 CPU 核数比例
+WARMUP_INTERVAL = 30 * 60    # 周期性预热间隔（秒）
+MAX_CRAWL_FILES = 5000       # 扫描安装目录时最多收集的文件数
+MAX_CRAWL_DEPTH = 4          # 扫描安装目录的最大深度
+EXECUTABLE_SUFFIXES = (".exe",)
+
+
+def running_executables():
+    """当前所有运行中进程的可执行文件路径 -> 进程名"""
+    paths = {}
+    for proc in psutil.process_iter(["exe", "name"]):
+        exe = proc.info.get("exe")
+        if exe:
+            paths[exe] = proc.info.get("name") or os.path.basename(exe)
+    return paths
+
+
+def crawl_install_roots(roots, max_files=MAX_CRAWL_FILES, max_depth=MAX_CRAWL_DEPTH):
+    """在安装目录（如 Program Files）下查找可执行文件"""
+    found = []
+    for root in roots or ():
+        root = os.path.expandvars(root).rstrip("\\/")
+        if not os.path.isdir(root):
+            continue
+        base_depth = root.count(os.sep)
+        for dirpath, dirnames, filenames in os.walk(root):
+            if dirpath.count(os.sep) - base_depth >= max_depth:
+                dirnames[:] = []
+            for name in filenames:
+                if name.lower().endswith(EXECUTABLE_SUFFIXES):
+                    found.append(os.path.join(dirpath, name))
+                    if len(found) >= max_files:
+                        return found
+    return found
+
+
+def _lower_priority():
+    """预热子进程降低优先级，不与前台应用争抢 CPU"""
+    try:
+        proc = psutil.Process()
+        if hasattr(psutil, "BELOW_NORMAL_PRIORITY_CLASS"):
+            proc.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            proc.nice(10)
+    except (psutil.Error, OSError):
+        pass
+
+
+class IdentityWarmup:
+    """
+    识别缓存预热任务
+    启动时和之后每隔 interval 秒，把运行中进程（以及配置的安装目录）的可执行文件提前识别并写入缓存，
+    用户切换窗口时直接命中缓存
+    - 已缓存且文件未变化的跳过
+    - 识别在进程池中执行，进程数按 cpu_budget 限制，子进程优先级调低
+    - 进程池固定用 spawn 方式启动，各平台行为一致（子进程会重新导入主模块，主模块导入时不能有副作用）
+    - 文件缓存预热后，再用 prime 为运行中的进程生成正式识别结果，首次切换到这些应用时不再是临时标识
+    - progress() 返回进度，供接口查询
+    """
+
+    def __init__(self, cache, roots=None, include_running=True, cpu_budget=CPU_BUDGET,
+                 interval=WARMUP_INTERVAL, probe=file_identity.probe_file, prime=None):
+        """
+        Args:
+            cache: ExeIdentityCache
+            roots: 安装目录列表，或返回列表的函数（每次预热时读取）
+            probe: probe(path) -> 识别结果，必须是模块级函数（在子进程中执行）
+            prime: prime(process_name, executable_path)，在预热线程中识别运行中的进程（如 IdentificationService.prime）
+        """
+        self.cache = cache
+        self.roots = roots
+        self.include_running = include_running
+        self.workers = max(1, int((os.cpu_count() or 1) * cpu_budget))
+        self.interval = interval
+        self.probe = probe
+        self.prime = prime
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._progress = {"state": "idle", "runs": 0, "total": 0, "cached": 0, "queued": 0,
+                          "done": 0, "failed": 0, "deferred": 0, "primed": 0, "started_at": None, "finished_at": None, "duration": None}
+
+    def _update(self, **fields):
+        with self._lock:
+            self._progress.update(fields)
+
+    def progress(self):
+        with self._lock:
+            progress = dict(self._progress)
+        progress["workers"] = self.workers
+        queued = progress["queued"]
+        progress["percent"] = round(100.0 * (progress["done"] + progress["failed"]) / queued, 1) if queued else 100.0
+        return progress
+
+    def candidate_paths(self, running=None):
+        paths = set(running or ())
+        roots = self.roots() if callable(self.roots) else self.roots
+        paths.update(crawl_install_roots(roots))
+        return sorted(paths)
+
+    def _prime_running(self, running):
+        """为运行中的进程生成识别结果（文件信息此时已在缓存中）"""
+        primed = 0
+        for path, name in sorted(running.items()):
+            if self._stop.is_set():
+                break
+            try:
+                if self.prime(name, path):
+                    primed += 1
+            except Exception as e:
+                log_to_file(f"预热识别结果失败: {name}", "ERROR", {"path": path, "error": str(e)})
+            self._update(primed=primed)
+        return primed
+
+    def run_once(self):
+        """执行一次预热，返回本次新识别的文件数"""
+        started = time.time()
+        self._update(state="running", started_at=started, finished_at=None, duration=None,
+                     total=0, cached=0, queued=0, done=0, failed=0, deferred=0, primed=0)
+        done = failed = deferred = primed = 0
+        try:
+            running = running_executables() if self.include_running else {}
+            paths = self.candidate_paths(running)
+            pending = []
+            cached = 0
+            for path in paths:
+                key, result = self.cache.get(path)
+                if key is None:
+                    continue
+                if result is not None:
+                    cached += 1
+                else:
+                    pending.append((key, path))
+            self._update(total=len(paths), cached=cached, queued=len(pending))
+
+            if pending:
+                with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_lower_priority) as pool:
+                    futures = {pool.submit(self.probe, path): key for key, path in pending}
+                    for future in as_completed(futures):
+                        if self._stop.is_set():
+                            for f in futures:
+                                f.cancel()
+                            break
+                        try:
+                            result = future.result()
+                            # 无法解析的文件需要在主进程中用系统 API 补充版本信息，留给识别时处理
+                            if result.get("pe_parsed", True):
+                                self.cache.put(futures[future], result)
+                            else:
+                                deferred += 1
+                            done += 1
+                        except Exception:
+                            failed += 1
+                        self._update(done=done, failed=failed, deferred=deferred)
+
+            if self.prime is not None and not self._stop.is_set():
+                primed = self._prime_running(running)
+        except Exception as e:
+            log_to_file(f"识别缓存预热失败: {str(e)}", "ERROR")
+        finally:
+            finished = time.time()
+            with self._lock:
+                self._progress.update(state="idle", finished_at=finished, duration=round(finished - started, 3))
+                self._progress["runs"] += 1
+        log_to_file(f"识别缓存预热完成: 新识别 {done} 个文件，失败 {failed} 个，预先识别 {primed} 个运行中的应用", "INFO")
+        return done
+
+    def start(self):
+        """启动后台线程：立即预热一次，之后周期性预热"""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name="identity-warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stop.set()
+
+
+_warmup = None
+_warmup_lock = threading.Lock()
+
+
+def get_warmup(prime=None):
+    """
+    进程内共享的预热任务（安装目录从设置 warmup_roots 读取）
+    prime 不为 None 时设置为运行中进程的识别函数
+    """
+    global _warmup
+    with _warmup_lock:
+        if _warmup is None:
+            _warmup = IdentityWarmup(
+                db_utils.exe_identity_cache,
+                roots=lambda: db_utils.load_settings().get("warmup_roots", [])
+            )
+        if prime is not None:
+            _warmup.prime = prime
+        return _warmup
+
+
+def stop_warmup():
+    with _warmup_lock:
+        if _warmup is not None:
+            _warmup.stop()
@@ -0,0 +1,238 @@
+import json
+import threading
+import time
+
+from app_index import InstalledAppIndex
+from db_pool import write_transaction, get_read_connection
+from logger import log_to_file
+
+# 需要扫描的卸载信息注册表键（HKEY_LOCAL_MACHINE 下）
+UNINSTALL_KEYS = (
+    r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall",
+    r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall",
+)
+
+CHECK_INTERVAL = 10 * 60         # 多久检查一次注册表键是否变化（秒）
+MAX_SNAPSHOT_AGE = 24 * 60 * 60  # 快照最长使用时间（秒），子键内的值变化不会更新父键的写入时间
+
+
+class WinRegistryReader:
+    """通过 winreg 读取卸载信息（仅 Windows）"""
+
+    hives = UNINSTALL_KEYS
+
+    def stamp(self, hive):
+        """
+        注册表键的变化标记：[最后写入时间, 子键数]
+        键不存在时返回 None
+        """
+        import winreg
+        try:
+            key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, hive)
+        except OSError:
+            return None
+        try:
+            subkeys, _, last_write = winreg.QueryInfoKey(key)
+            return [last_write, subkeys]
+        finally:
+            winreg.CloseKey(key)
+
+    def read(self, hive):
+        """读取一个卸载信息键下的全部应用"""
+        import winreg
+        apps = []
+        try:
+            key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, hive)
+        except OSError:
+            return apps
+        try:
+            for i in range(0, winreg.QueryInfoKey(key)[0]):
+                try:
+                    subkey = winreg.OpenKey(key, winreg.EnumKey(key, i))
+                except OSError:
+                    continue
+                try:
+                    app = self._read_app(winreg, subkey)
+                finally:
+                    winreg.CloseKey(subkey)
+                if app:
+                    apps.append(app)
+        finally:
+            winreg.CloseKey(key)
+        return apps
+
+    @staticmethod
+    def _read_app(winreg, subkey):
+        def value(name, default=None):
+            try:
+                return winreg.QueryValueEx(subkey, name)[0]
+            except OSError:
+                return default
+
+        display_name = value("DisplayName")
+        if not display_name:
+            return None
+        return {
+            "name": display_name,
+            "version": value("DisplayVersion", "Unknown"),
+            "install_location": value("InstallLocation", "Unknown")
+        }
+
+
+class InstalledAppsCatalog:
+    """
+    已安装应用目录
+    - 后台线程加载：先读数据库中的快照，再检查注册表键的最后写入时间，变化时才重新扫描
+    - 加载完成前 apps() 返回空列表，调用方不会被阻塞
+    - reader 可替换（stamp(hive) / read(hive) / hives），便于在非 Windows 环境测试
+    """
+
+    def __init__(self, reader=None, check_interval=CHECK_INTERVAL, max_age=MAX_SNAPSHOT_AGE):
+        self.reader = reader or WinRegistryReader()
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._hives = {}  # hive -> {"stamp", "apps", "updated_at"}
+        self._apps = []
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.ready = threading.Event()
+        self.version = 0
+        self._index = (None, None)  # (version, InstalledAppIndex)
+        self.stats = {"snapshot_loads": 0, "scans": 0, "errors": 0}
+
+    def start(self):
+        """启动后台加载线程（重复调用无效）"""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name="installed-apps", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.load_snapshot()
+        except Exception as e:
+            self.stats["errors"] += 1
+            log_to_file(f"读取已安装应用快照失败: {str(e)}", "ERROR")
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                self.stats["errors"] += 1
+                log_to_file(f"扫描已安装应用失败: {str(e)}", "ERROR")
+            self.ready.set()
+            if self._stop.wait(self.check_interval):
+                return
+
+    def load_snapshot(self):
+        """从数据库加载上次的扫描结果"""
+        conn = get_read_connection()
+        rows = conn.execute("SELECT hive, stamp, apps, updated_at FROM installed_apps_snapshot").fetchall()
+        hives = {}
+        for hive, stamp, apps, updated_at in rows:
+            try:
+                hives[hive] = {"stamp": json.loads(stamp) if stamp else None,
+                               "apps": json.loads(apps), "updated_at": updated_at or 0}
+            except (TypeError, ValueError):
+                continue
+        if hives:
+            with self._lock:
+                self._hives.update(hives)
+            self.stats["snapshot_loads"] += 1
+            self._publish()
+        return len(hives)
+
+    def refresh(self, force=False):
+        """
+        检查注册表键，只重新扫描写入时间变化（或快照过旧）的键
+        返回重新扫描的键数
+        """
+        now = int(time.time())
+        changed = {}
+        for hive in self.reader.hives:
+            stamp = self.reader.stamp(hive)
+            entry = self._hives.get(hive)
+            if (not force and entry is not None and entry["stamp"] == stamp
+                    and now - entry["updated_at"] < self.max_age):
+                continue
+            apps = self.reader.read(hive) if stamp is not None else []
+            changed[hive] = {"stamp": stamp, "apps": apps, "updated_at": now}
+            self.stats["scans"] += 1
+        if changed:
+            with self._lock:
+                self._hives.update(changed)
+            self._publish()
+            self._save(changed)
+        return len(changed)
+
+    def _save(self, hives):
+        with write_transaction() as conn:
+            conn.executemany("""
+                INSERT INTO installed_apps_snapshot (hive, stamp, apps, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (hive) DO UPDATE SET
+                    stamp = excluded.stamp,
+                    apps = excluded.apps,
+                    updated_at = excluded.updated_at
+            """, [(hive, json.dumps(entry["stamp"]), json.dumps(entry["apps"], ensure_ascii=False),
+                   entry["updated_at"]) for hive, entry in hives.items()])
+
+    def _publish(self):
+        """按注册表键顺序合并为新列表（整体替换，读取方无需加锁）"""
+        with self._lock:
+            apps = [app for hive in self.reader.hives for app in self._hives.get(hive, {}).get("apps", [])]
+            self._apps = apps
+            self.version += 1
+            version = self.version
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(version, apps)
+            except Exception as e:
+                log_to_file(f"已安装应用变更通知失败: {str(e)}", "ERROR")
+
+    def subscribe(self, callback):
+        """注册变更回调 callback(version, apps)"""
+        with self._lock:
+            self._listeners.append(callback)
+        return callback
+
+    def apps(self):
+        """当前的已安装应用列表（加载完成前为空）"""
+        return self._apps
+
+    def index(self):
+        """当前应用列表的查找索引，列表变化后首次调用时重建"""
+        with self._lock:
+            version, index = self._index
+            if version == self.version and index is not None:
+                return index
+            version, apps = self.version, self._apps
+        index = InstalledAppIndex(apps)
+        with self._lock:
+            if self._index[0] is None or self._index[0] < version:
+                self._index = (version, index)
+        return index
+
+    def wait(self, timeout=None):
+        """等待首次加载完成"""
+        return self.ready.wait(timeout)
+
+    def stop(self):
+        self._stop.set()
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """进程内共享的已安装应用目录（首次调用时在后台开始加载）"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = InstalledAppsCatalog().start()
+        return _catalog
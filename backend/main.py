@@ -3,15 +3,22 @@ import time
 from datetime import datetime
 import psutil
 import platform
-import re
+import rule_matcher
 from fastapi import FastAPI, Body, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from db_utils import log_usage, get_blacklist, get_whitelist, get_blocked_apps_count, init_db, save_settings, load_settings
+from db_utils import log_usage, get_blocked_apps_count, init_db, save_settings, load_settings, get_rule_matcher, store_app_identifier, exe_identity_cache
 from routes.setting import router as settings_router
 from routes.apps import router as apps_router
 from api import router as main_router
 from enhanced_app_identifier import EnhancedAppIdentifier
+from process_cache import get_process_cache
+from title_extractor import extract_app_title
+import identification_service
+import identity_warmup
+import process_watcher
+import sampling_scheduler
+import write_queue
 from logger import log_to_file, log_api_request
 
 # ------------------------------
@@ -48,9 +55,24 @@ app.include_router(apps_router)
 # app.mount("/", StaticFiles(directory="../frontend/dist", html=True), name="frontend")
 
 # ------------------------------
-# 初始化数据库
+# 初始化数据库并启动监控
 # ------------------------------
-init_db()
+# 放在启动事件中而不是模块顶层：预热进程池的子进程会重新导入本模块，但不会触发启动事件
+@app.on_event("startup")
+def start_services():
+    init_db()
+    start_monitor_thread()
+
+# 退出前把所有写后队列（使用记录、后台时长、应用标识、识别缓存）写盘，不依赖 atexit
+@app.on_event("shutdown")
+def flush_pending_usage():
+    identity_warmup.stop_warmup()
+    process_watcher.stop_process_watcher()
+    # 先停识别服务：正在执行的识别完成后，结果回调还会写入应用标识队列
+    identification_service.stop_all(timeout=2.0)
+    # 仍在等待识别的使用记录按当前结果写入，不丢时长
+    flush_deferred_usage(force=True)
+    write_queue.stop_all()
 
 # ------------------------------
 # 全局状态
@@ -65,11 +87,19 @@ monitor_data = {
 # 挂机开始时间
 idle_start = None
 
+# 前台识别服务（由 start_monitor_thread 创建）
+identification = None
+
+# 识别未完成的使用记录 (程序名, 标题, 时长, 路径, 结束时刻)，识别完成后再以正式标识写入
+deferred_usage = []
+deferred_usage_lock = threading.Lock()
+DEFERRED_USAGE_TIMEOUT = 5 * 60  # 秒，超过后仍未识别（如识别失败）时以临时标识写入
+
 # ------------------------------
 # 获取前台应用函数
 # ------------------------------
 def get_foreground_app():
-    """获取前台应用的进程名和窗口标题"""
+    """获取前台应用的进程名、窗口标题、可执行文件路径、进程ID和进程创建时间"""
     try:
         import ctypes
         import ctypes.wintypes
@@ -81,9 +111,11 @@ def get_foreground_app():
         pid = ctypes.c_ulong()
         ctypes.windll.user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
         
-        # 获取进程信息
-        proc = psutil.Process(pid.value)
-        exe_name = proc.name()
+        # 获取进程信息（按 (pid, 创建时间) 缓存，同一进程只读一次）
+        info = get_process_cache().get(pid.value)
+        if info is None:
+            raise psutil.NoSuchProcess(pid.value)
+        exe_name = info["name"]
         
         # 获取窗口标题
         length = ctypes.windll.user32.GetWindowTextLengthW(hwnd)
@@ -94,67 +126,10 @@ def get_foreground_app():
         else:
             title = ""
             
-        return exe_name, title
+        return exe_name, title, info["exe"], pid.value, info["create_time"]
     except Exception as e:
         print(f"获取前台应用失败: {e}")
-        return "Unknown", "Unknown"
-
-def extract_app_title(exe_name, window_title):
-    """
-    智能提取应用标题，按照指定规则处理
-    规则:
-    1. 窗口标题与程序名相同时，取相同部分并转为大写
-    2. 大小写选大写
-    3. 若只部分匹配，取最相似的部分
-    4. 若无相同，按优先级取标题：
-       - 最后一个"-"后的内容
-       - exe文件名
-    """
-    # 移除.exe扩展名
-    exe_base_name = exe_name.replace('.exe', '').replace('.EXE', '')
-    
-    # 规则1: 窗口标题和程序名有相同部分，取相同部分（大小写选大写）
-    # 检查窗口标题是否包含程序名（大小写不敏感）
-    if exe_base_name.lower() in window_title.lower():
-        # 找到匹配的部分
-        start_idx = window_title.lower().find(exe_base_name.lower())
-        if start_idx != -1:
-            matched_part = window_title[start_idx:start_idx + len(exe_base_name)]
-            # 返回首字母大写的形式
-            return matched_part.capitalize()
-    
-    # 规则2: 若只部分匹配
-    # 例如: 窗口标题"预览 - 无标题 (工作区) - Traeasd CN" 程序名"traea.exe" -> 返回"Traee"
-    if len(exe_base_name) > 0:
-        # 寻找最佳匹配的子串
-        best_match = exe_base_name  # 默认返回程序名
-        best_score = 0
-        
-        # 遍历窗口标题的所有可能子串
-        for i in range(len(window_title) - len(exe_base_name) + 1):
-            substring = window_title[i:i + len(exe_base_name)]
-            # 计算相似度得分
-            score = sum(1 for a, b in zip(exe_base_name.lower(), substring.lower()) if a == b)
-            
-            # 更新最佳匹配
-            if score > best_score:
-                best_score = score
-                best_match = substring
-        
-        # 根据规则选择大小写形式
-        # 如果匹配度较高，则返回匹配的子串（首字母大写）
-        if best_score >= len(exe_base_name) * 0.5:  # 50%以上的匹配度
-            return best_match.capitalize()
-    
-    # 规则3: 若无相同部分，按照优先顺序取标题
-    # 优先级1: 取最后一个"-"符号后的内容
-    if " - " in window_title:
-        parts = window_title.split(" - ")
-        if parts:
-            return parts[-1]  # 取最后一个部分
-    
-    # 优先级2: 取exe文件名（不包含扩展名）
-    return exe_base_name.capitalize()
+        return "Unknown", "Unknown", "", None, None
 
 def wildcard_match(pattern, text):
     """
@@ -163,27 +138,14 @@ def wildcard_match(pattern, text):
     ? 匹配单个任意字符
     进行大小写不敏感匹配
     """
-    if not pattern or not text:
-        return False
-    
-    # 将通配符模式转换为正则表达式
-    # 先转义特殊字符，但保留通配符
-    regex_pattern = re.escape(pattern)
-    # 将转义后的通配符替换回正则表达式模式
-    # 注意：re.escape会将*转为\*，将?转为\?
-    regex_pattern = regex_pattern.replace(r'\*', '.*').replace(r'\?', '.')
-    
-    # 使用 ^ 和 $ 锚点进行完整匹配
-    regex_pattern = '^' + regex_pattern + '$'
-    
-    # 进行大小写不敏感匹配
-    return bool(re.search(regex_pattern, text, re.IGNORECASE))
+    # 编译结果按模式缓存，见 rule_matcher
+    return rule_matcher.wildcard_match(pattern, text)
 
 # ------------------------------
 # 挂机检测
 # ------------------------------
-def is_idle():
-    """检测是否处于挂机状态"""
+def last_input_tick():
+    """上次键鼠输入的时刻（GetTickCount 毫秒），获取失败时返回 None"""
     import ctypes
     
     # 获取上次输入时间
@@ -194,9 +156,18 @@ def is_idle():
     last_input.cbSize = ctypes.sizeof(LASTINPUTINFO)
     
     if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(last_input)):
+        return last_input.dwTime
+    return None
+
+def is_idle():
+    """检测是否处于挂机状态"""
+    import ctypes
+    
+    last_input = last_input_tick()
+    if last_input is not None:
         # 计算空闲时间（毫秒）
         current_time = ctypes.windll.kernel32.GetTickCount()
-        idle_time = current_time - last_input.dwTime
+        idle_time = current_time - last_input
         
         # 如果空闲时间超过阈值（毫秒），则认为挂机
         return idle_time > 60000, idle_time / 1000
@@ -226,44 +197,81 @@ def handle_idle_end(app_name=""):
 # ------------------------------
 # 监控线程
 # ------------------------------
-def monitor_foreground():
+def register_identity(process_name, executable_path, app_info):
+    """后台识别完成后登记应用标识"""
+    store_app_identifier(None, app_info.get("unique_id") or process_name,
+                         app_info.get("identifier_type", "APPID"), process_name, executable_path, app_info)
+
+def log_identified_usage(exe_name, app_title, duration, process_path):
+    """
+    记录一段使用时长，标识取后台识别的正式结果
+    识别未完成时先暂存，由 flush_deferred_usage 在识别完成后写入，避免同一应用以进程名和正式标识各记一份
+    """
+    with deferred_usage_lock:
+        deferred_usage.append((exe_name, app_title, duration, process_path, int(time.time())))
+    flush_deferred_usage()
+
+def flush_deferred_usage(force=False):
+    """
+    写入已识别完成的暂存记录（按原结束时刻记账）
+    超过 DEFERRED_USAGE_TIMEOUT 仍未识别，或 force=True（退出时）时，以临时标识写入作为兜底
+    """
+    if identification is None:
+        return
+    now = time.time()
+    with deferred_usage_lock:
+        remaining = []
+        for exe_name, app_title, duration, process_path, end_ts in deferred_usage:
+            app_info = identification.lookup(exe_name, process_path)
+            provisional = app_info.get("provisional")
+            if provisional and not force and now - end_ts < DEFERRED_USAGE_TIMEOUT:
+                remaining.append((exe_name, app_title, duration, process_path, end_ts))
+                continue
+            # 确保唯一标识符不为空
+            unique_id = app_info.get("unique_id") or exe_name
+            # 使用正确的标识符类型
+            identifier_type = app_info.get("identifier_type", "APPID")
+            # 登记应用标识（内存判断，新标识批量写库）；临时标识在识别完成后由回调登记
+            if not provisional:
+                store_app_identifier(None, unique_id, identifier_type, exe_name, process_path, app_info)
+            log_usage(exe_name, app_title, duration, unique_id, identifier_type, end_ts=end_ts)
+        deferred_usage[:] = remaining
+
+def monitor_foreground(identification):
     last_exe, last_title, last_start = None, None, None
-    app_identifier = EnhancedAppIdentifier()  # 创建应用标识符实例
     process_info_cache = {}  # 缓存进程信息
+    last_blocked = None  # 上次检测到的黑名单窗口 (程序名, 标题)，同一窗口只记录一次
+    # 自适应采样：切换后快速采样，稳定或挂机时逐步放慢；有输入时立即唤醒
+    scheduler = sampling_scheduler.register(
+        sampling_scheduler.AdaptiveScheduler.from_settings(load_settings(), probe=last_input_tick, name="foreground")
+    )
 
     while True:
+        scheduler.wait()
         try:
+            # 写入识别已完成的暂存记录
+            flush_deferred_usage()
             # 挂机检测
             idle, idle_seconds = is_idle()
+            scheduler.set_idle(idle)
             if idle:
                 if last_exe:
                     handle_idle_start(last_exe)
-                time.sleep(5)  # 挂机时降低检测频率
+                scheduler.stable()  # 挂机时降低检测频率
                 continue
             else:
                 if idle_start and last_exe:
                     handle_idle_end(last_exe)
 
-            exe_name, title = get_foreground_app()
+            exe_name, title, process_path, pid, create_time = get_foreground_app()
             # 使用智能提取函数处理应用标题
             app_title = extract_app_title(exe_name, title)
             
-            # 获取进程完整路径
-            process_path = ""
-            try:
-                # 尝试获取进程完整路径
-                import ctypes
-                pid = ctypes.c_ulong()
-                hwnd = ctypes.windll.user32.GetForegroundWindow()
-                ctypes.windll.user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
-                proc = psutil.Process(pid.value)
-                process_path = proc.exe()
-                # 缓存进程信息
+            # 缓存进程路径；无法获取时（如权限不足）使用同名进程上次的路径
+            if process_path:
                 process_info_cache[exe_name] = process_path
-            except:
-                # 如果无法获取，尝试从缓存中获取
-                if exe_name in process_info_cache:
-                    process_path = process_info_cache[exe_name]
+            else:
+                process_path = process_info_cache.get(exe_name, "")
             
             now = datetime.now()
             
@@ -271,43 +279,24 @@ def monitor_foreground():
             monitor_data["current_app"] = title
             monitor_data["blocked_count"] = get_blocked_apps_count()
 
-            blacklist = get_blacklist()
-            whitelist = get_whitelist()
-
-            # 白名单检测（优先级更高）
-            is_whitelisted = False
-            for w_exe, w_title in whitelist:
-                if (wildcard_match(w_exe, exe_name) or 
-                    (w_title and wildcard_match(w_title, title))):
-                    is_whitelisted = True
-                    break
-
-            # 黑名单检测（仅在非白名单时生效）
-            is_blacklisted = False
-            if not is_whitelisted:
-                for b_exe, b_title in blacklist:
-                    if (wildcard_match(b_exe, exe_name) or 
-                        (b_title and wildcard_match(b_title, title))):
-                        is_blacklisted = True
-                        break
+            # 黑白名单检测：编译后的匹配器一次完成，白名单优先
+            is_blacklisted = get_rule_matcher().classify(exe_name, title) == "blacklist"
 
-            # 如果是黑名单应用且不是白名单应用，则终止进程
+            # 如果是黑名单应用且不是白名单应用，则终止前台窗口所属进程的进程树（同名的其他进程不受影响）
+            # （按程序名命中的黑名单在启动时已由进程监视器结束，这里处理按标题命中的情况）
             if is_blacklisted:
-                for p in psutil.process_iter(['name']):
-                    if p.info['name'] == exe_name:
-                        p.kill()
-                # 记录黑名单应用的使用，使用处理后的标题
-                # 使用应用标识符识别应用，传入完整路径
-                app_info = app_identifier.identify_app(exe_name, process_path)
-                # 确保唯一标识符不为空
-                unique_id = app_info.get("unique_id", exe_name)
-                if not unique_id:
-                    unique_id = exe_name
-                # 使用正确的标识符类型
-                identifier_type = app_info.get("identifier_type", "APPID")
-                log_usage(exe_name, app_title, 0, unique_id, identifier_type)
-                time.sleep(1)
+                # 结束进程由进程监视线程执行，监控循环不等待进程退出
+                if pid is not None:
+                    process_watcher.get_process_watcher().request_kill(pid, create_time, exe_name)
+                if last_blocked != (exe_name, title):
+                    last_blocked = (exe_name, title)
+                    # 记录黑名单应用的使用，使用处理后的标题（识别完成后以正式标识写入）
+                    log_identified_usage(exe_name, app_title, 0, process_path)
+                    scheduler.activity()  # 首次发现时尽快复查是否已结束
+                else:
+                    scheduler.stable()
                 continue
+            last_blocked = None
 
             # 应用切换检测
             if (last_exe != exe_name or last_title != title):
@@ -318,39 +307,41 @@ def monitor_foreground():
                         # 使用上一个应用的信息，但使用智能提取的标题
                         last_app_title = extract_app_title(last_exe, last_title)
                         
-                        # 使用应用标识符识别应用，尝试获取路径
+                        # 记录应用使用日志，包含唯一标识符和标识类型（识别未完成时等识别完成再写入）
                         last_process_path = process_info_cache.get(last_exe, "")
-                        app_info = app_identifier.identify_app(last_exe, last_process_path)
-                        # 确保唯一标识符不为空
-                        unique_id = app_info.get("unique_id", last_exe)
-                        if not unique_id:
-                            unique_id = last_exe
-                        # 使用正确的标识符类型
-                        identifier_type = app_info.get("identifier_type", "APPID")
-                        
-                        # 记录应用使用日志，包含唯一标识符和标识类型
-                        log_usage(last_exe, last_app_title, duration, unique_id, identifier_type)
+                        log_identified_usage(last_exe, last_app_title, duration, last_process_path)
                         monitor_data["work_time_elapsed"] += duration
                 
-                # 更新当前应用信息
+                # 更新当前应用信息，并提前提交新应用的识别任务
                 last_exe, last_title, last_start = exe_name, title, now
-
-            time.sleep(1)
+                identification.lookup(exe_name, process_path)
+                scheduler.activity()
+            else:
+                scheduler.stable()
         except Exception as e:
             print("Monitor error:", e)
-            time.sleep(1)
+            scheduler.stable()
 
 # ------------------------------
 # 启动线程
 # ------------------------------
 def start_monitor_thread():
-    t = threading.Thread(target=monitor_foreground, daemon=True)
+    global identification
+    app_identifier = EnhancedAppIdentifier(file_cache=exe_identity_cache)  # 创建应用标识符实例
+    # 识别（读文件、校验签名）放到后台线程池，监控循环只查内存，不会被慢文件卡住
+    identification = identification_service.register(
+        identification_service.IdentificationService(app_identifier.identify_app, on_resolved=register_identity)
+    )
+    t = threading.Thread(target=monitor_foreground, args=(identification,), daemon=True)
     t.start()
+    # 后台预热识别缓存和运行中进程的识别结果，之后的应用切换直接得到正式结果
+    identity_warmup.get_warmup(prime=identification.prime).start()
+    # 黑名单程序一启动就结束，不必等到切到前台
+    process_watcher.get_process_watcher().start()
 
 # ------------------------------
 # 启动
 # ------------------------------
 if __name__ == "__main__":
-    start_monitor_thread()
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=30022)
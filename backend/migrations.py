@@ -0,0 +1,298 @@
+"""
+数据库结构迁移
+每个迁移有递增的版本号，已执行的版本记录在 schema_version 表中
+迁移本身必须可重复执行（IF NOT EXISTS / 先检查列是否存在），以兼容手工改过的旧库
+"""
+
+from datetime import datetime
+
+from db_pool import write_transaction, get_read_connection
+from logger import log_to_file
+import rollup
+
+
+def _column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def _add_column(conn, table, column, definition):
+    if not _column_exists(conn, table, column):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _m001_base_tables(conn):
+    """基础表"""
+    # 应用使用日志（更新表结构以支持存储应用唯一标识符和标识类型）
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS app_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        start_time TEXT,
+        exe_name TEXT,
+        app_name TEXT,
+        duration INTEGER,
+        unique_id TEXT,
+        identifier_type TEXT
+    )
+    ''')
+
+    # 黑名单应用（保留旧结构，兼容）
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS blacklist_apps (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        exe_name TEXT,
+        app_name TEXT
+    )
+    ''')
+
+    # 白名单应用（保留旧结构，兼容）
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS whitelist_apps (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        exe_name TEXT,
+        app_name TEXT
+    )
+    ''')
+
+    # 休息日设置（保留旧结构，兼容）
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS rest_days (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT
+    )
+    ''')
+
+    # 🔹 新的 settings 表（存 JSON 配置，只有一条记录）
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS settings (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        data TEXT
+    )
+    ''')
+
+
+def _m002_blocked_flag_and_identifiers(conn):
+    """routes/apps.py 查询所需的 is_blocked 列和 app_identifiers 表"""
+    _add_column(conn, "app_usage", "is_blocked", "INTEGER NOT NULL DEFAULT 0")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS app_identifiers (
+        unique_id TEXT PRIMARY KEY,
+        exe_name TEXT,
+        app_name TEXT,
+        identifier_type TEXT,
+        cooling_days INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+
+
+def _m003_hot_path_indexes(conn):
+    """热点查询的复合索引（替代 optimize_db.py 中的单列索引）"""
+    # 按应用 + 时间范围统计使用时长
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_app_usage_uid_start ON app_usage (unique_id, start_time)")
+    # 黑名单历史：WHERE is_blocked = 1 GROUP BY unique_id
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_app_usage_blocked_uid ON app_usage (is_blocked, unique_id)")
+    # 以上复合索引已覆盖旧的单列索引
+    conn.execute("DROP INDEX IF EXISTS idx_app_usage_unique_id")
+    conn.execute("DROP INDEX IF EXISTS idx_app_usage_is_blocked")
+
+
+def _m004_interval_columns(conn):
+    """
+    显式的会话区间（epoch 秒）和本地日期键
+    旧数据的 start_time 实际是写入时刻，即会话结束时间
+    """
+    _add_column(conn, "app_usage", "start_ts", "INTEGER")
+    _add_column(conn, "app_usage", "end_ts", "INTEGER")
+    _add_column(conn, "app_usage", "day", "TEXT")
+    # start_time 是本地时间，'utc' 修饰符把它换算成 UTC 再取 epoch
+    conn.execute("""
+        UPDATE app_usage
+        SET end_ts = CAST(strftime('%s', start_time, 'utc') AS INTEGER)
+        WHERE end_ts IS NULL AND start_time IS NOT NULL
+    """)
+    conn.execute("""
+        UPDATE app_usage
+        SET start_ts = end_ts - COALESCE(duration, 0)
+        WHERE start_ts IS NULL AND end_ts IS NOT NULL
+    """)
+    conn.execute("""
+        UPDATE app_usage
+        SET day = date(start_ts, 'unixepoch', 'localtime')
+        WHERE day IS NULL AND start_ts IS NOT NULL
+    """)
+    # 按应用 + 日期范围统计
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_app_usage_uid_day ON app_usage (unique_id, day)")
+    # 所有应用的日期范围统计
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_app_usage_day_uid ON app_usage (day, unique_id)")
+    # start_time 不再用于过滤
+    conn.execute("DROP INDEX IF EXISTS idx_app_usage_uid_start")
+    conn.execute("DROP INDEX IF EXISTS idx_app_usage_start_time")
+
+
+def _m005_daily_rollup(conn):
+    """按 (应用, 日期) 增量维护的汇总表，并用历史数据初始化"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS app_daily_usage (
+        unique_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        seconds INTEGER NOT NULL DEFAULT 0,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (unique_id, day)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_app_daily_usage_day ON app_daily_usage (day)")
+    rollup.rebuild(conn)
+
+
+def _m006_app_identity(conn):
+    """
+    独立的应用标识表，替代 app_usage 中 duration=0 的占位记录
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS app_identity (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        unique_id TEXT NOT NULL,
+        identifier_type TEXT NOT NULL DEFAULT '',
+        exe_name TEXT,
+        executable_path TEXT,
+        metadata TEXT,
+        first_seen INTEGER,
+        last_seen INTEGER,
+        UNIQUE (unique_id, identifier_type)
+    )
+    ''')
+    # 从历史使用记录中回填
+    conn.execute("""
+        INSERT OR IGNORE INTO app_identity
+            (unique_id, identifier_type, exe_name, first_seen, last_seen)
+        SELECT unique_id, COALESCE(identifier_type, ''), MAX(NULLIF(exe_name, '')),
+               MIN(start_ts), MAX(end_ts)
+        FROM app_usage
+        WHERE unique_id IS NOT NULL AND unique_id != ''
+        GROUP BY unique_id, COALESCE(identifier_type, '')
+    """)
+    # 删除 store_app_identifier 旧实现写入的占位记录
+    conn.execute("""
+        DELETE FROM app_usage
+        WHERE duration = 0 AND exe_name = '' AND app_name = ''
+          AND unique_id IS NOT NULL AND unique_id != ''
+    """)
+
+
+def _m007_exe_identity_cache(conn):
+    """可执行文件识别结果缓存，按 (路径, 大小, 修改时间) 判断是否有效"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS exe_identity_cache (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        result TEXT NOT NULL,
+        updated_at INTEGER
+    )
+    ''')
+
+
+def _m008_installed_apps_snapshot(conn):
+    """已安装应用注册表扫描结果快照，每个注册表键一行，键的最后写入时间变化时才重新扫描"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS installed_apps_snapshot (
+        hive TEXT PRIMARY KEY,
+        stamp TEXT,
+        apps TEXT NOT NULL,
+        updated_at INTEGER
+    )
+    ''')
+
+
+def _m009_background_usage(conn):
+    """后台活动（可见的非前台窗口、后台播放声音）按 (应用, 日期) 累计，与前台使用分开统计"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS app_background_usage (
+        unique_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        exe_name TEXT,
+        seconds INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (unique_id, day)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_app_background_usage_day ON app_background_usage (day)")
+
+
+def _m010_reset_exe_identity_cache(conn):
+    """签名校验开始验证证书链，旧的识别结果可能把自签名文件判为 Signed，全部重新识别"""
+    conn.execute("DELETE FROM exe_identity_cache")
+
+
+def _m011_app_usage_meta(conn):
+    """每个应用一行的元数据（程序名、标题、标识类型），应用列表不再对 app_usage 全表分组"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS app_usage_meta (
+        unique_id TEXT PRIMARY KEY,
+        exe_name TEXT,
+        app_name TEXT,
+        identifier_type TEXT,
+        last_ts INTEGER
+    ) WITHOUT ROWID
+    ''')
+    rollup.rebuild_metadata(conn)
+
+
+# 按版本号顺序排列，只能追加，不能修改已发布的迁移
+MIGRATIONS = [
+    (1, "base tables", _m001_base_tables),
+    (2, "is_blocked column and app_identifiers table", _m002_blocked_flag_and_identifiers),
+    (3, "hot path indexes", _m003_hot_path_indexes),
+    (4, "start_ts/end_ts interval columns and day key", _m004_interval_columns),
+    (5, "app_daily_usage rollup table", _m005_daily_rollup),
+    (6, "app_identity registry table", _m006_app_identity),
+    (7, "exe_identity_cache table", _m007_exe_identity_cache),
+    (8, "installed_apps_snapshot table", _m008_installed_apps_snapshot),
+    (9, "app_background_usage table", _m009_background_usage),
+    (10, "reset exe_identity_cache for chain-verified signatures", _m010_reset_exe_identity_cache),
+    (11, "app_usage_meta table", _m011_app_usage_meta),
+]
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TEXT
+    )
+    ''')
+
+
+def get_schema_version():
+    """当前数据库的结构版本（未初始化时为0）"""
+    conn = get_read_connection()
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def run_migrations():
+    """
+    执行所有未执行的迁移，每个迁移一个事务
+    返回本次执行的版本号列表
+    """
+    with write_transaction() as conn:
+        _ensure_version_table(conn)
+        applied = {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+    executed = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with write_transaction() as conn:
+            migrate(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().isoformat())
+            )
+        executed.append(version)
+        log_to_file(f"数据库迁移 {version} 完成: {description}", "INFO")
+    return executed
@@ -3,20 +3,23 @@ import psutil
 import requests
 import ctypes
 import os
-import re
+import rule_matcher
 from datetime import datetime, timedelta
 from math import ceil
 
 # 导入应用标识符类
 from enhanced_app_identifier import EnhancedAppIdentifier
+import identification_service
 # 导入数据库工具
 import db_utils
 from db_utils import log_usage, load_settings
-# 导入增强监控器
-from enhanced_monitor import EnhancedMonitor
+# 多进程活动跟踪（前台/可见窗口/后台声音）
+from activity_tracker import BACKGROUND, get_activity_tracker
+from process_cache import get_process_cache
+import sampling_scheduler
 
 # ========== 配置 ==========
-CHECK_INTERVAL = 30  # 秒
+CHECK_INTERVAL = 30  # 秒，稳定时的最长采样间隔
 IDLE_THRESHOLD = 60  # 秒，超过认为挂机
 LOG_API = "http://localhost:30022/api/logs"  # 日志API地址
 
@@ -24,11 +27,15 @@ LOG_API = "http://localhost:30022/api/logs"  # 日志API地址
 reward_period = None       # 奖励时间段信息
 idle_start = None          # 挂机开始时间
 app_identifier = None      # 应用标识符实例
-process_identifier_cache = {}  # 进程ID到标识符的缓存
+identification = None      # 后台识别服务
+process_identifier_cache = {}  # (pid, 创建时间) 到标识符的缓存，进程退出时清理
 current_exe = None         # 当前前台应用
 current_pid = None         # 当前前台应用进程ID
-current_identifier = None  # 当前前台应用标识符
-enhanced_monitors = {}     # 增强监控器实例字典，按PID管理
+current_identifier = None  # 当前前台应用标识符（识别未完成时带 provisional，之后每次采样重新获取）
+current_path = None        # 当前前台应用可执行文件路径
+pending_background = {}    # (pid, 创建时间) 到识别完成前累计的后台秒数
+last_accounted = None      # 上次累计黑名单时长的时刻（time.monotonic）
+_scheduler = None          # 采样调度器，见 get_scheduler
 
 # ========== 工具函数 ==========
 def send_log(message, exe="", type="info"):
@@ -51,64 +58,87 @@ def get_foreground_app():
         hwnd = user32.GetForegroundWindow()
         pid = ctypes.c_ulong()
         user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
-        proc = psutil.Process(pid.value)
+        # 按 (pid, 创建时间) 缓存，同一进程只读一次名称和路径
+        info = get_process_cache().get(pid.value)
+        if info is None:
+            return None
         return {
             "pid": pid.value,
-            "name": proc.name(),
-            "path": proc.exe() if hasattr(proc, 'exe') else ""
+            "name": info["name"],
+            "path": info["exe"]
         }
     except Exception as e:
         print(f"获取前台应用失败: {e}")
         return None
 
-def is_idle():
-    """检测是否空闲（键鼠无输入超过阈值）"""
+def last_input_tick():
+    """上次键鼠输入的时刻（GetTickCount 毫秒），获取失败时返回 None"""
     class LASTINPUTINFO(ctypes.Structure):
         _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
     lii = LASTINPUTINFO()
     lii.cbSize = ctypes.sizeof(LASTINPUTINFO)
     if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(lii)):
-        millis = ctypes.windll.kernel32.GetTickCount() - lii.dwTime
+        return lii.dwTime
+    return None
+
+def is_idle():
+    """检测是否空闲（键鼠无输入超过阈值）"""
+    last_input = last_input_tick()
+    if last_input is not None:
+        millis = ctypes.windll.kernel32.GetTickCount() - last_input
         return millis >= IDLE_THRESHOLD * 1000, millis // 1000
     return False, 0
 
+def get_scheduler():
+    """
+    监控循环的采样调度器：切换后 1 秒采样一次，稳定时逐步放慢到 CHECK_INTERVAL；
+    挂机中一有输入立即唤醒；间隔可在设置 sampling 项中调整；奖励结束按截止事件准时处理
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = sampling_scheduler.register(sampling_scheduler.AdaptiveScheduler.from_settings(
+            load_settings(), probe=last_input_tick, name="reward",
+            min_interval=1.0, max_interval=CHECK_INTERVAL, idle_interval=CHECK_INTERVAL * 2
+        ))
+    return _scheduler
+
+def _process_key(pid):
+    """进程的 (pid, 创建时间)，PID 被复用时与旧进程不同"""
+    return get_process_cache().key(pid) or (pid, None)
+
+def _forget_process(key):
+    """进程退出后清理以该进程为键的缓存"""
+    process_identifier_cache.pop(key, None)
+    pending_background.pop(key, None)
+
+get_process_cache().on_exit(_forget_process)
+
 def get_enhanced_monitor(pid, process_name=""):
-    """获取或创建指定PID的增强监控器实例"""
-    global enhanced_monitors
-    if pid not in enhanced_monitors:
-        # 导入去抖配置
-        try:
-            from .debounce_config import get_debounce_config, determine_app_type
-            app_type = determine_app_type(process_name)
-            debounce_config = get_debounce_config(app_type)
-            start_req = debounce_config["start_req"]
-            stop_req = debounce_config["stop_req"]
-        except ImportError:
-            # 如果配置文件不存在，使用默认值
-            start_req = 2
-            stop_req = 3
-            
-        # 创建新的增强监控器实例
-        enhanced_monitors[pid] = EnhancedMonitor(
-            pid, 
-            interval=1.0, 
-            v_thresh=0.3,
-            start_req=start_req,
-            stop_req=stop_req
-        )
-    return enhanced_monitors[pid]
-
-def cleanup_monitors():
-    """清理不再需要的监控器实例"""
-    global enhanced_monitors, current_pid
-    # 保留当前PID的监控器，删除其他所有监控器
-    if current_pid and current_pid in enhanced_monitors:
-        # 只保留当前PID的监控器
-        current_monitor = enhanced_monitors[current_pid]
-        enhanced_monitors = {current_pid: current_monitor}
-    else:
-        # 如果没有当前PID，清空所有监控器
-        enhanced_monitors = {}
+    """获取指定进程的增强监控器（由活动跟踪器管理，去抖状态跨应用切换保留）"""
+    return get_activity_tracker().monitor(pid)
+
+def record_background_activity():
+    """
+    记录后台活动：可见的非前台窗口、后台播放声音的进程，与前台使用分开统计
+    识别未完成的进程先暂存时长，识别完成后以正式标识入库，不会以临时标识留下记录
+    """
+    usage = {}
+    for (key, mode), seconds in get_activity_tracker().drain().items():
+        if mode == BACKGROUND:  # 前台使用时长由前台监控记录
+            usage[key] = usage.get(key, 0) + seconds
+    for key in pending_background:
+        usage.setdefault(key, 0)
+    for key, seconds in usage.items():
+        info = get_process_cache().get(key[0])
+        if info is None or info["key"] != key:
+            continue
+        seconds += pending_background.pop(key, 0)
+        identifier = get_app_identifier(key[0], info["name"], info["exe"])
+        if identifier.get("provisional"):
+            pending_background[key] = seconds
+            continue
+        if seconds > 0:
+            db_utils.log_background_usage(identifier["value"], info["name"], seconds)
 
 # ========== 挂机逻辑 ==========
 def handle_idle_start(app_info=None):
@@ -169,21 +199,47 @@ def handle_idle_end(app_info=None):
 def start_reward(minutes):
     """启动奖励时间段"""
     global reward_period, idle_start
+    if reward_period and reward_period.get("deadline") is not None:
+        get_scheduler().cancel(reward_period["deadline"])
     reward_period = {
         "start": datetime.now(),
         "end": datetime.now() + timedelta(minutes=minutes),
         "black_usage": {}
     }
+    # 到点准时结算，不等下一次采样
+    reward_period["deadline"] = get_scheduler().add_deadline(end_reward_period, at=reward_period["end"], name="reward_end")
     idle_start = None
     send_log(f"奖励时间段开始 {minutes} 分钟，结束时间: {reward_period['end'].strftime('%H:%M')}", type="info")
 
+def account_black_usage():
+    """把上次累计以来的时长计入当前黑名单应用（按实际经过时间，不按固定间隔）"""
+    global last_accounted
+    now = time.monotonic()
+    elapsed = 0 if last_accounted is None else min(now - last_accounted, CHECK_INTERVAL * 2)
+    last_accounted = now
+    if not reward_period or elapsed <= 0:
+        return
+    if current_exe and current_identifier and match_against_lists(current_identifier["value"]) == "blacklist":
+        usage = reward_period["black_usage"]
+        before = usage.get(current_exe, 0)
+        usage[current_exe] = before + elapsed
+        # 每累计满一分钟提示一次
+        if int(usage[current_exe]) // 60 != int(before) // 60:
+            send_log(f"用户使用黑名单应用 {current_exe}，累计 {int(usage[current_exe])//60} 分钟", exe=current_exe, type="warning")
+
+def end_reward_period():
+    """奖励结束的截止事件：先累计到结束时刻，再结算"""
+    if idle_start is None:
+        account_black_usage()
+    finalize_reward_period()
+
 def finalize_reward_period():
     """奖励时间段结束，统一扣除黑名单使用"""
     global reward_period
     if not reward_period:
         return
 
-    total_seconds = sum(reward_period["black_usage"].values())
+    total_seconds = int(sum(reward_period["black_usage"].values()))
     reward_duration = (reward_period["end"] - reward_period["start"]).seconds // 60
     deducted_minutes = min(ceil(total_seconds / 60), reward_duration)
 
@@ -196,13 +252,18 @@ def finalize_reward_period():
 
 # ========== 主循环 ==========
 def monitor_loop():
-    global reward_period, app_identifier, current_exe, current_pid, current_identifier
+    global reward_period, app_identifier, identification, current_exe, current_pid, current_identifier, current_path, last_accounted
     
-    # 初始化应用标识符
-    app_identifier = EnhancedAppIdentifier()
+    # 初始化应用标识符，识别任务交给后台线程池
+    app_identifier = EnhancedAppIdentifier(file_cache=db_utils.exe_identity_cache)
+    identification = identification_service.register(
+        identification_service.IdentificationService(app_identifier.identify_app)
+    )
+    scheduler = get_scheduler()
     send_log("监控已启动，应用标识符已初始化", type="info")
 
     while True:
+        scheduler.wait()
         try:
             # 检查是否空闲
             idle, idle_seconds = is_idle()
@@ -217,11 +278,9 @@ def monitor_loop():
                 foreground_app["pid"] != current_pid
             ):
                 app_switched = True
-                # 记录上一个应用的使用
-                if current_exe and current_identifier:
-                    # 如果有之前的PID，清理不再需要的监控器
-                    cleanup_monitors()
-                
+                # 切换前的时长计入上一个应用
+                if idle_start is None:
+                    account_black_usage()
                 # 更新当前应用信息
                 current_exe = foreground_app["name"]
                 current_pid = foreground_app["pid"]
@@ -231,12 +290,6 @@ def monitor_loop():
                 if app_switched:
                     current_identifier = get_app_identifier(current_pid, current_exe, current_path)
                     
-                    # 获取增强监控器实例
-                    if current_pid:
-                        monitor = get_enhanced_monitor(current_pid, current_exe)
-                        # 重置监控器计数器，因为这是新应用
-                        monitor.reset_counts()
-                    
                     # 检查是否匹配黑白名单
                     list_type = match_against_lists(current_identifier["value"])
                     
@@ -250,35 +303,50 @@ def monitor_loop():
                     else:
                         send_log(f"切换到应用: {current_exe} (标识: {current_identifier['value']}, 类型: {current_identifier['type']})", 
                                exe=current_exe)
+            elif current_identifier and current_identifier.get("provisional"):
+                # 切换时识别尚未完成，用的是临时标识；识别完成后换成正式标识，之后按正式标识匹配黑白名单
+                current_identifier = get_app_identifier(current_pid, current_exe, current_path)
+                if not current_identifier.get("provisional"):
+                    list_type = match_against_lists(current_identifier["value"])
+                    if list_type == "blacklist":
+                        send_log(f"识别完成，当前为黑名单应用: {current_exe} (标识: {current_identifier['value']}, 类型: {current_identifier['type']})",
+                               exe=current_exe, type="warning")
+                    elif list_type == "whitelist":
+                        send_log(f"识别完成，当前为白名单应用: {current_exe} (标识: {current_identifier['value']}, 类型: {current_identifier['type']})",
+                               exe=current_exe)
             
+            # 所有候选进程共用一份窗口快照和音频会话表，一次判断（挂机时只统计后台声音）
+            get_activity_tracker().tick(idle=idle)
+            record_background_activity()
+
             # 挂机处理
+            scheduler.set_idle(idle)
             if idle:
                 if foreground_app:
                     handle_idle_start(foreground_app)
-                time.sleep(CHECK_INTERVAL)
+                last_accounted = None  # 挂机时间不计入黑名单使用
+                scheduler.stable()
                 continue
             else:
                 if idle_start and foreground_app:
                     handle_idle_end(foreground_app)
 
-            # 应用使用统计
+            # 应用使用统计（奖励结束由截止事件处理，这里兜底）
             now = datetime.now()
-            if reward_period:
-                # 奖励时间段结束检查
-                if now >= reward_period["end"]:
-                    finalize_reward_period()
-                    continue
-                
-                # 检查当前应用是否在黑名单中
-                if current_exe and current_identifier and match_against_lists(current_identifier["value"]) == "blacklist":
-                    reward_period["black_usage"][current_exe] = reward_period["black_usage"].get(current_exe, 0) + CHECK_INTERVAL
-                    send_log(f"用户使用黑名单应用 {current_exe}，累计 {reward_period['black_usage'][current_exe]//60} 分钟", exe=current_exe, type="warning")
-                # 白名单应用不需要特别处理
+            if reward_period and now >= reward_period["end"]:
+                end_reward_period()
+            else:
+                # 检查当前应用是否在黑名单中；白名单应用不需要特别处理
+                account_black_usage()
+
+            if app_switched or current_identifier and current_identifier.get("provisional"):
+                scheduler.activity()  # 识别完成前保持快速采样，尽快换成正式标识
+            else:
+                scheduler.stable()
 
         except Exception as e:
             send_log(f"监控出错: {e}", type="error")
-
-        time.sleep(CHECK_INTERVAL)
+            scheduler.stable()
 
 # ========== 测试启动 ==========
 if __name__ == "__main__":
@@ -294,13 +362,15 @@ def get_app_identifier(pid, process_name, executable_path):
     4. exe文件名称
     
     首次切换软件时获取并存储到数据库，之后从缓存获取
+    识别在后台进行，未完成时返回基于路径/文件名的临时标识（带 provisional=True），不缓存也不入库
     """
-    # 检查进程级缓存
-    if pid in process_identifier_cache:
-        return process_identifier_cache[pid]
+    # 检查进程级缓存（按 (pid, 创建时间)，PID 被复用时不会命中旧进程的标识）
+    key = _process_key(pid)
+    if key in process_identifier_cache:
+        return process_identifier_cache[key]
     
-    # 获取应用识别信息
-    app_info = app_identifier.identify_app(process_name, executable_path)
+    # 获取应用识别信息（不阻塞）
+    app_info = identification.lookup(process_name, executable_path)
     
     # 初始化标识符
     identifier = {
@@ -346,40 +416,27 @@ def get_app_identifier(pid, process_name, executable_path):
         identifier["value"] = f"unknown_{pid}"
         identifier["type"] = "未知"
     
-    # 检查数据库中是否已存在该标识符
+    if app_info.get("provisional"):
+        identifier["provisional"] = True
+        return identifier
+    
+    # 登记到应用标识注册表（内存判断是否新应用，新标识批量写库）
     try:
-        if not db_utils.check_app_identifier_exists(identifier["value"], identifier["type"]):
-            # 如果数据库中不存在，则存储
-            db_utils.store_app_identifier(pid, identifier["value"], identifier["type"])
+        if db_utils.store_app_identifier(pid, identifier["value"], identifier["type"],
+                                         process_name, executable_path, app_info):
             print(f"新应用标识符存储: {identifier['value']} ({identifier['type']})")
     except Exception as e:
         print(f"数据库操作失败: {e}")
     
-    # 存储到进程级缓存
-    process_identifier_cache[pid] = identifier
+    # 存储到进程级缓存（进程退出时由 _forget_process 清理）
+    process_identifier_cache[key] = identifier
     
     return identifier
 
 def match_against_lists(identifier_value):
-    """检查标识符是否匹配黑白名单"""
-    settings = load_settings()
-    blacklist = settings.get("blacklist", [])
-    whitelist = settings.get("whitelist", [])
-    
-    # 提取黑白名单中的标识符值列表
-    blacklist_values = [item.get("exe_name") or item.get("value") for item in blacklist]
-    whitelist_values = [item.get("exe_name") or item.get("value") for item in whitelist]
-    
-    # 检查通配符匹配
-    for pattern in blacklist_values:
-        if pattern and wildcard_match(pattern, identifier_value):
-            return "blacklist"
-    
-    for pattern in whitelist_values:
-        if pattern and wildcard_match(pattern, identifier_value):
-            return "whitelist"
-    
-    return "neutral"
+    """检查标识符是否匹配黑白名单（白名单优先）"""
+    # 匹配器只在设置版本变化时重建，每次匹配不读库
+    return db_utils.get_rule_matcher().classify(identifier_value)
 
 def wildcard_match(pattern, text):
     """
@@ -388,16 +445,4 @@ def wildcard_match(pattern, text):
     ? 匹配单个任意字符
     进行大小写不敏感匹配
     """
-    if not pattern or not text:
-        return False
-    
-    # 将通配符模式转换为正则表达式
-    # 转义特殊字符
-    regex_pattern = re.escape(pattern)
-    # 将转义后的通配符替换回正则表达式模式
-    regex_pattern = regex_pattern.replace(r'\\*', '.*').replace(r'\\?', '.')
-    # 添加开头和结尾锚点，确保完全匹配
-    regex_pattern = f"^{regex_pattern}$"
-    
-    # 进行大小写不敏感匹配
-    return bool(re.match(regex_pattern, text, re.IGNORECASE))
+    return rule_matcher.wildcard_match(pattern, text)
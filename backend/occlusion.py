@@ -0,0 +1,181 @@
+"""
+窗口遮挡计算
+一次计算快照中所有窗口的可见面积：坐标压缩后把窗口按 z-order 从下到上画到网格上，
+每个网格单元归属于覆盖它的最上层窗口，按归属累加单元面积即为各窗口的可见面积
+- 支持多显示器（显示器之外的区域不计入面积）
+- 不限制遮挡窗口的数量
+- 窗口很少或未安装 NumPy 时逐窗口扫描线计算，结果相同
+"""
+
+from collections import namedtuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+SMALL_LAYOUT = 16  # 窗口数不超过此值时逐窗口计算更快
+
+Rect = namedtuple("Rect", "left top right bottom")
+
+
+# ------------------------------
+# 几何计算
+# ------------------------------
+def rect_area(r):
+    """计算矩形面积"""
+    w = max(0, r.right - r.left)
+    h = max(0, r.bottom - r.top)
+    return w * h
+
+
+def intersect_rect(a, b):
+    """计算两个矩形的交集"""
+    left = max(a.left, b.left)
+    right = min(a.right, b.right)
+    top = max(a.top, b.top)
+    bottom = min(a.bottom, b.bottom)
+    if right <= left or bottom <= top:
+        return None
+    return Rect(left, top, right, bottom)
+
+
+def union_area_of_intersections(target_rect, inter_rects):
+    """
+    计算交集矩形的并集面积
+    使用扫描线算法实现，避免引入重量级几何库
+    """
+    if not inter_rects:
+        return 0
+    # 收集唯一的y坐标
+    ys = set()
+    for r in inter_rects:
+        ys.add(r.top)
+        ys.add(r.bottom)
+    ys = sorted(ys)
+    total = 0
+    for i in range(len(ys)-1):
+        y0, y1 = ys[i], ys[i+1]
+        if y1 <= y0:
+            continue
+        # 收集此扫描线上的水平线段
+        segs = []
+        for r in inter_rects:
+            if r.top <= y0 and r.bottom >= y1:
+                segs.append((r.left, r.right))
+        if not segs:
+            continue
+        # 合并线段
+        segs.sort()
+        merged_left, merged_right = segs[0]
+        cover = 0
+        for (l, r) in segs[1:]:
+            if r <= merged_right:
+                continue
+            if l <= merged_right:
+                merged_right = r
+            else:
+                cover += (merged_right - merged_left)
+                merged_left, merged_right = l, r
+        cover += (merged_right - merged_left)
+        total += cover * (y1 - y0)
+    return total
+
+
+# ------------------------------
+# 批量可见面积
+# ------------------------------
+def visible_areas(rects, visible, monitors):
+    """
+    计算每个窗口的可见面积和在显示器内的面积
+
+    Args:
+        rects: 窗口矩形列表，按 z-order 从上到下；None 表示无法获取
+        visible: 与 rects 对应的可见标志，不可见的窗口不遮挡其他窗口、可见面积为 0
+        monitors: 显示器矩形列表（互不重叠）
+    Returns:
+        (visible_area, screen_area) 两个与 rects 等长的整数列表
+    """
+    if NUMPY_AVAILABLE and len(rects) > SMALL_LAYOUT:
+        return _visible_areas_numpy(rects, visible, monitors)
+    return _visible_areas_python(rects, visible, monitors)
+
+
+def _visible_areas_python(rects, visible, monitors):
+    """逐窗口扫描线计算（不限制遮挡窗口数），供无 NumPy 时使用"""
+    visible_area = []
+    screen_area = []
+    for i, rect in enumerate(rects):
+        if rect is None:
+            visible_area.append(0)
+            screen_area.append(0)
+            continue
+        on_screen = 0
+        area = 0
+        for monitor in monitors:
+            target = intersect_rect(rect, monitor)
+            if not target:
+                continue
+            target_area = rect_area(target)
+            on_screen += target_area
+            if not visible[i]:
+                continue
+            inters = []
+            for j in range(i):
+                if visible[j] and rects[j] is not None:
+                    inter = intersect_rect(target, rects[j])
+                    if inter:
+                        inters.append(inter)
+            area += target_area - union_area_of_intersections(target, inters)
+        visible_area.append(area)
+        screen_area.append(on_screen)
+    return visible_area, screen_area
+
+
+def _visible_areas_numpy(rects, visible, monitors):
+    n = len(rects)
+    if n == 0 or not monitors:
+        return [0] * n, [0] * n
+    boxes = np.array([r if r is not None else (0, 0, 0, 0) for r in rects], dtype=np.int64)
+    screens = np.array(monitors, dtype=np.int64).reshape(-1, 4)
+
+    # 显示器内面积：窗口与每个显示器求交，一次广播计算
+    w = np.minimum(boxes[:, None, 2], screens[None, :, 2]) - np.maximum(boxes[:, None, 0], screens[None, :, 0])
+    h = np.minimum(boxes[:, None, 3], screens[None, :, 3]) - np.maximum(boxes[:, None, 1], screens[None, :, 1])
+    screen_area = (np.clip(w, 0, None) * np.clip(h, 0, None)).sum(axis=1)
+
+    # 只有可见且在显示器内的窗口参与遮挡
+    painted = np.flatnonzero(np.asarray(visible, dtype=bool) & (screen_area > 0))
+    if len(painted) == 0:
+        return [0] * n, screen_area.tolist()
+
+    # 坐标压缩，只保留显示器范围内的坐标
+    left, top = screens[:, 0].min(), screens[:, 1].min()
+    right, bottom = screens[:, 2].max(), screens[:, 3].max()
+    xs = np.unique(np.clip(np.concatenate((boxes[painted][:, [0, 2]].ravel(), screens[:, [0, 2]].ravel())), left, right))
+    ys = np.unique(np.clip(np.concatenate((boxes[painted][:, [1, 3]].ravel(), screens[:, [1, 3]].ravel())), top, bottom))
+
+    def grid_index(values, axis):
+        return np.searchsorted(axis, np.clip(values, axis[0], axis[-1]))
+
+    x0, x1 = grid_index(boxes[:, 0], xs), grid_index(boxes[:, 2], xs)
+    y0, y1 = grid_index(boxes[:, 1], ys), grid_index(boxes[:, 3], ys)
+
+    # 从下到上画窗口，每个单元最终归属于最上层的可见窗口（n 表示无窗口）
+    owner = np.full((len(ys) - 1, len(xs) - 1), n, dtype=np.uint16 if n < 0xFFFF else np.uint32)
+    for i in painted[::-1]:
+        owner[y0[i]:y1[i], x0[i]:x1[i]] = i
+
+    # 显示器之间的空隙不计入面积
+    weights = np.outer(np.diff(ys).astype(np.float64), np.diff(xs).astype(np.float64))
+    if (screens[:, 2] - screens[:, 0]) @ (screens[:, 3] - screens[:, 1]) < (right - left) * (bottom - top):
+        on_screen = np.zeros(owner.shape, dtype=bool)
+        sx0, sx1 = grid_index(screens[:, 0], xs), grid_index(screens[:, 2], xs)
+        sy0, sy1 = grid_index(screens[:, 1], ys), grid_index(screens[:, 3], ys)
+        for m in range(len(screens)):
+            on_screen[sy0[m]:sy1[m], sx0[m]:sx1[m]] = True
+        weights[~on_screen] = 0
+
+    totals = np.bincount(owner.ravel(), weights=weights.ravel(), minlength=n + 1)[:n]
+    return np.rint(totals).astype(np.int64).tolist(), screen_area.tolist()
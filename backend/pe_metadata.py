@@ -0,0 +1,307 @@
+"""
+轻量 PE 元数据提取
+只用 mmap 读取需要的几个位置：文件头、节表、版本资源、证书表
+不加载整个映像，可在任意平台上运行
+"""
+
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+
+IMAGE_DIRECTORY_ENTRY_RESOURCE = 2
+IMAGE_DIRECTORY_ENTRY_SECURITY = 4
+RT_VERSION = 16
+PE32_MAGIC = 0x10b
+PE32_PLUS_MAGIC = 0x20b
+VS_FIXEDFILEINFO_SIGNATURE = 0xFEEF04BD
+
+# 资源树最多遍历的项数，防止畸形文件造成死循环
+MAX_RESOURCE_ENTRIES = 4096
+
+# 版本资源中的字符串键 -> 结果中的字段名
+VERSION_STRING_FIELDS = {
+    "ProductName": "product_name",
+    "CompanyName": "company_name",
+    "FileDescription": "file_description",
+    "FileVersion": "file_version",
+    "ProductVersion": "product_version",
+    "OriginalFilename": "original_filename",
+    "InternalName": "internal_name",
+    "LegalCopyright": "legal_copyright",
+}
+
+
+class PEFormatError(Exception):
+    """文件不是有效的 PE 文件，或结构损坏"""
+
+
+def _unpack(fmt, buf, offset):
+    try:
+        return struct.unpack_from(fmt, buf, offset)
+    except struct.error as e:
+        raise PEFormatError(f"读取偏移 {offset} 失败: {e}") from None
+
+
+def _align4(value, base=0):
+    return base + ((value - base + 3) & ~3)
+
+
+def _read_utf16z(buf, offset, end):
+    """读取以 0 结尾的 UTF-16LE 字符串，返回 (字符串, 结束偏移（含结尾0）)"""
+    pos = offset
+    while pos + 1 < end:
+        if buf[pos] == 0 and buf[pos + 1] == 0:
+            return bytes(buf[offset:pos]).decode("utf-16-le", errors="replace"), pos + 2
+        pos += 2
+    return bytes(buf[offset:end]).decode("utf-16-le", errors="replace"), end
+
+
+def _parse_headers(buf):
+    """解析 DOS/COFF/可选头、数据目录和节表"""
+    if len(buf) < 64 or buf[0:2] != b"MZ":
+        raise PEFormatError("缺少 MZ 签名")
+    (e_lfanew,) = _unpack("<I", buf, 0x3C)
+    if buf[e_lfanew:e_lfanew + 4] != b"PE\0\0":
+        raise PEFormatError("缺少 PE 签名")
+
+    coff = e_lfanew + 4
+    machine, num_sections, timestamp, _, _, opt_size, characteristics = _unpack("<HHIIIHH", buf, coff)
+    opt = coff + 20
+    (magic,) = _unpack("<H", buf, opt)
+    if magic == PE32_MAGIC:
+        dir_count_offset, dir_offset = opt + 92, opt + 96
+    elif magic == PE32_PLUS_MAGIC:
+        dir_count_offset, dir_offset = opt + 108, opt + 112
+    else:
+        raise PEFormatError(f"未知的可选头类型 0x{magic:x}")
+    (size_of_headers,) = _unpack("<I", buf, opt + 60)
+    (dir_count,) = _unpack("<I", buf, dir_count_offset)
+    dir_count = min(dir_count, 16)
+    directories = [_unpack("<II", buf, dir_offset + 8 * i) for i in range(dir_count)]
+
+    sections = []
+    section_table = opt + opt_size
+    for i in range(num_sections):
+        base = section_table + 40 * i
+        name = bytes(buf[base:base + 8]).rstrip(b"\0").decode("ascii", errors="replace")
+        vsize, vaddr, raw_size, raw_ptr = _unpack("<IIII", buf, base + 8)
+        sections.append({
+            "name": name,
+            "virtual_address": vaddr,
+            "virtual_size": vsize,
+            "raw_size": raw_size,
+            "raw_pointer": raw_ptr,
+        })
+
+    return {
+        "machine": machine,
+        "timestamp": timestamp,
+        "characteristics": characteristics,
+        "is_64bit": magic == PE32_PLUS_MAGIC,
+        "directories": directories,
+        "sections": sections,
+        # Authenticode 计算哈希时需要跳过的位置
+        "checksum_offset": opt + 64,
+        "security_dir_offset": dir_offset + 8 * IMAGE_DIRECTORY_ENTRY_SECURITY
+        if dir_count > IMAGE_DIRECTORY_ENTRY_SECURITY else None,
+        "size_of_headers": size_of_headers,
+    }
+
+
+def _rva_to_offset(sections, rva):
+    for s in sections:
+        span = max(s["virtual_size"], s["raw_size"])
+        if s["virtual_address"] <= rva < s["virtual_address"] + span:
+            return rva - s["virtual_address"] + s["raw_pointer"]
+    return None
+
+
+def _first_resource_entry(buf, base, dir_offset, want_id=None):
+    """返回资源目录中第一个（或指定ID的）项的 OffsetToData"""
+    _, _, _, _, named, ids = _unpack("<IIHHHH", buf, dir_offset)
+    count = min(named + ids, MAX_RESOURCE_ENTRIES)
+    for i in range(count):
+        name, data = _unpack("<II", buf, dir_offset + 16 + 8 * i)
+        if want_id is not None and (name & 0x80000000 or name != want_id):
+            continue
+        return data
+    return None
+
+
+def _find_version_resource(buf, headers):
+    """在资源树中找到 RT_VERSION 数据，返回 (文件偏移, 大小)"""
+    directories = headers["directories"]
+    if len(directories) <= IMAGE_DIRECTORY_ENTRY_RESOURCE:
+        return None
+    rsrc_rva, rsrc_size = directories[IMAGE_DIRECTORY_ENTRY_RESOURCE]
+    if not rsrc_rva or not rsrc_size:
+        return None
+    base = _rva_to_offset(headers["sections"], rsrc_rva)
+    if base is None:
+        return None
+
+    # 三层：类型 -> 名称 -> 语言
+    entry = _first_resource_entry(buf, base, base, want_id=RT_VERSION)
+    for _ in range(2):
+        if entry is None or not entry & 0x80000000:
+            return None
+        entry = _first_resource_entry(buf, base, base + (entry & 0x7FFFFFFF))
+    if entry is None or entry & 0x80000000:
+        return None
+    data_rva, data_size, _, _ = _unpack("<IIII", buf, base + entry)
+    offset = _rva_to_offset(headers["sections"], data_rva)
+    if offset is None:
+        return None
+    return offset, data_size
+
+
+def _parse_version_block(buf, offset, end, base):
+    """
+    解析一个版本信息块（VS_VERSIONINFO/StringFileInfo/StringTable/String/Var）
+    返回 (key, value_offset, value_len, value_type, children_offset, block_end)
+    """
+    length, value_length, value_type = _unpack("<HHH", buf, offset)
+    if length < 6:
+        raise PEFormatError("版本资源块长度无效")
+    block_end = min(offset + length, end)
+    key, pos = _read_utf16z(buf, offset + 6, block_end)
+    value_offset = _align4(pos, base)
+    # 文本值的长度以 WCHAR 计
+    value_bytes = value_length * 2 if value_type == 1 else value_length
+    children = _align4(min(value_offset + value_bytes, block_end), base)
+    return key, value_offset, value_bytes, value_type, children, block_end
+
+
+def _iter_children(buf, offset, end, base):
+    while offset + 6 <= end:
+        block = _parse_version_block(buf, offset, end, base)
+        yield block
+        next_offset = _align4(block[5], base)
+        if next_offset <= offset:
+            break
+        offset = next_offset
+
+
+def _parse_version_info(buf, offset, size):
+    end = min(offset + size, len(buf))
+    key, value_offset, value_len, _, children, block_end = _parse_version_block(buf, offset, end, offset)
+    if key != "VS_VERSION_INFO":
+        raise PEFormatError("版本资源签名无效")
+
+    result = {"strings": {}, "translations": [], "fixed": None}
+    if value_len >= 52:
+        fixed = _unpack("<13I", buf, value_offset)
+        if fixed[0] == VS_FIXEDFILEINFO_SIGNATURE:
+            result["fixed"] = {
+                "file_version": f"{fixed[2] >> 16}.{fixed[2] & 0xFFFF}.{fixed[3] >> 16}.{fixed[3] & 0xFFFF}",
+                "product_version": f"{fixed[4] >> 16}.{fixed[4] & 0xFFFF}.{fixed[5] >> 16}.{fixed[5] & 0xFFFF}",
+                "file_flags": fixed[7] & fixed[6],
+                "file_os": fixed[8],
+                "file_type": fixed[9],
+            }
+
+    tables = {}
+    for child_key, child_value, child_len, _, grand, child_end in _iter_children(buf, children, block_end, offset):
+        if child_key == "StringFileInfo":
+            for table_key, _, _, _, strings_offset, table_end in _iter_children(buf, grand, child_end, offset):
+                strings = {}
+                for name, v_off, v_len, v_type, _, s_end in _iter_children(buf, strings_offset, table_end, offset):
+                    if v_len:
+                        value, _ = _read_utf16z(buf, v_off, min(v_off + v_len, s_end))
+                        strings[name] = value
+                    else:
+                        strings[name] = ""
+                tables[table_key.lower()] = strings
+        elif child_key == "VarFileInfo":
+            for var_key, v_off, v_len, _, _, _ in _iter_children(buf, grand, child_end, offset):
+                if var_key == "Translation":
+                    for i in range(v_len // 4):
+                        lang, codepage = _unpack("<HH", buf, v_off + 4 * i)
+                        result["translations"].append(f"{lang:04x}{codepage:04x}")
+
+    # 优先使用与 Translation 对应的字符串表
+    chosen = None
+    for translation in result["translations"]:
+        if translation in tables:
+            chosen = tables[translation]
+            break
+    if chosen is None and tables:
+        chosen = next(iter(tables.values()))
+    result["strings"] = chosen or {}
+    for source, target in VERSION_STRING_FIELDS.items():
+        if chosen and chosen.get(source):
+            result[target] = chosen[source]
+    return result
+
+
+def _parse_certificates(buf, headers):
+    """读取证书表（安全目录中的地址是文件偏移，不是RVA）"""
+    directories = headers["directories"]
+    if len(directories) <= IMAGE_DIRECTORY_ENTRY_SECURITY:
+        return []
+    table_offset, table_size = directories[IMAGE_DIRECTORY_ENTRY_SECURITY]
+    if not table_offset or not table_size or table_offset + table_size > len(buf):
+        return []
+    certificates = []
+    pos = table_offset
+    end = table_offset + table_size
+    while pos + 8 <= end:
+        length, revision, cert_type = _unpack("<IHH", buf, pos)
+        if length < 8 or pos + length > end:
+            break
+        certificates.append({
+            "offset": pos,
+            "length": length,
+            "revision": revision,
+            "type": cert_type,
+            "data": bytes(buf[pos + 8:pos + length]),
+        })
+        # 每项按8字节对齐
+        pos += (length + 7) & ~7
+    return certificates
+
+
+def parse_pe(buf):
+    """
+    从 bytes/mmap 中解析 PE 元数据
+    返回 dict：头信息、version_info（含 product_name/company_name 等）、certificates、
+    以及 Authenticode 计算所需的 checksum_offset/security_dir_offset/certificate_table
+    """
+    headers = _parse_headers(buf)
+    result = dict(headers)
+    result["file_size"] = len(buf)
+
+    version_info = {}
+    location = _find_version_resource(buf, headers)
+    if location:
+        try:
+            version_info = _parse_version_info(buf, *location)
+        except PEFormatError:
+            version_info = {}
+    result["version_info"] = version_info
+
+    result["certificates"] = _parse_certificates(buf, headers)
+    security = headers["directories"][IMAGE_DIRECTORY_ENTRY_SECURITY] \
+        if len(headers["directories"]) > IMAGE_DIRECTORY_ENTRY_SECURITY else (0, 0)
+    result["certificate_table"] = security if security[0] and security[1] else None
+    return result
+
+
+@contextmanager
+def map_file(filepath):
+    """只读内存映射整个文件"""
+    with open(filepath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise PEFormatError("空文件")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+
+def extract_pe_metadata(filepath):
+    """内存映射文件并解析 PE 元数据（只读取头部、版本资源和证书表所在的页）"""
+    with map_file(filepath) as mm:
+        return parse_pe(mm)
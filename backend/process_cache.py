@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+
+import psutil
+
+from logger import log_to_file
+
+MAX_PROCESSES = 256   # 最多缓存的进程数
+PRUNE_INTERVAL = 30   # 多久清理一次已退出的进程（秒）
+
+
+class ProcessCache:
+    """
+    进程元数据缓存
+    - 以 (pid, create_time) 标识进程：PID 被系统复用时 create_time 不同，不会返回旧进程的信息
+    - 首次查询用 psutil oneshot() 一次读出名称、路径、创建时间，之后每次只做一次存活检查
+    - LRU 限制条数；进程退出或被淘汰时通知订阅者，便于清理以该进程为键的其他缓存
+    """
+
+    def __init__(self, maxsize=MAX_PROCESSES, prune_interval=PRUNE_INTERVAL):
+        self.maxsize = maxsize
+        self.prune_interval = prune_interval
+        self._entries = OrderedDict()  # pid -> (psutil.Process, info)
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._last_prune = time.monotonic()
+        self.stats = {"hits": 0, "misses": 0, "exited": 0, "evicted": 0}
+
+    def get(self, pid):
+        """
+        返回进程信息 {"pid", "create_time", "key", "name", "exe"}，进程不存在时返回 None
+        key 为 (pid, create_time)，可作为其他按进程缓存的键
+        """
+        self._maybe_prune()
+        with self._lock:
+            entry = self._entries.get(pid)
+        if entry is not None:
+            proc, info = entry
+            # is_running() 会比较创建时间，能识别 PID 复用
+            if proc.is_running():
+                with self._lock:
+                    if pid in self._entries:
+                        self._entries.move_to_end(pid)
+                self.stats["hits"] += 1
+                return info
+            self._remove(pid, entry, "exited")
+        self.stats["misses"] += 1
+        return self._load(pid)
+
+    def _load(self, pid):
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                create_time = proc.create_time()
+                name = proc.name()
+                try:
+                    exe = proc.exe()
+                except (psutil.AccessDenied, psutil.ZombieProcess, OSError):
+                    exe = ""
+        except psutil.Error:
+            return None
+        info = {"pid": pid, "create_time": create_time, "key": (pid, create_time), "name": name, "exe": exe}
+        evicted = []
+        with self._lock:
+            self._entries[pid] = (proc, info)
+            self._entries.move_to_end(pid)
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._entries.popitem(last=False))
+        for old_pid, old_entry in evicted:
+            self._notify(old_entry[1], "evicted")
+        return info
+
+    def key(self, pid):
+        """已缓存进程的 (pid, create_time)，不做系统调用；未缓存时返回 None"""
+        entry = self._entries.get(pid)
+        return entry[1]["key"] if entry is not None else None
+
+    def discard(self, pid):
+        """调用方已知进程退出时直接移除（会通知订阅者）"""
+        entry = self._entries.get(pid)
+        if entry is not None:
+            self._remove(pid, entry, "exited")
+
+    def _remove(self, pid, entry, reason):
+        with self._lock:
+            if self._entries.get(pid) is not entry:
+                return
+            del self._entries[pid]
+        self._notify(entry[1], reason)
+
+    def _notify(self, info, reason):
+        self.stats[reason] += 1
+        for callback in list(self._listeners):
+            try:
+                callback(info["key"])
+            except Exception as e:
+                log_to_file(f"进程退出通知失败: {str(e)}", "ERROR")
+
+    def on_exit(self, callback):
+        """注册回调 callback((pid, create_time))：进程退出或从缓存中淘汰时调用"""
+        self._listeners.append(callback)
+        return callback
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        if now - self._last_prune >= self.prune_interval:
+            self._last_prune = now
+            self.prune()
+
+    def prune(self):
+        """清理已退出的进程，返回清理数量"""
+        with self._lock:
+            entries = list(self._entries.items())
+        removed = 0
+        for pid, entry in entries:
+            if not entry[0].is_running():
+                self._remove(pid, entry, "exited")
+                removed += 1
+        return removed
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_process_cache():
+    """进程内共享的进程元数据缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ProcessCache()
+        return _cache
@@ -0,0 +1,220 @@
+import os
+import threading
+
+import psutil
+
+import db_utils
+from logger import log_to_file
+from process_cache import ProcessCache
+
+WATCH_INTERVAL = 1.0   # 进程表轮询间隔（秒）
+KILL_TIMEOUT = 3       # 结束进程树后等待退出的时间（秒）
+
+
+def _protected_pids():
+    """自身及祖先进程，任何规则都不能结束它们"""
+    pids = {os.getpid()}
+    try:
+        pids.update(p.pid for p in psutil.Process().parents())
+    except psutil.Error:
+        pass
+    return pids
+
+
+def kill_tree(pid, create_time=None, timeout=KILL_TIMEOUT):
+    """
+    结束进程及其所有子进程，返回被结束的 PID 列表
+    传入 create_time 时先确认 PID 没有被其他进程复用
+    """
+    try:
+        root = psutil.Process(pid)
+        if create_time is not None and root.create_time() != create_time:
+            return []
+        procs = root.children(recursive=True) + [root]
+    except psutil.Error:
+        return []
+    killed = []
+    for proc in procs:
+        try:
+            proc.kill()
+            killed.append(proc.pid)
+        except psutil.NoSuchProcess:
+            pass
+        except psutil.Error as e:
+            log_to_file(f"结束进程失败: {proc.pid} - {str(e)}", "WARNING")
+    psutil.wait_procs(procs, timeout=timeout)
+    return killed
+
+
+class ProcessWatcher:
+    """
+    增量进程监视器
+    - 每轮只比较 PID 集合的差异，只读取新出现进程的信息，不再每次遍历整个进程表
+    - 维护 进程名（小写）-> {pid: create_time} 索引，按名称查找进程无需扫描
+    - 新进程启动时用编译好的黑白名单（只按程序名）判断，命中黑名单立即结束其进程树
+    - 程序名规则变化后对已运行的进程重新判断一次（按模式指纹比较，保存其他设置不会触发）
+    - request_kill 把按标题命中的结束请求（只结束该窗口所属进程的进程树）交给监视线程执行，
+      调用方不会被 kill_tree 的等待卡住
+    """
+
+    def __init__(self, matcher, interval=WATCH_INTERVAL, on_kill=None, process_cache=None, list_pids=psutil.pids):
+        """
+        Args:
+            matcher: 返回 RuleMatcher 的函数（如 db_utils.get_rule_matcher）
+            on_kill: on_kill(name, pids) 结束黑名单进程后回调
+            list_pids: 返回当前所有 PID 的函数
+        """
+        self.matcher = matcher
+        self.interval = interval
+        self.on_kill = on_kill
+        # 独立的缓存：PID 数量不受前台缓存上限限制
+        self.processes = process_cache or ProcessCache(maxsize=1 << 20, prune_interval=float("inf"))
+        self.list_pids = list_pids
+        self._known = {}        # pid -> (name_key, create_time)
+        self._by_name = {}      # name_key -> {pid: create_time}
+        self._rules_fingerprint = None
+        self._protected = _protected_pids()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._kill_requests = {}  # (pid, create_time) -> 程序名
+        self._thread = None
+        self.stats = {"polls": 0, "started": 0, "exited": 0, "killed": 0}
+
+    def poll(self):
+        """执行一轮检测，返回 {"started": [...], "exited": [...], "killed": [...]}"""
+        current = set(self.list_pids())
+        rules = self.matcher()
+        with self._lock:
+            exited = [pid for pid in self._known if pid not in current]
+            for pid in exited:
+                self._forget(pid)
+            started = []
+            for pid in current.difference(self._known):
+                info = self.processes.get(pid)
+                if info is None:
+                    continue  # 已经退出
+                name_key = info["name"].lower()
+                self._known[pid] = (name_key, info["create_time"])
+                self._by_name.setdefault(name_key, {})[pid] = info["create_time"]
+                started.append(info)
+            # 程序名规则变化后整体重新判断，否则只判断新进程
+            # 每次保存设置都会重建匹配器，因此比较模式指纹而不是对象
+            if rules.program_fingerprint != self._rules_fingerprint:
+                self._rules_fingerprint = rules.program_fingerprint
+                names = set(self._by_name)
+            else:
+                names = {info["name"] for info in started}
+        self.stats["polls"] += 1
+        self.stats["started"] += len(started)
+        self.stats["exited"] += len(exited)
+
+        killed = []
+        for name in names:
+            if rules.classify(name) == "blacklist":
+                killed.extend(self.kill_matching(name))
+        return {"started": [info["pid"] for info in started], "exited": exited, "killed": killed}
+
+    def _forget(self, pid):
+        name_key, _ = self._known.pop(pid)
+        self.processes.discard(pid)
+        pids = self._by_name.get(name_key)
+        if pids is not None:
+            pids.pop(pid, None)
+            if not pids:
+                del self._by_name[name_key]
+
+    def pids_by_name(self, name):
+        """同名进程的 PID 列表（不区分大小写）"""
+        with self._lock:
+            return sorted(self._by_name.get(name.lower(), ()))
+
+    def kill_matching(self, name):
+        """结束所有同名进程的进程树，返回被结束的 PID"""
+        with self._lock:
+            targets = dict(self._by_name.get(name.lower(), {}))
+        return self._kill_targets(name, targets)
+
+    def _kill_targets(self, name, targets):
+        """结束 {pid: create_time} 中每个进程的进程树，返回被结束的 PID"""
+        killed = []
+        for pid, create_time in targets.items():
+            if pid in self._protected:
+                continue
+            killed.extend(kill_tree(pid, create_time))
+        if killed:
+            self.stats["killed"] += len(killed)
+            log_to_file(f"已结束黑名单进程: {name}", "INFO", {"pids": killed})
+            if self.on_kill is not None:
+                try:
+                    self.on_kill(name, killed)
+                except Exception as e:
+                    log_to_file(f"结束进程回调失败: {str(e)}", "ERROR")
+        return killed
+
+    def request_kill(self, pid, create_time=None, name=""):
+        """
+        请求结束指定进程的进程树（不等待），同名的其他进程不受影响
+        传入 create_time 时 PID 已被复用则不结束；由监视线程执行，监视线程未启动时直接执行
+        """
+        with self._lock:
+            running = self._thread is not None and not self._stop.is_set()
+            if running:
+                self._kill_requests[(pid, create_time)] = name
+        if running:
+            self._wakeup.set()
+            return
+        self._kill_targets(name or str(pid), {pid: create_time})
+
+    def _kill_requested(self):
+        with self._lock:
+            requests, self._kill_requests = self._kill_requests, {}
+        for (pid, create_time), name in requests.items():
+            self._kill_targets(name or str(pid), {pid: create_time})
+
+    def start(self):
+        """启动后台轮询线程"""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name="process-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+                self._kill_requested()
+            except Exception as e:
+                log_to_file(f"进程监视失败: {str(e)}", "ERROR")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+
+    def __len__(self):
+        return len(self._known)
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def get_process_watcher():
+    """进程内共享的进程监视器（按设置中的黑白名单结束进程）"""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = ProcessWatcher(db_utils.get_rule_matcher)
+        return _watcher
+
+
+def stop_process_watcher():
+    with _watcher_lock:
+        if _watcher is not None:
+            _watcher.stop()
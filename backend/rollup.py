@@ -0,0 +1,123 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from db_pool import write_transaction
+import cache
+
+
+def split_by_day(start_ts, end_ts):
+    """
+    把 [start_ts, end_ts) 区间按本地零点切分
+    返回 [(day, seconds), ...]，跨零点的会话会拆到两天
+    """
+    parts = []
+    cursor = int(start_ts)
+    end_ts = int(end_ts)
+    while cursor < end_ts:
+        current = datetime.fromtimestamp(cursor)
+        next_midnight = datetime.combine(current.date() + timedelta(days=1), datetime.min.time())
+        boundary = min(end_ts, int(next_midnight.timestamp()))
+        parts.append((current.strftime("%Y-%m-%d"), boundary - cursor))
+        cursor = boundary
+    return parts
+
+
+def aggregate(intervals):
+    """
+    把 (unique_id, start_ts, end_ts) 聚合成 {(unique_id, day): [seconds, sessions]}
+    无标识或无时长的记录（挂机标记、占位记录）不计入
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for unique_id, start_ts, end_ts in intervals:
+        if not unique_id or start_ts is None or end_ts is None or end_ts <= start_ts:
+            continue
+        for day, seconds in split_by_day(start_ts, end_ts):
+            entry = totals[(unique_id, day)]
+            entry[0] += seconds
+            entry[1] += 1
+    return totals
+
+
+def apply_intervals(conn, intervals):
+    """在调用方的事务中把一批会话累加到 app_daily_usage"""
+    totals = aggregate(intervals)
+    if not totals:
+        return 0
+    conn.executemany("""
+        INSERT INTO app_daily_usage (unique_id, day, seconds, sessions)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (unique_id, day) DO UPDATE SET
+            seconds = seconds + excluded.seconds,
+            sessions = sessions + excluded.sessions
+    """, [(uid, day, seconds, sessions) for (uid, day), (seconds, sessions) in totals.items()])
+    return len(totals)
+
+
+def apply_metadata(conn, rows):
+    """
+    在调用方的事务中更新 app_usage_meta（每个应用一行）
+    rows 为 (unique_id, exe_name, app_name, identifier_type, end_ts)，各列与按应用 GROUP BY 后取 MAX 的结果一致
+    返回本次新出现的应用ID集合
+    """
+    rows = [r for r in rows if r[0]]
+    if not rows:
+        return set()
+    ids = {r[0] for r in rows}
+    known = {row[0] for row in conn.execute(
+        f"SELECT unique_id FROM app_usage_meta WHERE unique_id IN ({', '.join('?' * len(ids))})", tuple(ids)
+    )}
+    conn.executemany("""
+        INSERT INTO app_usage_meta (unique_id, exe_name, app_name, identifier_type, last_ts)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (unique_id) DO UPDATE SET
+            exe_name = COALESCE(MAX(exe_name, excluded.exe_name), exe_name, excluded.exe_name),
+            app_name = COALESCE(MAX(app_name, excluded.app_name), app_name, excluded.app_name),
+            identifier_type = COALESCE(MAX(identifier_type, excluded.identifier_type), identifier_type, excluded.identifier_type),
+            last_ts = COALESCE(MAX(last_ts, excluded.last_ts), last_ts, excluded.last_ts)
+    """, rows)
+    return ids - known
+
+
+def rebuild_metadata(conn):
+    """根据 app_usage 全量重建 app_usage_meta（在调用方的事务中执行）"""
+    conn.execute("DELETE FROM app_usage_meta")
+    conn.execute("""
+        INSERT INTO app_usage_meta (unique_id, exe_name, app_name, identifier_type, last_ts)
+        SELECT unique_id, MAX(exe_name), MAX(app_name), MAX(identifier_type), MAX(end_ts)
+        FROM app_usage
+        WHERE unique_id IS NOT NULL AND unique_id != ''
+        GROUP BY unique_id
+    """)
+    return conn.execute("SELECT COUNT(*) FROM app_usage_meta").fetchone()[0]
+
+
+def rebuild(conn, batch_size=5000):
+    """根据 app_usage 全量重建 app_daily_usage（在调用方的事务中执行）"""
+    conn.execute("DELETE FROM app_daily_usage")
+    cursor = conn.execute("""
+        SELECT unique_id, start_ts, end_ts FROM app_usage
+        WHERE unique_id IS NOT NULL AND unique_id != '' AND duration > 0
+    """)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        apply_intervals(conn, [tuple(r) for r in rows])
+    return conn.execute("SELECT COUNT(*) FROM app_daily_usage").fetchone()[0]
+
+
+def rebuild_daily_usage():
+    """重建命令：python rollup.py"""
+    with write_transaction() as conn:
+        count = rebuild(conn)
+        rebuild_metadata(conn)
+    cache.invalidate("usage")
+    cache.invalidate("apps_list")
+    return count
+
+
+if __name__ == "__main__":
+    from migrations import run_migrations
+    run_migrations()
+    count = rebuild_daily_usage()
+    print(f"🎉 每日汇总重建完成，写入 {count} 个 (应用, 日期) 分组")
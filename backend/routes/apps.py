@@ -1,22 +1,29 @@
 from typing import List, Dict, Any
-import sqlite3
 import json
 from datetime import datetime, timedelta
 from collections import defaultdict
-from fastapi import APIRouter
-from logger import log_to_file, cache_result
-
-DB_FILE = "time_tracker.db"
+from fastapi import APIRouter, Query
+from logger import log_to_file
+from cache import cached
+from db_pool import get_read_connection
 
 router = APIRouter(prefix="/api/apps", tags=["apps"])
 
+def _today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+def _app_key(conn, app_id, *args):
+    """按应用缓存：键里带上当天日期，跨零点自动失效"""
+    return (app_id, _today()) + args
+
+def _app_scope(conn, app_id, *args):
+    return app_id
+
 def get_db_connection():
-    """获取数据库连接"""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row  # 使结果可以通过列名访问
-    return conn
+    """获取当前线程的只读连接（由连接管理器复用，不需要关闭）"""
+    return get_read_connection()
 
-@cache_result
+@cached(key=_app_key, scope=_app_scope, tags=("usage",))
 def calculate_daily_time(conn, app_id: str, days: int = 1) -> int:
     """计算应用在指定天数内的使用时间（分钟）"""
     try:
@@ -24,10 +31,11 @@ def calculate_daily_time(conn, app_id: str, days: int = 1) -> int:
         target_date = datetime.now() - timedelta(days=days-1)
         target_date_str = target_date.strftime("%Y-%m-%d")
         
+        # 读每日汇总表（主键 (unique_id, day) 范围扫描）
         cursor.execute("""
-            SELECT SUM(duration) as total_duration 
-            FROM app_usage 
-            WHERE unique_id = ? AND start_time >= ?
+            SELECT SUM(seconds) as total_duration 
+            FROM app_daily_usage 
+            WHERE unique_id = ? AND day >= ?
         """, (app_id, target_date_str))
         
         result = cursor.fetchone()
@@ -38,24 +46,23 @@ def calculate_daily_time(conn, app_id: str, days: int = 1) -> int:
         log_to_file(f"计算应用 {app_id} 的每日使用时间失败: {str(e)}", "ERROR")
         return 0
 
-@cache_result
+@cached(key=_app_key, scope=_app_scope, tags=("usage",))
 def calculate_last_n_days(conn, app_id: str, n: int = 3) -> List[int]:
     """计算应用最近n天的使用时间"""
     try:
-        daily_times = []
-        for i in range(n):
-            target_date = datetime.now() - timedelta(days=i)
-            target_date_str = target_date.strftime("%Y-%m-%d")
-            
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT SUM(duration) as total_duration 
-                FROM app_usage 
-                WHERE unique_id = ? AND DATE(start_time) = ?
-            """, (app_id, target_date_str))
-            
-            result = cursor.fetchone()
-            daily_times.append(result[0] if result[0] else 0)
+        today = datetime.now()
+        day_keys = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(n)]
+        
+        # 每日汇总表中每天只有一行，一次范围扫描取出 n 天
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT day, seconds as total_duration 
+            FROM app_daily_usage 
+            WHERE unique_id = ? AND day BETWEEN ? AND ?
+        """, (app_id, day_keys[-1], day_keys[0]))
+        
+        totals = {row[0]: row[1] or 0 for row in cursor.fetchall()}
+        daily_times = [totals.get(day, 0) for day in day_keys]
         
         log_to_file(f"计算应用 {app_id} 最近 {n} 天的使用时间: {daily_times}", "DEBUG")
         return daily_times
@@ -63,7 +70,7 @@ def calculate_last_n_days(conn, app_id: str, n: int = 3) -> List[int]:
         log_to_file(f"计算应用 {app_id} 最近 {n} 天的使用时间失败: {str(e)}", "ERROR")
         return [0] * n
 
-@cache_result
+@cached(key=_app_key, scope=_app_scope, tags=("apps",))
 def get_cooling_days(conn, app_id: str) -> int:
     """获取应用的冷却天数"""
     try:
@@ -80,7 +87,7 @@ def get_cooling_days(conn, app_id: str) -> int:
         log_to_file(f"获取应用 {app_id} 的冷却天数失败: {str(e)}", "ERROR")
         return 0
 
-@cache_result
+@cached(key=_app_key, scope=_app_scope, tags=("usage",))
 def has_black_history(conn, app_id: str) -> bool:
     """检查应用是否有黑名单历史"""
     try:
@@ -98,66 +105,86 @@ def has_black_history(conn, app_id: str) -> bool:
         log_to_file(f"检查应用 {app_id} 是否有黑名单历史失败: {str(e)}", "ERROR")
         return False
 
+# 应用列表最多统计的天数
+MAX_LIST_DAYS = 90
+# 应用列表缓存时间（秒）：单个应用的使用记录写入不失效列表，列表中的时长最多滞后这么久
+LIST_TTL = 60
+
+def _list_key(conn, days=3):
+    """键里带上当天日期，跨零点自动失效"""
+    return (days, _today())
+
+# 出现新应用、冷却天数变化、汇总重建时由 invalidate("apps_list") 失效
+@cached(maxsize=MAX_LIST_DAYS, ttl=LIST_TTL, key=_list_key, tags=("apps_list",))
+def build_apps_list(conn, days: int = 3) -> List[Dict[str, Any]]:
+    """
+    用两条查询构建应用列表，都不扫描 app_usage：
+    1. 应用元数据表（每个应用一行）+ 阻止状态 + 冷却天数
+    2. 每日汇总表上按天条件聚合，得到每个应用最近 days 天的使用时间
+    查询次数与应用数量无关，读取的行数为 应用数 × 天数
+    """
+    today = datetime.now()
+    day_keys = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+
+    cursor = conn.cursor()
+    # is_blocked 只有 0/1，是否存在阻止记录同时表示当前阻止状态和是否有黑名单历史（走 (is_blocked, unique_id) 索引）
+    cursor.execute("""
+        SELECT m.unique_id, 
+               m.exe_name, 
+               m.app_name, 
+               m.identifier_type, 
+               EXISTS (SELECT 1 FROM app_usage au
+                       WHERE au.is_blocked = 1 AND au.unique_id = m.unique_id) as is_blocked,
+               COALESCE(ai.cooling_days, 0) as cooling_days
+        FROM app_usage_meta m
+        LEFT JOIN app_identifiers ai ON ai.unique_id = m.unique_id
+    """)
+    rows = cursor.fetchall()
+
+    # 条件聚合：每一天一列
+    day_columns = ",\n               ".join(
+        f"SUM(CASE WHEN day = ? THEN seconds ELSE 0 END) AS d{i}" for i in range(days)
+    )
+    cursor.execute(f"""
+        SELECT unique_id,
+               {day_columns}
+        FROM app_daily_usage
+        WHERE day BETWEEN ? AND ?
+        GROUP BY unique_id
+    """, (*day_keys, day_keys[-1], day_keys[0]))
+    usage_map = {row[0]: [row[i + 1] or 0 for i in range(days)] for row in cursor.fetchall()}
+
+    apps_data = []
+    for row in rows:
+        app_id = row['unique_id']
+        last_days = usage_map.get(app_id, [0] * days)
+        apps_data.append({
+            "id": app_id,
+            "name": row['app_name'] or row['exe_name'],
+            "dailyTime": last_days[0],
+            # 字段名保持不变以兼容前端，长度等于 days
+            "last3Days": last_days,
+            "coolingDays": row['cooling_days'],
+            "hasBlackHistory": bool(row['is_blocked']),
+            "is_blocked": bool(row['is_blocked']),  # 添加阻止状态
+            "upgradeSourceId": None  # 可以根据需要实现
+        })
+    return apps_data
+
 @router.get("/list", response_model=List[Dict[str, Any]])
-def get_apps_list():
+def get_apps_list(days: int = Query(3, ge=1, le=MAX_LIST_DAYS)):
     """
     获取应用列表数据
     返回包含应用详细信息的列表
+    /api/apps/list?days=7 返回最近7天的每日使用时间
     """
-    conn = get_db_connection()
     try:
-        # 获取所有唯一应用标识符以及它们的阻止状态
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT au.unique_id, 
-                   MAX(au.exe_name) as exe_name, 
-                   MAX(au.app_name) as app_name, 
-                   MAX(au.identifier_type) as identifier_type, 
-                   MAX(au.is_blocked) as is_blocked
-            FROM app_usage au
-            WHERE au.unique_id IS NOT NULL AND au.unique_id != ''
-            GROUP BY au.unique_id
-        """)
-        
-        rows = cursor.fetchall()
-        apps_data = []
-        
-        # 预先获取所有应用的冷却天数，避免重复查询
-        cursor.execute("SELECT unique_id, cooling_days FROM app_identifiers")
-        cooling_days_map = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        # 预先获取所有应用的黑名单历史，避免重复查询
-        cursor.execute("""
-            SELECT unique_id, COUNT(*) as black_count 
-            FROM app_usage 
-            WHERE is_blocked = 1 
-            GROUP BY unique_id
-        """)
-        black_history_map = {row[0]: row[1] > 0 for row in cursor.fetchall()}
-        
-        for row in rows:
-            app_id = row['unique_id']
-            app_data = {
-                "id": app_id,
-                "name": row['app_name'] or row['exe_name'],
-                "dailyTime": calculate_daily_time(conn, app_id, 1),
-                "last3Days": calculate_last_n_days(conn, app_id, 3),
-                "coolingDays": cooling_days_map.get(app_id, 0),
-                "hasBlackHistory": black_history_map.get(app_id, False),
-                "is_blocked": bool(row['is_blocked']),  # 添加阻止状态
-                "upgradeSourceId": None  # 可以根据需要实现
-            }
-            apps_data.append(app_data)
-        
         # 直接返回应用数据列表，符合response_model定义
-        return apps_data
+        return build_apps_list(get_db_connection(), days)
     except Exception as e:
-        if 'conn' in locals():
-            conn.close()
+        log_to_file(f"获取应用列表失败: {str(e)}", "ERROR")
         # 发生错误时返回空列表而不是错误对象
         return []
-    finally:
-        conn.close()
 
 @router.get("/{app_id}/details")
 def get_app_details(app_id: str):
@@ -165,28 +192,25 @@ def get_app_details(app_id: str):
     获取特定应用的详细信息
     """
     conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT unique_id, exe_name, app_name, identifier_type,
-                   SUM(duration) as total_duration
-            FROM app_usage 
-            WHERE unique_id = ?
-            GROUP BY unique_id, exe_name, app_name, identifier_type
-        """, (app_id,))
-        
-        row = cursor.fetchone()
-        if not row:
-            return {"error": "App not found"}
-        
-        return {
-            "id": row['unique_id'],
-            "name": row['app_name'] or row['exe_name'],
-            "totalDuration": row['total_duration'],
-            "dailyTime": calculate_daily_time(conn, app_id, 1),
-            "last3Days": calculate_last_n_days(conn, app_id, 3),
-            "coolingDays": get_cooling_days(conn, app_id),
-            "hasBlackHistory": has_black_history(conn, app_id)
-        }
-    finally:
-        conn.close()
\ No newline at end of file
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT unique_id, exe_name, app_name, identifier_type,
+               SUM(duration) as total_duration
+        FROM app_usage 
+        WHERE unique_id = ?
+        GROUP BY unique_id, exe_name, app_name, identifier_type
+    """, (app_id,))
+    
+    row = cursor.fetchone()
+    if not row:
+        return {"error": "App not found"}
+    
+    return {
+        "id": row['unique_id'],
+        "name": row['app_name'] or row['exe_name'],
+        "totalDuration": row['total_duration'],
+        "dailyTime": calculate_daily_time(conn, app_id, 1),
+        "last3Days": calculate_last_n_days(conn, app_id, 3),
+        "coolingDays": get_cooling_days(conn, app_id),
+        "hasBlackHistory": has_black_history(conn, app_id)
+    }
@@ -0,0 +1,133 @@
+import re
+from functools import lru_cache
+
+WILDCARD_CHARS = ("*", "?")
+
+
+@lru_cache(maxsize=4096)
+def _compile_wildcard(pattern):
+    """把通配符模式编译成完整匹配的正则（大小写不敏感）"""
+    return re.compile(_wildcard_to_regex(pattern), re.IGNORECASE | re.DOTALL)
+
+
+def _wildcard_to_regex(pattern):
+    # re.escape 会把 * 转为 \*，把 ? 转为 \?，再替换回正则语法
+    return re.escape(pattern).replace(r'\*', '.*').replace(r'\?', '.')
+
+
+def wildcard_match(pattern, text):
+    """
+    通配符匹配函数，支持 * 和 ?
+    * 匹配任意数量的任意字符
+    ? 匹配单个任意字符
+    进行大小写不敏感匹配
+    """
+    if not pattern or not text:
+        return False
+    return _compile_wildcard(pattern).fullmatch(text) is not None
+
+
+class PatternSet:
+    """
+    一组通配符模式编译后的匹配器
+    - 不含通配符的模式：小写后放入哈希集合，O(1)
+    - 形如 abc* / *abc 的模式：startswith/endswith 元组，一次调用
+    - 其余模式：合并为一个交替正则，一次匹配
+    """
+
+    def __init__(self, patterns):
+        exact = set()
+        prefixes = set()
+        suffixes = set()
+        generic = []
+        for pattern in patterns:
+            if not pattern:
+                continue
+            lowered = pattern.lower()
+            if not any(c in pattern for c in WILDCARD_CHARS):
+                exact.add(lowered)
+            elif pattern == "*":
+                # 匹配一切非空文本
+                prefixes.add("")
+            elif lowered.endswith("*") and not any(c in lowered[:-1] for c in WILDCARD_CHARS):
+                prefixes.add(lowered[:-1])
+            elif lowered.startswith("*") and not any(c in lowered[1:] for c in WILDCARD_CHARS):
+                suffixes.add(lowered[1:])
+            else:
+                generic.append(pattern)
+        self.exact = frozenset(exact)
+        self.prefixes = tuple(sorted(prefixes))
+        self.suffixes = tuple(sorted(suffixes))
+        self.regex = None
+        if generic:
+            self.regex = re.compile(
+                "|".join(f"(?:{_wildcard_to_regex(p)})" for p in generic),
+                re.IGNORECASE | re.DOTALL
+            )
+        self.size = len(exact) + len(prefixes) + len(suffixes) + len(generic)
+        # 编译后的模式内容，内容相同的两个集合指纹相等
+        self.fingerprint = (self.exact, self.prefixes, self.suffixes, tuple(sorted(generic)))
+
+    def matches(self, text):
+        if not text or not self.size:
+            return False
+        lowered = text.lower()
+        if lowered in self.exact:
+            return True
+        if self.prefixes and lowered.startswith(self.prefixes):
+            return True
+        if self.suffixes and lowered.endswith(self.suffixes):
+            return True
+        return self.regex is not None and self.regex.fullmatch(text) is not None
+
+    def __len__(self):
+        return self.size
+
+
+class RuleMatcher:
+    """
+    黑白名单编译结果
+    每个名单分成两组模式：程序（exe名/标识符）和标题（窗口标题/路径）
+    白名单优先于黑名单
+    """
+
+    def __init__(self, blacklist=(), whitelist=()):
+        """
+        Args:
+            blacklist/whitelist: [(exe_pattern, title_pattern), ...]
+        """
+        self.black_exe = PatternSet(exe for exe, _ in blacklist)
+        self.black_title = PatternSet(title for _, title in blacklist)
+        self.white_exe = PatternSet(exe for exe, _ in whitelist)
+        self.white_title = PatternSet(title for _, title in whitelist)
+        # 只按程序名判断（classify 不带标题）时用到的模式指纹，用于判断程序规则是否真的变化
+        self.program_fingerprint = (self.white_exe.fingerprint, self.black_exe.fingerprint)
+
+    def classify(self, exe_name, title=None):
+        """
+        返回 "whitelist" / "blacklist" / "neutral"
+        title 为 None 时只按程序模式匹配
+        """
+        if self.white_exe.matches(exe_name) or (title is not None and self.white_title.matches(title)):
+            return "whitelist"
+        if self.black_exe.matches(exe_name) or (title is not None and self.black_title.matches(title)):
+            return "blacklist"
+        return "neutral"
+
+
+def _rule_pairs(items):
+    pairs = []
+    for item in items:
+        exe_pattern = item.get("exe_name") or item.get("value") or ""
+        # 与旧逻辑一致：未设置 app_name 时用程序模式匹配标题，空字符串表示不匹配标题
+        title_pattern = item.get("app_name", exe_pattern) or ""
+        pairs.append((exe_pattern, title_pattern))
+    return pairs
+
+
+def build_matcher(settings):
+    """根据设置构建匹配器"""
+    return RuleMatcher(
+        _rule_pairs(settings.get("blacklist", [])),
+        _rule_pairs(settings.get("whitelist", []))
+    )
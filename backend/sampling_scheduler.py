@@ -0,0 +1,240 @@
+"""
+自适应采样调度
+监控循环不再固定间隔轮询：
+- 应用切换后按最短间隔采样，状态稳定或挂机时间隔按倍数退避到上限
+- 廉价探针（如最后输入时间）按较短周期检查：从挂机恢复时立即唤醒，不等下一次完整采样；
+  平时有输入时采样间隔不超过 input_interval
+- 截止事件（如奖励时间段结束）在到点时准时触发，而不是等到下一次采样
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from logger import log_to_file
+
+MIN_INTERVAL = 0.25     # 切换后的采样间隔（秒）
+INPUT_INTERVAL = 1.0    # 有输入但未切换时的最长采样间隔（秒）
+MAX_INTERVAL = 5.0      # 稳定时的最长采样间隔（秒）
+IDLE_INTERVAL = 30.0    # 挂机时的最长采样间隔（秒）
+BACKOFF = 2.0           # 每次稳定采样后间隔的放大倍数
+PROBE_INTERVAL = 0.25   # 廉价探针的检查间隔（秒）
+
+
+class AdaptiveScheduler:
+    """
+    自适应采样调度器
+    用法:
+        while True:
+            scheduler.wait()    # 等到下一次采样；期间到点的截止事件在此触发
+            changed = ...       # 完整采样（两次 wait() 之间的 CPU 耗时计入统计）
+            scheduler.activity() if changed else scheduler.stable()
+    """
+
+    def __init__(self, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, idle_interval=IDLE_INTERVAL,
+                 backoff=BACKOFF, probe=None, probe_interval=PROBE_INTERVAL, input_interval=INPUT_INTERVAL,
+                 name="sampler"):
+        """
+        Args:
+            probe: probe() -> 任意值，值变化时立即唤醒（如最后输入时间），None 表示不使用探针
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_interval = idle_interval
+        self.backoff = backoff
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.input_interval = input_interval
+        self.name = name
+        self.interval = min_interval
+        self._idle = False
+        self._last_probe = None
+        self._next_sample = time.monotonic()
+        self._deadlines = []           # (monotonic, seq, name, callback)
+        self._cancelled = set()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._woken = False
+        self._sample_started = None
+        self.stats = {"samples": 0, "wakes": 0, "probe_wakes": 0, "input_nudges": 0, "deadlines": 0, "deadline_lateness": 0.0,
+                      "cpu_seconds": 0.0, "max_interval_reached": 0}
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        """
+        从设置 sampling 项读取参数（min_interval/max_interval/idle_interval/backoff/probe_interval/input_interval）
+        kwargs 为该循环自己的默认值，设置中有的参数以设置为准
+        """
+        config = dict((settings or {}).get("sampling") or {})
+        allowed = ("min_interval", "max_interval", "idle_interval", "backoff", "probe_interval", "input_interval")
+        params = dict(kwargs)
+        params.update({k: float(config[k]) for k in allowed if k in config})
+        return cls(**params)
+
+    # ---------- 采样间隔 ----------
+    def activity(self):
+        """检测到输入或切换：回到最短间隔，并立即安排下一次采样"""
+        with self._cond:
+            self._idle = False
+            self.interval = self.min_interval
+            self._next_sample = time.monotonic() + self.interval
+            self._cond.notify_all()
+
+    def stable(self):
+        """本次采样无变化：间隔按倍数退避"""
+        with self._cond:
+            limit = self.idle_interval if self._idle else self.max_interval
+            self.interval = min(limit, max(self.min_interval, self.interval * self.backoff))
+            if self.interval >= limit:
+                self.stats["max_interval_reached"] += 1
+            self._next_sample = time.monotonic() + self.interval
+
+    def set_idle(self, idle):
+        """进入挂机时放宽间隔上限；退出挂机时恢复最短间隔"""
+        with self._cond:
+            was_idle, self._idle = self._idle, bool(idle)
+        if was_idle and not idle:
+            self.activity()
+
+    def wake(self):
+        """立即唤醒等待中的 wait()（可在其他线程调用）"""
+        with self._cond:
+            self._woken = True
+            self._next_sample = time.monotonic()
+            self._cond.notify_all()
+
+    # ---------- 截止事件 ----------
+    def add_deadline(self, callback, delay=None, at=None, name=""):
+        """
+        登记截止事件，到点时在 wait() 所在线程准时调用 callback()
+        delay 为秒数，at 为 epoch 秒或 datetime；返回可用于 cancel 的句柄
+        """
+        if at is not None:
+            at = at.timestamp() if hasattr(at, "timestamp") else at
+            delay = at - time.time()
+        when = time.monotonic() + max(0.0, delay or 0.0)
+        handle = next(self._seq)
+        with self._cond:
+            heapq.heappush(self._deadlines, (when, handle, name, callback))
+            self._cond.notify_all()
+        return handle
+
+    def cancel(self, handle):
+        with self._cond:
+            if any(h == handle for _, h, _, _ in self._deadlines):
+                self._cancelled.add(handle)
+
+    def next_deadline(self):
+        """下一个截止事件距现在的秒数，没有时返回 None"""
+        with self._cond:
+            self._drop_cancelled()
+            return max(0.0, self._deadlines[0][0] - time.monotonic()) if self._deadlines else None
+
+    def _drop_cancelled(self):
+        while self._deadlines and self._deadlines[0][1] in self._cancelled:
+            self._cancelled.discard(heapq.heappop(self._deadlines)[1])
+
+    def _fire_due(self):
+        fired = 0
+        while True:
+            with self._cond:
+                self._drop_cancelled()
+                if not self._deadlines or self._deadlines[0][0] > time.monotonic():
+                    return fired
+                when, _, name, callback = heapq.heappop(self._deadlines)
+                self.stats["deadlines"] += 1
+                self.stats["deadline_lateness"] = max(self.stats["deadline_lateness"], time.monotonic() - when)
+            try:
+                callback()
+            except Exception as e:
+                log_to_file(f"截止事件执行失败: {name} - {str(e)}", "ERROR")
+            fired += 1
+
+    # ---------- 等待 ----------
+    def _check_probe(self):
+        """探针值变化时返回 True"""
+        if self.probe is None:
+            return False
+        try:
+            value = self.probe()
+        except Exception:
+            return False
+        changed = self._last_probe is not None and value != self._last_probe
+        self._last_probe = value
+        return changed
+
+    def wait(self):
+        """
+        等到下一次采样时间，期间触发到点的截止事件
+        返回唤醒原因: "sample" / "wake" / "probe" / "deadline"
+        """
+        if self._sample_started is not None:
+            # 上次 wait() 返回到现在为一次完整采样
+            with self._cond:
+                self.stats["samples"] += 1
+                self.stats["cpu_seconds"] += time.thread_time() - self._sample_started
+        reason = self._wait()
+        self._sample_started = time.thread_time()
+        return reason
+
+    def _wait(self):
+        while True:
+            if self._fire_due():
+                return "deadline"
+            if self._check_probe():
+                if self._idle:
+                    # 挂机中出现输入：立即采样
+                    self.stats["probe_wakes"] += 1
+                    self.activity()
+                    return "probe"
+                # 有输入：下一次采样不晚于 input_interval
+                with self._cond:
+                    self.stats["input_nudges"] += 1
+                    self.interval = min(self.interval, self.input_interval)
+                    self._next_sample = min(self._next_sample, time.monotonic() + self.input_interval)
+            with self._cond:
+                if self._woken:
+                    self._woken = False
+                    self.stats["wakes"] += 1
+                    return "wake"
+                now = time.monotonic()
+                if now >= self._next_sample:
+                    return "sample"
+                timeout = self._next_sample - now
+                self._drop_cancelled()
+                if self._deadlines:
+                    timeout = min(timeout, self._deadlines[0][0] - now)
+                if self.probe is not None:
+                    timeout = min(timeout, self.probe_interval)
+                self._cond.wait(max(0.0, timeout))
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats["interval"] = self.interval
+            stats["idle"] = self._idle
+            stats["pending_deadlines"] = len(self._deadlines) - len(self._cancelled)
+            stats["name"] = self.name
+        stats["cpu_seconds"] = round(stats["cpu_seconds"], 6)
+        stats["deadline_lateness"] = round(stats["deadline_lateness"], 6)
+        return stats
+
+
+# 已登记的调度器，供接口查询统计
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def register(scheduler):
+    """登记调度器（按名称），返回调度器本身"""
+    with _schedulers_lock:
+        _schedulers[scheduler.name] = scheduler
+    return scheduler
+
+
+def get_stats():
+    """所有已登记调度器的统计"""
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    return {s.name: s.get_stats() for s in schedulers}
@@ -0,0 +1,113 @@
+import copy
+import json
+import threading
+import time
+
+from logger import log_to_file
+
+# 定期与数据库核对一次，以发现其他进程（如单独运行的 monitor.py）写入的设置
+REFRESH_INTERVAL = 5.0
+
+
+class SettingsStore:
+    """
+    进程内的设置缓存
+    - 解析后的设置常驻内存，读取不访问数据库
+    - 每次内容变化 version 单调递增，派生结构据此判断是否需要重建
+    - 变化时通知订阅者
+    """
+
+    def __init__(self, loader, refresh_interval=REFRESH_INTERVAL):
+        """
+        Args:
+            loader: loader() -> 数据库中的设置 JSON 文本（无记录时返回 None）
+        """
+        self._loader = loader
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._raw = None
+        self._data = {}
+        self._version = 0
+        self._checked_at = None
+        self._subscribers = []
+
+    def _apply(self, raw, data):
+        """内容变化时更新并通知订阅者（调用方持有锁）"""
+        self._raw = raw
+        self._data = data
+        self._version += 1
+        version = self._version
+        for callback in list(self._subscribers):
+            try:
+                callback(version, data)
+            except Exception as e:
+                log_to_file(f"设置变更通知失败: {str(e)}", "ERROR")
+
+    def _refresh_if_stale(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+                return
+            raw = self._loader()
+            self._checked_at = time.monotonic()
+            if raw != self._raw or self._version == 0:
+                self._apply(raw, json.loads(raw) if raw else {})
+
+    def current(self):
+        """
+        返回 (version, settings)
+        settings 是共享对象，调用方不能修改
+        """
+        self._refresh_if_stale()
+        with self._lock:
+            return self._version, self._data
+
+    def get(self):
+        """返回设置的副本，可以自由修改后交给 save_settings"""
+        return copy.deepcopy(self.current()[1])
+
+    @property
+    def version(self):
+        self._refresh_if_stale()
+        return self._version
+
+    def update(self, data):
+        """写库成功后调用：更新内存并递增版本"""
+        raw = json.dumps(data)
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if raw != self._raw:
+                self._apply(raw, copy.deepcopy(data))
+            return self._version
+
+    def invalidate(self):
+        """下次读取时强制从数据库重新加载"""
+        with self._lock:
+            self._checked_at = None
+
+    def subscribe(self, callback):
+        """订阅变更：callback(version, settings)，settings 只读"""
+        with self._lock:
+            self._subscribers.append(callback)
+        return callback
+
+    def derive(self, builder):
+        """
+        基于设置的派生结构，只在版本变化时重建
+        用法：get_rules = store.derive(build_rules); get_rules() -> build_rules(settings)
+        """
+        state = {"version": None, "value": None}
+        lock = threading.Lock()
+
+        def get_derived():
+            version, data = self.current()
+            if state["version"] != version:
+                with lock:
+                    if state["version"] != version:
+                        state["value"] = builder(data)
+                        state["version"] = version
+            return state["value"]
+
+        return get_derived
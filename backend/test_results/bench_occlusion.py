@@ -0,0 +1,70 @@
+"""
+对比可见面积计算耗时（随机窗口布局，双显示器）：
+- 原实现：每个窗口单独扫描线，最多统计 8 个遮挡窗口
+- occlusion：所有窗口一次计算，不限制遮挡窗口数
+用法: python bench_occlusion.py
+"""
+
+import sys
+import os
+import random
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import occlusion
+from occlusion import Rect, intersect_rect, rect_area, union_area_of_intersections
+
+MONITORS = [Rect(0, 0, 2560, 1440), Rect(2560, 0, 4480, 1080)]
+MAX_ABOVE = 8
+
+
+def random_layout(rng, n):
+    rects = []
+    for _ in range(n):
+        w, h = rng.randint(200, 1920), rng.randint(150, 1080)
+        x, y = rng.randint(-100, 4480 - w // 2), rng.randint(-50, 1440 - h // 2)
+        rects.append(Rect(x, y, x + w, y + h))
+    return rects, [rng.random() > 0.3 for _ in range(n)]
+
+
+def legacy(rects, visible, screen=MONITORS[0]):
+    """原 visible_area_of_hwnd 的计算方式（主显示器，最多 8 个遮挡窗口）"""
+    result = []
+    for i, rect in enumerate(rects):
+        target = intersect_rect(rect, screen) if visible[i] else None
+        if not target:
+            result.append(0)
+            continue
+        inters = []
+        for j in range(i):
+            if len(inters) >= MAX_ABOVE:
+                break
+            if visible[j]:
+                inter = intersect_rect(target, rects[j])
+                if inter:
+                    inters.append(inter)
+        result.append(rect_area(target) - union_area_of_intersections(target, inters))
+    return result
+
+
+def timed(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    rng = random.Random(5)
+    print(f"NumPy: {'可用' if occlusion.NUMPY_AVAILABLE else '不可用'}")
+    for n in (10, 100, 300, 1000):
+        rects, visible = random_layout(rng, n)
+        line = f"{n:5d} 个窗口  原实现(8个遮挡上限): {timed(legacy, rects, visible) * 1000:8.2f} ms"
+        if n <= 100:
+            exact = timed(occlusion._visible_areas_python, rects, visible, MONITORS, repeat=1)
+            line += f"  逐窗口无上限: {exact * 1000:8.2f} ms"
+        line += f"  NumPy 批量: {timed(occlusion._visible_areas_numpy, rects, visible, MONITORS) * 1000:8.2f} ms"
+        print(line)
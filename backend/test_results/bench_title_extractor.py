@@ -0,0 +1,40 @@
+"""
+对比标题提取耗时：原实现（逐窗口逐字比较） vs title_extractor（线性扫描 + 缓存）
+覆盖较长的浏览器和 IDE 标题
+用法: python bench_title_extractor.py [重复次数]
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from title_extractor import extract_app_title
+from test_title_extractor import reference_extract
+
+TITLES = [
+    ("chrome.exe", "Pull request #1234: Refactor the scheduling subsystem so that deadlines are respected "
+                   "across suspend and resume - Assumine/Time-Tracker - 个人 - Google Chrome"),
+    ("msedge.exe", "搜索结果 - " + "很长的查询词 " * 30 + "- 个人 - Microsoft Edge"),
+    ("firefox.exe", "Stack Overflow - " + "python performance question " * 20 + "- Mozilla Firefox"),
+    ("idea64.exe", "Time-Tracker – backend/enhanced_app_identifier.py [Time-Tracker] – " + "src/" * 60 + "IntelliJ"),
+    ("devenv.exe", "Solution1 (Running) - " + "Microsoft Visual Studio Preview " * 8),
+]
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for exe, title in TITLES:
+            func(exe, title)
+    return (time.perf_counter() - start) / (repeat * len(TITLES))
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for exe, title in TITLES:
+        assert extract_app_title.__wrapped__(exe, title) == reference_extract(exe, title)
+    print(f"标题长度: {', '.join(str(len(t)) for _, t in TITLES)}")
+    print(f"原实现: {timed(reference_extract, repeat) * 1e6:.1f} µs/次")
+    print(f"线性扫描（未缓存）: {timed(extract_app_title.__wrapped__, repeat) * 1e6:.1f} µs/次")
+    print(f"重复标题（命中缓存）: {timed(extract_app_title, repeat) * 1e6:.1f} µs/次")
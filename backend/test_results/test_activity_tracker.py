@@ -0,0 +1,171 @@
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+import db_utils
+from activity_tracker import ActivityTracker, BACKGROUND, FOREGROUND
+from audio_sessions import AudioSessionService
+from occlusion import Rect
+from window_snapshot import SnapshotProvider, Window
+from test_audio_sessions import FakeMeter, FakeSessionSource
+
+SCREEN = Rect(0, 0, 1000, 1000)
+
+
+class Layout:
+    """可修改的窗口布局，记录枚举次数"""
+
+    def __init__(self):
+        self.items = []
+        self.fg = None
+        self.enumerations = 0
+
+    def windows(self):
+        self.enumerations += 1
+        return list(self.items)
+
+    def foreground(self):
+        return self.fg
+
+    def monitors(self):
+        return [SCREEN]
+
+
+class StubProcesses:
+    """假的进程缓存：pid 存在即返回信息"""
+
+    def __init__(self):
+        self.alive = {}
+        self.listeners = []
+
+    def get(self, pid):
+        name = self.alive.get(pid)
+        if name is None:
+            return None
+        return {"pid": pid, "create_time": 1.0, "key": (pid, 1.0), "name": name, "exe": ""}
+
+    def on_exit(self, callback):
+        self.listeners.append(callback)
+
+
+def make_tracker(layout, sessions, **kwargs):
+    processes = StubProcesses()
+    processes.alive = {1: "code.exe", 2: "vlc.exe", 3: "spotify.exe", 4: "hidden.exe"}
+    tracker = ActivityTracker(snapshots=SnapshotProvider(layout, max_age=0), audio=AudioSessionService(sessions, interval=0),
+                              processes=processes, **kwargs)
+    return tracker, processes
+
+
+def test_foreground_and_background_tracked_together():
+    """测试前台、可见侧边窗口、后台声音同时计时，并分开累计"""
+    layout = Layout()
+    layout.items = [
+        Window(10, 1, True, Rect(0, 0, 600, 1000)),     # 前台编辑器
+        Window(20, 2, True, Rect(600, 0, 1000, 1000)),  # 侧边视频
+        Window(40, 4, True, Rect(0, 0, 600, 1000)),     # 被完全遮住
+    ]
+    layout.fg = 10
+    sessions = FakeSessionSource([(3, FakeMeter(0.3))])
+    tracker, _ = make_tracker(layout, sessions)
+
+    for t in range(4):
+        running = tracker.tick(now=float(t))
+    assert running == {(1, 1.0): FOREGROUND, (2, 1.0): BACKGROUND, (3, 1.0): BACKGROUND}
+    assert (4, 1.0) not in tracker.tracked()
+    # 每个周期只枚举一次窗口和一次音频会话
+    assert layout.enumerations == 4 and sessions.enumerations == 4
+
+    usage = tracker.drain()
+    assert usage[((2, 1.0), BACKGROUND)] > 0 and usage[((1, 1.0), FOREGROUND)] > 0
+    assert tracker.drain() == {}
+    print("✓ 前台与后台同时计时测试通过")
+
+
+def test_debounce_state_survives_switches_and_exit_clears_it():
+    """测试切换前台不会重置去抖状态，进程退出后移除"""
+    layout = Layout()
+    layout.items = [Window(10, 1, True, Rect(0, 0, 500, 1000)), Window(20, 2, True, Rect(500, 0, 1000, 1000))]
+    layout.fg = 10
+    tracker, processes = make_tracker(layout, FakeSessionSource([]))
+    for t in range(3):
+        tracker.tick(now=float(t))
+    layout.fg = 20
+    running = tracker.tick(now=3.0)
+    assert running[(1, 1.0)] == BACKGROUND and running[(2, 1.0)] == FOREGROUND
+
+    for callback in processes.listeners:
+        callback((2, 1.0))
+    assert (2, 1.0) not in tracker.tracked()
+    print("✓ 去抖状态保留与进程退出清理测试通过")
+
+
+def test_bounded_candidates():
+    """测试候选进程数有上限，前台优先"""
+    layout = Layout()
+    layout.items = [Window(100 + i, 100 + i, True, Rect(i * 100, 0, i * 100 + 100, 1000)) for i in range(10)]
+    layout.fg = 109
+    tracker, processes = make_tracker(layout, FakeSessionSource([]), max_tracked=3)
+    processes.alive = {100 + i: f"app{i}.exe" for i in range(10)}
+    tracker.tick(now=0.0)
+    assert len(tracker.tracked()) == 3 and (109, 1.0) in tracker.tracked()
+    print("✓ 候选进程数上限测试通过")
+
+
+def test_log_background_usage():
+    """测试后台时长按 (应用, 日期) 累加，与前台记录分开"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    db_utils.log_background_usage("VLC", "vlc.exe", 30, end_ts=1700000000)
+    db_utils.log_background_usage("VLC", "vlc.exe", 15, end_ts=1700000100)
+    day = db_utils.day_key(1700000000 - 30)
+    assert db_utils.get_background_totals(day, day) == {"VLC": 45}
+    assert db_utils.get_usage_totals(day, day)["seconds"] == 0
+    print("✓ 后台时长记录测试通过")
+
+
+def test_idle_ticks_record_no_visible_window_time():
+    """测试挂机时可见窗口不计时，后台声音照常计时"""
+    layout = Layout()
+    layout.items = [Window(10, 1, True, Rect(0, 0, 600, 1000)), Window(20, 2, True, Rect(600, 0, 1000, 1000))]
+    layout.fg = 10
+    sessions = FakeSessionSource([(3, FakeMeter(0.3))])
+    tracker, _ = make_tracker(layout, sessions)
+    for t in range(3):
+        tracker.tick(now=float(t))
+    tracker.drain()
+
+    for t in range(3, 10):
+        running = tracker.tick(now=float(t), idle=True)
+    assert running == {(3, 1.0): BACKGROUND}
+    usage = tracker.drain()
+    assert set(usage) == {((3, 1.0), BACKGROUND)}
+    print("✓ 挂机时可见窗口不计时测试通过")
+
+
+def test_sub_second_ticks_do_not_drift():
+    """测试每个周期都取出时，不足一秒的时长按进程累积到下次，不会因取整丢失"""
+    layout = Layout()
+    layout.items = [Window(10, 1, True, Rect(0, 0, 600, 1000)), Window(20, 2, True, Rect(600, 0, 1000, 1000))]
+    layout.fg = 10
+    tracker, _ = make_tracker(layout, FakeSessionSource([]))
+    drained = {}
+    for t in range(41):
+        tracker.tick(now=t * 0.25)
+        for key, seconds in tracker.drain().items():
+            assert isinstance(seconds, int)
+            drained[key] = drained.get(key, 0) + seconds
+    # 40 个 0.25 秒的周期共 10 秒；逐次取整时每次都是 0
+    assert drained == {((1, 1.0), FOREGROUND): 10, ((2, 1.0), BACKGROUND): 10}
+    print("✓ 短周期时长不丢失测试通过")
+
+
+if __name__ == "__main__":
+    test_foreground_and_background_tracked_together()
+    test_debounce_state_survives_switches_and_exit_clears_it()
+    test_bounded_candidates()
+    test_log_background_usage()
+    test_idle_ticks_record_no_visible_window_time()
+    test_sub_second_ticks_do_not_drift()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,70 @@
+import sys
+import os
+import random
+import string
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_index import AhoCorasick, InstalledAppIndex
+
+APPS = [
+    {"name": "Google Chrome", "version": "120.0", "install_location": "C:\\Program Files\\Google\\Chrome\\Application"},
+    {"name": "Chrome Remote Desktop Host", "version": "1.0", "install_location": "Unknown"},
+    {"name": "7-Zip 23.01 (x64)", "version": "23.01", "install_location": "C:\\Program Files\\7-Zip\\"},
+    {"name": "Discord", "version": "1.0.9", "install_location": ""},
+    {"name": "Microsoft Visual Studio Code", "version": "1.85", "install_location": "Unknown"},
+    {"name": "Notepad++ (64-bit x64)", "version": "8.6", "install_location": "Unknown"},
+    {"name": "Steam", "version": "2.10", "install_location": "C:\\Program Files (x86)\\Steam"},
+]
+
+
+def test_aho_corasick_matches_naive_search():
+    """测试自动机与逐个子串查找结果一致"""
+    rng = random.Random(7)
+    patterns = ["".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(50)]
+    automaton = AhoCorasick(patterns)
+    for _ in range(100):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 30)))
+        expected = sorted(p for p in set(patterns) for i in range(len(text)) if text.startswith(p, i))
+        assert sorted(automaton.find(text)) == expected
+    print("✓ 自动机与逐个查找结果一致测试通过")
+
+
+def test_match_direction_and_priority():
+    """测试用进程名查找应用（修正原来的匹配方向）"""
+    index = InstalledAppIndex(APPS)
+    # 进程名中的词出现在显示名称中，多个候选时取名称最短的
+    assert index.match("chrome.exe")["name"] == "Google Chrome"
+    assert index.match("Code.exe")["name"] == "Microsoft Visual Studio Code"
+    # 完整名称（只比较字母数字）
+    assert index.match("Discord.exe")["name"] == "Discord"
+    # 显示名称出现在进程名中
+    assert index.match("DiscordPTB.exe")["name"] == "Discord"
+    assert index.match("steamwebhelper.exe")["name"] == "Steam"
+    # 安装目录优先于名称
+    assert index.match("7zFM.exe", "C:\\Program Files\\7-Zip\\7zFM.exe")["name"].startswith("7-Zip")
+    assert index.match("helper.exe", "c:/program files (x86)/steam/bin/helper.exe")["name"] == "Steam"
+    # 过浅的目录和未知目录不参与匹配
+    assert index.match("explorer.exe", "C:\\Windows\\explorer.exe") is None
+    assert index.match("notepad++.exe")["name"].startswith("Notepad++")
+    assert index.match("explorer.exe") is None
+    print("✓ 匹配方向与优先级测试通过")
+
+
+def test_lookup_cost_independent_of_catalog_size():
+    """测试大量已安装应用时仍能正确匹配"""
+    rng = random.Random(1)
+    apps = [{"name": "".join(rng.choice(string.ascii_lowercase) for _ in range(12)),
+             "version": "1", "install_location": ""} for _ in range(5000)]
+    apps.append({"name": "Spotify", "version": "1.2", "install_location": ""})
+    index = InstalledAppIndex(apps)
+    assert index.match("Spotify.exe")["name"] == "Spotify"
+    assert index.match("SpotifyLauncher.exe")["name"] == "Spotify"
+    assert index.match("unrelated.exe") is None
+    print("✓ 大量已安装应用匹配测试通过")
+
+
+if __name__ == "__main__":
+    test_aho_corasick_matches_naive_search()
+    test_match_direction_and_priority()
+    test_lookup_cost_independent_of_catalog_size()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,95 @@
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+import db_utils
+from routes import apps
+
+def setup_apps(count):
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    now = int(time.time())
+    rows = []
+    for i in range(count):
+        rows.append(db_utils._usage_row(f"app{i}.exe", f"App{i}", 60, f"APP{i}", "文件名", end_ts=now))
+        rows.append(db_utils._usage_row(f"app{i}.exe", f"App{i}", 30, f"APP{i}", "文件名", end_ts=now - 86400))
+    db_utils._insert_usage_rows(rows)
+    with db_pool.write_transaction() as conn:
+        conn.execute("UPDATE app_usage SET is_blocked = 1 WHERE unique_id = 'APP0'")
+        conn.execute("INSERT INTO app_identifiers (unique_id, cooling_days) VALUES ('APP1', 3)")
+
+def test_apps_list_values():
+    """测试应用列表的数值与逐个查询一致"""
+    setup_apps(3)
+    conn = db_pool.get_read_connection()
+    result = {app["id"]: app for app in apps.build_apps_list(conn, 5)}
+    assert len(result) == 3
+    assert result["APP0"]["last3Days"] == [60, 30, 0, 0, 0]
+    assert result["APP0"]["dailyTime"] == 60
+    assert result["APP0"]["is_blocked"] and result["APP0"]["hasBlackHistory"]
+    assert result["APP1"]["coolingDays"] == 3 and not result["APP1"]["is_blocked"]
+    assert result["APP2"]["last3Days"][:3] == apps.calculate_last_n_days(conn, "APP2", 3)
+    print("✓ 应用列表数值测试通过")
+
+def test_apps_list_cached_until_insert():
+    """测试应用列表命中缓存，出现新应用后失效"""
+    setup_apps(2)
+    conn = db_pool.get_read_connection()
+    first = apps.build_apps_list(conn, 3)
+    assert apps.build_apps_list(conn, 3) is first
+    db_utils._insert_usage_rows([db_utils._usage_row("new.exe", "New", 5, "NEW", "文件名")])
+    assert len(apps.build_apps_list(conn, 3)) == 3
+    print("✓ 应用列表缓存测试通过")
+
+def test_single_app_flush_keeps_list_cached():
+    """测试已有应用的使用记录写入不会失效应用列表，冷却天数变化会"""
+    setup_apps(3)
+    conn = db_pool.get_read_connection()
+    first = apps.build_apps_list(conn, 3)
+    db_utils._insert_usage_rows([db_utils._usage_row("app1.exe", "App1", 5, "APP1", "文件名")])
+    assert apps.build_apps_list(conn, 3) is first
+    assert apps.calculate_last_n_days(conn, "APP1", 1) == [65]
+    db_utils.save_app_identifier("APP2", "app2.exe", "App2", "文件名", cooling_days=7)
+    second = apps.build_apps_list(conn, 3)
+    assert second is not first
+    assert {app["id"]: app for app in second}["APP2"]["coolingDays"] == 7
+    print("✓ 单应用写入不失效列表测试通过")
+
+def test_query_count_is_constant():
+    """测试查询次数不随应用数量增长"""
+    for count in (5, 200):
+        setup_apps(count)
+        conn = db_pool.get_read_connection()
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            assert len(apps.build_apps_list(conn, 7)) == count
+        finally:
+            conn.set_trace_callback(None)
+        assert len(statements) == 2, (count, len(statements))
+    print("✓ 查询次数恒定测试通过")
+
+def test_list_does_not_scan_usage_rows():
+    """测试应用列表只读元数据表和每日汇总表，不扫描 app_usage"""
+    setup_apps(20)
+    conn = db_pool.get_read_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        apps.build_apps_list(conn, 3)
+    finally:
+        conn.set_trace_callback(None)
+    plan = " ".join(str(tuple(r)) for r in conn.execute("EXPLAIN QUERY PLAN " + statements[0]))
+    assert "SCAN au" not in plan and "SCAN app_usage" not in plan, plan
+    print("✓ 应用列表不扫描使用记录测试通过")
+
+if __name__ == "__main__":
+    test_apps_list_values()
+    test_apps_list_cached_until_insert()
+    test_single_app_flush_keeps_list_cached()
+    test_query_count_is_constant()
+    test_list_does_not_scan_usage_rows()
+    print("\n=== 所有测试完成 ===")
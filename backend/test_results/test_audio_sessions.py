@@ -0,0 +1,89 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_sessions import AudioSessionService
+from enhanced_monitor import EnhancedMonitor
+from window_snapshot import SnapshotProvider
+
+
+class FakeMeter:
+    def __init__(self, peak):
+        self.peak = peak
+
+    def GetPeakValue(self):
+        if isinstance(self.peak, Exception):
+            raise self.peak
+        return self.peak
+
+
+class FakeSessionSource:
+    """假的 COM 层：记录枚举次数"""
+
+    def __init__(self, sessions):
+        self._sessions = sessions
+        self.enumerations = 0
+
+    def sessions(self):
+        self.enumerations += 1
+        if isinstance(self._sessions, Exception):
+            raise self._sessions
+        return list(self._sessions)
+
+
+class EmptyWindows:
+    def windows(self):
+        return []
+
+    def foreground(self):
+        return None
+
+    def monitors(self):
+        return []
+
+
+def test_peaks_refreshed_once_per_interval():
+    """测试同一周期内只枚举一次会话，多会话取最大峰值"""
+    source = FakeSessionSource([(10, FakeMeter(0.0)), (10, FakeMeter(0.4)), (20, FakeMeter(0.0005)),
+                                (30, FakeMeter(OSError("session gone")))])
+    audio = AudioSessionService(source, interval=60)
+    assert audio.peaks() == {10: 0.4, 20: 0.0005}
+    assert audio.is_audible(10) and not audio.is_audible(20) and not audio.is_audible(99)
+    assert audio.audible_pids() == {10}
+    assert source.enumerations == 1 and audio.stats["reuses"] == 4
+
+    audio.invalidate()
+    audio.peaks()
+    assert source.enumerations == 2
+    print("✓ 每周期只枚举一次会话测试通过")
+
+
+def test_refresh_after_interval_and_errors():
+    """测试过期后重新枚举，枚举失败时视为无声音"""
+    source = FakeSessionSource(RuntimeError("COM not initialized"))
+    audio = AudioSessionService(source, interval=0.01)
+    assert audio.peaks() == {} and audio.stats["errors"] == 1
+    time.sleep(0.02)
+    audio.peaks()
+    assert source.enumerations == 2
+    assert AudioSessionService(None).is_audible(1) is False
+    print("✓ 过期重新枚举与枚举失败测试通过")
+
+
+def test_monitors_share_audio_sessions():
+    """测试多个监控器在同一周期内共用一次会话枚举"""
+    source = FakeSessionSource([(7, FakeMeter(0.2))])
+    audio = AudioSessionService(source, interval=60)
+    windows = SnapshotProvider(EmptyWindows(), max_age=60)
+    monitors = [EnhancedMonitor(pid, snapshots=windows, audio=audio) for pid in (7, 8, 9)]
+    assert [m.should_count_once() for m in monitors] == [True, False, False]
+    assert source.enumerations == 1
+    print("✓ 多个监控器共用会话枚举测试通过")
+
+
+if __name__ == "__main__":
+    test_peaks_refreshed_once_per_interval()
+    test_refresh_after_interval_and_errors()
+    test_monitors_share_audio_sessions()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,208 @@
+import sys
+import os
+import datetime
+import hashlib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+import authenticode
+import pe_metadata
+from test_pe_metadata import build_pe, write_temp, STRINGS
+
+
+def der(tag, content):
+    length = len(content)
+    if length < 0x80:
+        header = bytes([tag, length])
+    else:
+        size = (length.bit_length() + 7) // 8
+        header = bytes([tag, 0x80 | size]) + length.to_bytes(size, "big")
+    return header + content
+
+
+def der_oid(oid):
+    parts = [int(p) for p in oid.split(".")]
+    body = bytes([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.insert(0, 0x80 | (part & 0x7F))
+            part >>= 7
+        body += bytes(chunk)
+    return der(0x06, body)
+
+
+def der_int(value):
+    return der(0x02, value.to_bytes((value.bit_length() + 8) // 8, "big", signed=True))
+
+
+SHA256 = "2.16.840.1.101.3.4.2.1"
+NULL = b"\x05\x00"
+
+
+def make_name(organization, common_name="Example Signer"):
+    return x509.Name([
+        x509.NameAttribute(NameOID.COMMON_NAME, common_name),
+        x509.NameAttribute(NameOID.ORGANIZATION_NAME, organization),
+    ])
+
+
+def make_cert(key, organization="Example Corp", issuer_key=None, issuer_name=None, ca=False, usage=None):
+    """生成证书：不给 issuer_key 时为自签名；ca=True 时为 CA 证书；usage 为扩展密钥用法列表"""
+    name = make_name(organization, "Example CA" if ca else "Example Signer")
+    now = datetime.datetime(2024, 1, 1)
+    builder = (x509.CertificateBuilder().subject_name(name).issuer_name(issuer_name or name)
+               .public_key(key.public_key()).serial_number(x509.random_serial_number())
+               .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=365))
+               .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True))
+    if usage is not None:
+        builder = builder.add_extension(x509.ExtendedKeyUsage(usage), critical=False)
+    return builder.sign(issuer_key or key, hashes.SHA256())
+
+
+def make_ca(organization="Example Root"):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key, make_cert(key, organization, ca=True)
+
+
+def sign_pe(data, key, cert, extra_certs=()):
+    """对 build_pe 生成的未签名映像做 Authenticode 签名，返回 PKCS#7 DER"""
+    meta = pe_metadata.parse_pe(data)
+    checksum, security_dir = meta["checksum_offset"], meta["security_dir_offset"]
+    image_digest = hashlib.sha256(data[:checksum] + data[checksum + 4:security_dir] + data[security_dir + 8:]).digest()
+
+    spc = der(0x30,
+              der(0x30, der_oid("1.3.6.1.4.1.311.2.1.15") + der(0x30, b"")) +
+              der(0x30, der(0x30, der_oid(SHA256) + NULL) + der(0x04, image_digest)))
+    spc_content = spc[2:] if spc[1] < 0x80 else spc[2 + (spc[1] & 0x7F):]
+    attributes = (
+        der(0x30, der_oid("1.2.840.113549.1.9.3") + der(0x31, der_oid(authenticode.OID_SPC_INDIRECT_DATA))) +
+        der(0x30, der_oid(authenticode.OID_MESSAGE_DIGEST) + der(0x31, der(0x04, hashlib.sha256(spc_content).digest())))
+    )
+    if isinstance(key, rsa.RSAPrivateKey):
+        signature = key.sign(der(0x31, attributes), padding.PKCS1v15(), hashes.SHA256())
+        signature_algorithm = der(0x30, der_oid("1.2.840.113549.1.1.1") + NULL)
+    else:
+        signature = key.sign(der(0x31, attributes), ec.ECDSA(hashes.SHA256()))
+        signature_algorithm = der(0x30, der_oid("1.2.840.10045.4.3.2"))
+    signer_info = der(0x30,
+                      der_int(1) +
+                      der(0x30, cert.issuer.public_bytes() + der_int(cert.serial_number)) +
+                      der(0x30, der_oid(SHA256) + NULL) +
+                      der(0xA0, attributes) +
+                      signature_algorithm +
+                      der(0x04, signature))
+    signed_data = der(0x30,
+                      der_int(1) +
+                      der(0x31, der(0x30, der_oid(SHA256) + NULL)) +
+                      der(0x30, der_oid(authenticode.OID_SPC_INDIRECT_DATA) + der(0xA0, spc)) +
+                      der(0xA0, b"".join(c.public_bytes(Encoding.DER) for c in (cert,) + tuple(extra_certs))) +
+                      der(0x31, signer_info))
+    return der(0x30, der_oid(authenticode.OID_SIGNED_DATA) + der(0xA0, signed_data))
+
+
+ROOT_KEY, ROOT = make_ca()
+TRUST = authenticode.TrustStore([ROOT])
+
+
+def build_signed_pe(key=None, organization="Example Corp", issuer=(ROOT_KEY, ROOT), extra_certs=(),
+                    usage=(ExtendedKeyUsageOID.CODE_SIGNING,)):
+    """签名证书默认由测试根证书 ROOT 签发；issuer=None 时为自签名"""
+    key = key or rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    issuer_key, issuer_cert = issuer or (None, None)
+    cert = make_cert(key, organization, issuer_key, issuer_cert.subject if issuer_cert else None,
+                     usage=list(usage) if usage is not None else None)
+    return build_pe(STRINGS, certificate=sign_pe(build_pe(STRINGS), key, cert, extra_certs))
+
+
+def test_valid_signature():
+    """测试证书链受信任的有效签名：返回 Signed 和签名组织"""
+    result = authenticode.verify_file(write_temp(build_signed_pe()), trust=TRUST)
+    assert result["status"] == authenticode.SIGNED, result["reason"]
+    assert result["organization"] == "Example Corp"
+    assert result["metadata"]["version_info"]["product_name"] == "Example App"
+    print("✓ 有效签名测试通过")
+
+
+def test_ecdsa_signature():
+    """测试 ECDSA 签名"""
+    data = build_signed_pe(ec.generate_private_key(ec.SECP256R1()), organization="EC Corp")
+    result = authenticode.verify_image(data, trust=TRUST)
+    assert result["status"] == authenticode.SIGNED and result["organization"] == "EC Corp"
+    print("✓ ECDSA 签名测试通过")
+
+
+def test_untrusted_chain():
+    """测试自签名或链不完整时判为 Untrusted，不采信签名者证书上的组织名"""
+    forged = authenticode.verify_image(build_signed_pe(organization="Microsoft Corporation", issuer=None), trust=TRUST)
+    assert forged["status"] == authenticode.UNTRUSTED and forged["organization"] is None
+
+    # 默认信任库在非 Windows 平台为空
+    assert authenticode.verify_image(build_signed_pe(), trust=authenticode.TrustStore())["status"] == authenticode.UNTRUSTED
+
+    # 不允许代码签名的证书
+    server_only = build_signed_pe(usage=(ExtendedKeyUsageOID.SERVER_AUTH,))
+    assert authenticode.verify_image(server_only, trust=TRUST)["status"] == authenticode.UNTRUSTED
+    print("✓ 不受信任证书链测试通过")
+
+
+def test_chain_through_intermediate():
+    """测试经由签名中附带的中间证书验证到根证书"""
+    intermediate_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    intermediate = make_cert(intermediate_key, "Example Intermediate", ROOT_KEY, ROOT.subject, ca=True)
+    data = build_signed_pe(issuer=(intermediate_key, intermediate), extra_certs=(intermediate,))
+    assert authenticode.verify_image(data, trust=TRUST)["status"] == authenticode.SIGNED
+
+    # 没有附带中间证书，但信任库中有
+    data = build_signed_pe(issuer=(intermediate_key, intermediate))
+    assert authenticode.verify_image(data, trust=TRUST)["status"] == authenticode.UNTRUSTED
+    trust = authenticode.TrustStore([ROOT], intermediates=[intermediate])
+    assert authenticode.verify_image(data, trust=trust)["status"] == authenticode.SIGNED
+    print("✓ 中间证书测试通过")
+
+
+def test_tampered_image():
+    """测试映像被修改后判为 Unsigned"""
+    data = bytearray(build_signed_pe())
+    data[0x400] ^= 0xFF  # .text 的第一个字节
+    result = authenticode.verify_image(bytes(data))
+    assert result["status"] == authenticode.UNSIGNED
+    assert result["organization"] is None
+    print("✓ 映像篡改测试通过")
+
+
+def test_tampered_signature():
+    """测试签名值被修改后判为 Unsigned"""
+    data = bytearray(build_signed_pe())
+    meta = pe_metadata.parse_pe(bytes(data))
+    cert = meta["certificates"][0]
+    # 签名值位于 SignerInfo 末尾，即 PKCS#7 数据的最后几个字节
+    data[cert["offset"] + cert["length"] - 1] ^= 0xFF
+    assert authenticode.verify_image(bytes(data))["status"] == authenticode.UNSIGNED
+    print("✓ 签名篡改测试通过")
+
+
+def test_unsigned_and_unknown():
+    """测试无签名、非PE、签名结构损坏三种情况"""
+    assert authenticode.verify_file(write_temp(build_pe(STRINGS)))["status"] == authenticode.UNSIGNED
+    assert authenticode.verify_file(write_temp(b"plain text file"))["status"] == authenticode.UNSIGNED
+    garbage = build_pe(STRINGS, certificate=b"\x30\x03\x02\x01\x01")
+    assert authenticode.verify_image(garbage)["status"] == authenticode.UNKNOWN
+    print("✓ 无签名/非PE/结构损坏测试通过")
+
+
+if __name__ == "__main__":
+    test_valid_signature()
+    test_ecdsa_signature()
+    test_untrusted_chain()
+    test_chain_through_intermediate()
+    test_tampered_image()
+    test_tampered_signature()
+    test_unsigned_and_unknown()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,74 @@
+import sys
+import os
+import sqlite3
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache
+
+def test_lru_bound():
+    """测试超过容量时淘汰最久未使用的项"""
+    store = cache.TTLCache(maxsize=2, ttl=60)
+    store.set("a", 1)
+    store.set("b", 2)
+    store.get("a")
+    store.set("c", 3)
+    assert store.get("b") is None and store.get("a") == 1 and store.get("c") == 3
+    assert len(store) == 2 and store.stats()["evictions"] == 1
+    print("✓ LRU 容量测试通过")
+
+def test_ttl_expire():
+    """测试过期项不会返回"""
+    store = cache.TTLCache(maxsize=10, ttl=0.05)
+    store.set("a", 1)
+    assert store.get("a") == 1
+    time.sleep(0.06)
+    assert store.get("a") is None and store.stats()["expirations"] == 1
+    print("✓ TTL 过期测试通过")
+
+def test_key_ignores_connection():
+    """测试不同连接对象命中同一缓存项"""
+    calls = []
+
+    @cached_fn
+    def lookup(conn, app_id):
+        calls.append(app_id)
+        return app_id.upper()
+
+    conn1 = sqlite3.connect(":memory:")
+    conn2 = sqlite3.connect(":memory:")
+    assert lookup(conn1, "a") == "A"
+    assert lookup(conn2, "a") == "A"
+    assert calls == ["a"]
+    assert lookup.cache.stats()["hits"] == 1
+    print("✓ 忽略连接参数测试通过")
+
+def cached_fn(func):
+    return cache.cached(maxsize=10, ttl=60, scope=lambda conn, app_id: app_id, tags=("test_usage",))(func)
+
+def test_scoped_invalidation():
+    """测试定向失效只影响对应应用和全局项"""
+
+    @cached_fn
+    def per_app(conn, app_id):
+        return object()
+
+    @cache.cached(maxsize=10, ttl=60, tags=("test_usage",))
+    def whole_list():
+        return object()
+
+    a, b, full = per_app(None, "a"), per_app(None, "b"), whole_list()
+    cache.invalidate("test_usage", scope="a")
+    assert per_app(None, "a") is not a
+    assert per_app(None, "b") is b
+    assert whole_list() is not full
+    assert cache.invalidate("unknown_tag") == 0
+    assert any(name.endswith("per_app") for name in cache.get_stats())
+    print("✓ 定向失效测试通过")
+
+if __name__ == "__main__":
+    test_lru_bound()
+    test_ttl_expire()
+    test_key_ignores_connection()
+    test_scoped_invalidation()
+    print("\n=== 所有测试完成 ===")
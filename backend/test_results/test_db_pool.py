@@ -0,0 +1,84 @@
+import sys
+import os
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+import db_utils
+
+def setup_temp_db():
+    """使用临时数据库，避免污染正式数据"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+
+def test_wal_and_pragmas():
+    """测试连接以WAL模式打开并设置了PRAGMA"""
+    setup_temp_db()
+    conn = db_pool.get_read_connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == db_pool.BUSY_TIMEOUT_MS
+    # 同一线程复用同一个连接
+    assert db_pool.get_read_connection() is conn
+    print("✓ WAL/PRAGMA 测试通过")
+
+def test_reader_is_readonly():
+    """测试读连接不能写入"""
+    setup_temp_db()
+    try:
+        db_pool.get_read_connection().execute("INSERT INTO rest_days (date) VALUES ('2024-01-01')")
+        assert False, "读连接不应允许写入"
+    except Exception:
+        pass
+    print("✓ 只读连接测试通过")
+
+def test_concurrent_read_write():
+    """测试读写并发时不会出现 database is locked"""
+    setup_temp_db()
+    errors = []
+
+    def writer():
+        try:
+            for _ in range(100):
+                db_utils.log_usage("a.exe", "A", 1, "A", "文件名")
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(100):
+                db_utils.get_recent_logs(10)
+                db_utils.load_settings()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=f) for f in (writer, writer, reader, reader)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors, errors
+    assert len(db_utils.get_recent_logs(1000)) == 200
+    print("✓ 读写并发测试通过")
+
+def test_write_rollback():
+    """测试写事务异常时回滚"""
+    setup_temp_db()
+    try:
+        with db_pool.write_transaction() as conn:
+            conn.execute("INSERT INTO rest_days (date) VALUES ('2024-01-01')")
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    count = db_pool.get_read_connection().execute("SELECT COUNT(*) FROM rest_days").fetchone()[0]
+    assert count == 0
+    print("✓ 写事务回滚测试通过")
+
+if __name__ == "__main__":
+    test_wal_and_pragmas()
+    test_reader_is_readonly()
+    test_concurrent_read_write()
+    test_write_rollback()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,69 @@
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+import db_utils
+from exe_identity_cache import ExeIdentityCache
+
+def make_exe(content=b"MZ" + b"\0" * 64):
+    path = os.path.join(tempfile.mkdtemp(), "app.exe")
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+def test_hit_and_invalidate_on_change():
+    """测试命中缓存，文件变化后自动失效"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    cache = ExeIdentityCache()
+    calls = []
+
+    def probe(path):
+        calls.append(path)
+        return {"signature_status": "Signed", "version": len(calls)}
+
+    exe = make_exe()
+    assert cache.get_or_compute(exe, probe)["version"] == 1
+    assert cache.get_or_compute(exe, probe)["version"] == 1
+    assert len(calls) == 1 and cache.hits == 1 and cache.misses == 1
+
+    with open(exe, "ab") as f:
+        f.write(b"patched")
+    assert cache.get_or_compute(exe, probe)["version"] == 2
+    assert cache.stale == 1
+    print("✓ 命中与失效测试通过")
+
+def test_persisted_across_restart():
+    """测试识别结果持久化，重启后直接命中"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    exe = make_exe()
+    first = ExeIdentityCache()
+    first.get_or_compute(exe, lambda p: {"signature_status": "Unsigned"})
+    first.flush()
+
+    second = ExeIdentityCache()
+    assert second.load() == 1
+    result = second.get_or_compute(exe, lambda p: {"signature_status": "should not run"})
+    assert result == {"signature_status": "Unsigned"}
+    assert second.stats()["hits"] == 1
+    print("✓ 持久化测试通过")
+
+def test_missing_file_not_cached():
+    """测试文件不存在时不缓存"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    cache = ExeIdentityCache()
+    missing = os.path.join(tempfile.mkdtemp(), "missing.exe")
+    assert cache.get(missing) == (None, None)
+    assert cache.get_or_compute(missing, lambda p: {"x": 1}) == {"x": 1}
+    assert cache.stats()["size"] == 0
+    print("✓ 不存在文件测试通过")
+
+if __name__ == "__main__":
+    test_hit_and_invalidate_on_change()
+    test_persisted_across_restart()
+    test_missing_file_not_cached()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,109 @@
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from identification_service import IdentificationService
+
+
+class SlowIdentifier:
+    """在 release() 之前一直阻塞的识别函数"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.calls = []
+
+    def identify(self, process_name, executable_path):
+        self.calls.append((process_name, executable_path))
+        self.gate.wait(5)
+        if process_name == "broken.exe":
+            raise RuntimeError("无法读取文件")
+        return {"process_name": process_name, "unique_id": f"{process_name}|Vendor",
+                "identifier_type": "数字签名"}
+
+
+def test_lookup_never_blocks_and_dedups():
+    """测试识别未完成时立即返回临时标识，同一文件只识别一次"""
+    slow = SlowIdentifier()
+    resolved = []
+    service = IdentificationService(slow.identify, on_resolved=lambda *args: resolved.append(args))
+    try:
+        start = time.monotonic()
+        for _ in range(20):
+            info = service.lookup("app.exe", "/opt/app/app.exe")
+        assert time.monotonic() - start < 0.5
+        assert info["provisional"] and info["unique_id"] == "app.exe"
+        assert service.pending() == 1 and service.stats["deduplicated"] == 19
+
+        slow.gate.set()
+        assert service.wait(timeout=5)
+        info = service.lookup("app.exe", "/opt/app/app.exe")
+        assert not info.get("provisional") and info["unique_id"] == "app.exe|Vendor"
+        assert len(slow.calls) == 1
+        assert resolved == [("app.exe", "/opt/app/app.exe", info)]
+    finally:
+        slow.gate.set()
+        service.stop()
+    print("✓ 不阻塞与去重测试通过")
+
+
+def test_pending_limit_and_errors():
+    """测试积压上限和识别失败后不立即重试"""
+    slow = SlowIdentifier()
+    service = IdentificationService(slow.identify, max_workers=1, max_pending=2)
+    try:
+        for i in range(5):
+            service.lookup(f"app{i}.exe", f"/opt/app{i}.exe")
+        assert service.pending() == 2 and service.stats["rejected"] == 3
+
+        slow.gate.set()
+        assert service.wait(timeout=5)
+        service.lookup("broken.exe", "/opt/broken.exe")
+        assert service.wait(timeout=5)
+        assert service.lookup("broken.exe", "/opt/broken.exe")["provisional"]
+        assert service.stats["errors"] == 1 and service.stats["submitted"] == 3 and service.pending() == 0
+    finally:
+        slow.gate.set()
+        service.stop()
+    print("✓ 积压上限与失败重试测试通过")
+
+
+def test_stale_result_refreshed_in_background():
+    """测试过期结果继续返回，同时后台刷新"""
+    slow = SlowIdentifier()
+    slow.gate.set()
+    service = IdentificationService(slow.identify, result_ttl=0)
+    try:
+        service.lookup("app.exe", "/opt/app.exe")
+        assert service.wait(timeout=5)
+        info = service.lookup("app.exe", "/opt/app.exe")
+        assert not info.get("provisional")
+        assert service.wait(timeout=5)
+        assert len(slow.calls) == 2 and service.stats["refreshes"] == 1
+    finally:
+        service.stop()
+    print("✓ 过期结果后台刷新测试通过")
+
+
+def test_stop_waits_for_running_identification():
+    """测试停止时等待正在执行的识别完成，结果回调照常执行，排队的任务被丢弃"""
+    slow = SlowIdentifier()
+    resolved = []
+    service = IdentificationService(slow.identify, max_workers=1, on_resolved=lambda *args: resolved.append(args[0]))
+    service.lookup("running.exe", "/opt/running.exe")
+    service.lookup("queued.exe", "/opt/queued.exe")
+    time.sleep(0.05)
+    threading.Timer(0.1, slow.gate.set).start()
+    service.stop(timeout=5)
+    assert resolved == ["running.exe"]
+    assert service.pending() == 0
+    print("✓ 停止时等待识别完成测试通过")
+
+
+if __name__ == "__main__":
+    test_lookup_never_blocks_and_dedups()
+    test_pending_limit_and_errors()
+    test_stale_result_refreshed_in_background()
+    test_stop_waits_for_running_identification()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,61 @@
+import sys
+import os
+import sqlite3
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+import db_utils
+
+def setup_temp_db(path=None):
+    db_pool.configure(path or os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+
+def test_new_identity_in_memory():
+    """测试判断新应用不访问数据库，新标识批量写入"""
+    setup_temp_db()
+    conn = db_pool.get_read_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        assert not db_utils.check_app_identifier_exists("Chrome//Google", "数字签名")
+        assert db_utils.store_app_identifier(1, "Chrome//Google", "数字签名", "chrome.exe",
+                                             "C:\\chrome.exe", {"organization": "Google LLC"})
+        assert db_utils.check_app_identifier_exists("Chrome//Google", "数字签名")
+        assert not db_utils.store_app_identifier(1, "Chrome//Google", "数字签名")
+    finally:
+        conn.set_trace_callback(None)
+    assert statements == []
+
+    db_utils.identity_registry.flush()
+    row = conn.execute("SELECT exe_name, executable_path, metadata, first_seen, last_seen FROM app_identity").fetchone()
+    assert row[0] == "chrome.exe" and row[1] == "C:\\chrome.exe"
+    assert "Google LLC" in row[2] and row[3] == row[4]
+    # 不再向 app_usage 写占位记录
+    assert conn.execute("SELECT COUNT(*) FROM app_usage").fetchone()[0] == 0
+    print("✓ 内存判断与批量写入测试通过")
+
+def test_registry_loaded_at_startup():
+    """测试启动时加载已知标识，并回填/清理旧的占位记录"""
+    path = os.path.join(tempfile.mkdtemp(), "legacy.db")
+    legacy = sqlite3.connect(path)
+    legacy.execute("CREATE TABLE app_usage (id INTEGER PRIMARY KEY AUTOINCREMENT, start_time TEXT, exe_name TEXT, "
+                   "app_name TEXT, duration INTEGER, unique_id TEXT, identifier_type TEXT)")
+    legacy.execute("INSERT INTO app_usage (start_time, exe_name, app_name, duration, unique_id, identifier_type) "
+                   "VALUES ('2024-01-01T10:00:00', '', '', 0, 'a.exe', '文件名')")
+    legacy.execute("INSERT INTO app_usage (start_time, exe_name, app_name, duration, unique_id, identifier_type) "
+                   "VALUES ('2024-01-01T11:00:00', 'a.exe', 'A', 60, 'a.exe', '文件名')")
+    legacy.commit()
+    legacy.close()
+
+    setup_temp_db(path)
+    assert db_utils.check_app_identifier_exists("a.exe", "文件名")
+    conn = db_pool.get_read_connection()
+    assert conn.execute("SELECT COUNT(*) FROM app_usage").fetchone()[0] == 1
+    assert conn.execute("SELECT exe_name FROM app_identity").fetchone()[0] == "a.exe"
+    print("✓ 启动加载与回填测试通过")
+
+if __name__ == "__main__":
+    test_new_identity_in_memory()
+    test_registry_loaded_at_startup()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,114 @@
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil
+
+import db_pool
+import db_utils
+from exe_identity_cache import ExeIdentityCache
+from identification_service import IdentificationService
+from identity_warmup import IdentityWarmup, crawl_install_roots
+from test_pe_metadata import build_pe, STRINGS
+from test_authenticode import build_signed_pe
+
+
+def make_install_root():
+    root = tempfile.mkdtemp()
+    os.makedirs(os.path.join(root, "Example", "bin"))
+    files = {
+        os.path.join(root, "Example", "bin", "example.exe"): build_signed_pe(),
+        os.path.join(root, "Example", "tool.exe"): build_pe(STRINGS),
+        os.path.join(root, "Example", "readme.txt"): b"not an executable",
+    }
+    for path, data in files.items():
+        with open(path, "wb") as f:
+            f.write(data)
+    return root
+
+
+def test_crawl_install_roots():
+    """测试只收集可执行文件，并遵守数量上限"""
+    root = make_install_root()
+    assert sorted(os.path.basename(p) for p in crawl_install_roots([root])) == ["example.exe", "tool.exe"]
+    assert len(crawl_install_roots([root], max_files=1)) == 1
+    assert crawl_install_roots([os.path.join(root, "missing")]) == []
+    print("✓ 安装目录扫描测试通过")
+
+
+def test_warmup_fills_cache_and_skips_cached():
+    """测试预热：在进程池中识别并写入缓存，第二次全部命中"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    cache = ExeIdentityCache()
+    root = make_install_root()
+    warmup = IdentityWarmup(cache, roots=lambda: [root], include_running=False)
+
+    assert warmup.run_once() == 2
+    progress = warmup.progress()
+    assert progress["state"] == "idle" and progress["runs"] == 1
+    assert progress["total"] == 2 and progress["queued"] == 2 and progress["done"] == 2
+    assert progress["percent"] == 100.0
+
+    signed = os.path.join(root, "Example", "bin", "example.exe")
+    _, result = cache.get(signed)
+    # 测试根证书不在系统信任库中
+    assert result["signature_status"] == "Untrusted" and result["organization"] is None
+    assert result["version_info"] == {"product_name": "Example App", "company_name": "Example Corp"}
+
+    assert warmup.run_once() == 0
+    assert warmup.progress()["cached"] == 2
+    print("✓ 预热写入缓存与跳过已缓存测试通过")
+
+
+def test_unparsed_files_left_for_in_process_fallback():
+    """测试无法解析的文件不写入缓存，留给识别时用系统 API 补充版本信息"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    cache = ExeIdentityCache()
+    root = make_install_root()
+    broken = os.path.join(root, "Example", "broken.exe")
+    with open(broken, "wb") as f:
+        f.write(b"MZ" + b"\0" * 16)
+
+    warmup = IdentityWarmup(cache, roots=lambda: [root], include_running=False)
+    warmup.run_once()
+    assert warmup.progress()["deferred"] == 1
+    assert cache.get(broken)[1] is None
+    assert cache.get(os.path.join(root, "Example", "tool.exe"))[1]["pe_parsed"] is True
+    print("✓ 无法解析的文件留给系统 API 补充测试通过")
+
+
+def test_running_processes_primed_with_final_results():
+    """测试预热后运行中的进程已有正式识别结果，首次切换不再返回临时标识"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    identified = []
+
+    def identify(process_name, executable_path):
+        identified.append(process_name)
+        return {"process_name": process_name, "unique_id": process_name.lower(), "identifier_type": "APPID"}
+
+    service = IdentificationService(identify)
+    warmup = IdentityWarmup(ExeIdentityCache(), roots=lambda: [], prime=service.prime)
+    warmup.run_once()
+
+    me = psutil.Process()
+    assert warmup.progress()["primed"] >= 1
+    info = service.lookup(me.name(), me.exe())
+    assert not info.get("provisional") and info["unique_id"] == me.name().lower()
+    # 已有结果的不再重复识别
+    count = len(identified)
+    warmup.run_once()
+    assert len(identified) == count and warmup.progress()["primed"] == 0
+    service.stop()
+    print("✓ 运行中进程预先识别测试通过")
+
+
+if __name__ == "__main__":
+    test_crawl_install_roots()
+    test_warmup_fills_cache_and_skips_cached()
+    test_unparsed_files_left_for_in_process_fallback()
+    test_running_processes_primed_with_final_results()
+    print("\n=== 所有测试完成 ===")
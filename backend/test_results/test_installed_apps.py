@@ -0,0 +1,110 @@
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+import db_utils
+from installed_apps import InstalledAppsCatalog
+
+
+class StubReader:
+    """用内存数据代替 winreg 的注册表读取器"""
+
+    hives = ("HKLM\\Uninstall", "HKLM\\WOW6432Node\\Uninstall")
+
+    def __init__(self, delay=0.0):
+        self.data = {
+            self.hives[0]: [{"name": "Google Chrome", "version": "120.0", "install_location": "C:\\Chrome"}],
+            self.hives[1]: [{"name": "7-Zip", "version": "23.01", "install_location": "C:\\7-Zip"}],
+        }
+        self.stamps = {hive: [100, 1] for hive in self.hives}
+        self.reads = []
+        self.delay = delay
+
+    def stamp(self, hive):
+        return self.stamps.get(hive)
+
+    def read(self, hive):
+        time.sleep(self.delay)
+        self.reads.append(hive)
+        return list(self.data[hive])
+
+
+def setup_db():
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+
+
+def test_background_load_does_not_block():
+    """测试后台加载：start() 立即返回，加载完成后可用"""
+    setup_db()
+    reader = StubReader(delay=0.2)
+    start = time.monotonic()
+    catalog = InstalledAppsCatalog(reader).start()
+    assert time.monotonic() - start < 0.1
+    assert catalog.apps() == []
+    assert catalog.wait(timeout=5)
+    assert [app["name"] for app in catalog.apps()] == ["Google Chrome", "7-Zip"]
+    catalog.stop()
+    print("✓ 后台加载不阻塞测试通过")
+
+
+def test_snapshot_reused_until_hive_changes():
+    """测试快照持久化：键未变化时不重新扫描，变化时只扫描变化的键"""
+    setup_db()
+    reader = StubReader()
+    first = InstalledAppsCatalog(reader)
+    assert first.refresh() == 2
+
+    second = InstalledAppsCatalog(reader)
+    assert second.load_snapshot() == 2
+    assert second.refresh() == 0
+    assert len(reader.reads) == 2
+    assert [app["name"] for app in second.apps()] == ["Google Chrome", "7-Zip"]
+
+    versions = []
+    second.subscribe(lambda version, apps: versions.append((version, len(apps))))
+    reader.data[reader.hives[1]].append({"name": "VLC", "version": "3.0", "install_location": ""})
+    reader.stamps[reader.hives[1]] = [200, 2]
+    assert second.refresh() == 1
+    assert reader.reads[-1] == reader.hives[1]
+    assert versions == [(second.version, 3)]
+    print("✓ 快照复用与增量扫描测试通过")
+
+
+def test_missing_hive_and_max_age():
+    """测试不存在的键和快照过期"""
+    setup_db()
+    reader = StubReader()
+    reader.stamps[reader.hives[1]] = None
+    catalog = InstalledAppsCatalog(reader, max_age=0)
+    catalog.refresh()
+    assert reader.reads == [reader.hives[0]]
+    assert [app["name"] for app in catalog.apps()] == ["Google Chrome"]
+    # max_age=0：每次检查都重新扫描
+    catalog.refresh()
+    assert reader.reads == [reader.hives[0]] * 2
+    print("✓ 缺失键与快照过期测试通过")
+
+
+def test_index_rebuilt_when_catalog_changes():
+    """测试应用列表变化后索引重建"""
+    setup_db()
+    reader = StubReader()
+    catalog = InstalledAppsCatalog(reader)
+    assert catalog.index().match("chrome.exe") is None
+    catalog.refresh()
+    index = catalog.index()
+    assert index.match("chrome.exe")["name"] == "Google Chrome"
+    assert catalog.index() is index
+    print("✓ 应用列表变化后索引重建测试通过")
+
+
+if __name__ == "__main__":
+    test_background_load_does_not_block()
+    test_snapshot_reused_until_hive_changes()
+    test_missing_hive_and_max_age()
+    test_index_rebuilt_when_catalog_changes()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,76 @@
+import sys
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+import db_utils
+import migrations
+
+def index_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+
+def test_fresh_install():
+    """测试新库启动时建好表、列和索引"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    conn = db_pool.get_read_connection()
+    assert migrations.get_schema_version() == migrations.MIGRATIONS[-1][0]
+    assert migrations._column_exists(conn, "app_usage", "is_blocked")
+    assert conn.execute("SELECT COUNT(*) FROM app_identifiers").fetchone()[0] == 0
+    assert migrations._column_exists(conn, "app_usage", "day")
+    assert {"idx_app_usage_uid_day", "idx_app_usage_blocked_uid"} <= index_names(conn)
+    plan = " ".join(str(r[3]) for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT unique_id FROM app_usage WHERE is_blocked = 1 GROUP BY unique_id"))
+    assert "idx_app_usage_blocked_uid" in plan, plan
+    print("✓ 新库迁移测试通过")
+
+def test_idempotent_on_legacy_db():
+    """测试旧库（手工建过索引、缺少版本表）可以正常迁移，且重复执行无副作用"""
+    path = os.path.join(tempfile.mkdtemp(), "legacy.db")
+    legacy = sqlite3.connect(path)
+    legacy.execute("CREATE TABLE app_usage (id INTEGER PRIMARY KEY AUTOINCREMENT, start_time TEXT, exe_name TEXT, "
+                   "app_name TEXT, duration INTEGER, unique_id TEXT, identifier_type TEXT, is_blocked INTEGER)")
+    legacy.execute("CREATE INDEX idx_app_usage_unique_id ON app_usage (unique_id)")
+    legacy.execute("INSERT INTO app_usage (start_time, exe_name, duration, unique_id) VALUES ('2024-01-01', 'a.exe', 5, 'A')")
+    legacy.commit()
+    legacy.close()
+
+    db_pool.configure(path)
+    assert migrations.run_migrations() == [m[0] for m in migrations.MIGRATIONS]
+    assert migrations.run_migrations() == []
+    conn = db_pool.get_read_connection()
+    assert "idx_app_usage_unique_id" not in index_names(conn)
+    assert conn.execute("SELECT COUNT(*) FROM app_usage").fetchone()[0] == 1
+    print("✓ 旧库迁移测试通过")
+
+def test_interval_backfill():
+    """测试旧数据回填 start_ts/end_ts/day，且按日期的查询走索引"""
+    path = os.path.join(tempfile.mkdtemp(), "legacy.db")
+    legacy = sqlite3.connect(path)
+    legacy.execute("CREATE TABLE app_usage (id INTEGER PRIMARY KEY AUTOINCREMENT, start_time TEXT, exe_name TEXT, "
+                   "app_name TEXT, duration INTEGER, unique_id TEXT, identifier_type TEXT)")
+    legacy.execute("INSERT INTO app_usage (start_time, exe_name, duration, unique_id) "
+                   "VALUES ('2024-03-02T00:10:00.123456', 'a.exe', 1200, 'A')")
+    legacy.commit()
+    legacy.close()
+
+    db_pool.configure(path)
+    migrations.run_migrations()
+    conn = db_pool.get_read_connection()
+    start_ts, end_ts, day = conn.execute("SELECT start_ts, end_ts, day FROM app_usage").fetchone()
+    expected_end = int(datetime(2024, 3, 2, 0, 10).timestamp())
+    assert end_ts == expected_end and start_ts == expected_end - 1200
+    assert day == "2024-03-01"  # 会话开始于前一天 23:50
+    plan = " ".join(str(r[3]) for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT SUM(duration) FROM app_usage WHERE unique_id = 'A' AND day BETWEEN '2024-03-01' AND '2024-03-03'"))
+    assert "idx_app_usage_uid_day" in plan, plan
+    print("✓ 区间回填测试通过")
+
+if __name__ == "__main__":
+    test_fresh_install()
+    test_idempotent_on_legacy_db()
+    test_interval_backfill()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,76 @@
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import occlusion
+from occlusion import Rect, visible_areas
+
+
+def raster(rects, visible, monitors):
+    """逐像素计算，作为小坐标布局的标准答案"""
+    n = len(rects)
+    vis = [0] * n
+    on_screen = [0] * n
+    for m in monitors:
+        for y in range(m.top, m.bottom):
+            for x in range(m.left, m.right):
+                owner = None
+                for i, r in enumerate(rects):
+                    if r is None or not (r.left <= x < r.right and r.top <= y < r.bottom):
+                        continue
+                    on_screen[i] += 1
+                    if owner is None and visible[i]:
+                        owner = i
+                if owner is not None:
+                    vis[owner] += 1
+    return vis, on_screen
+
+
+def random_layout(rng, n, span=40):
+    rects = []
+    for _ in range(n):
+        x, y = rng.randint(-10, span), rng.randint(-10, span)
+        rects.append(Rect(x, y, x + rng.randint(0, 25), y + rng.randint(0, 25)))
+    rects[rng.randrange(n)] = None
+    return rects, [rng.random() > 0.2 for _ in range(n)]
+
+
+def test_matches_raster_on_two_monitors():
+    """测试双显示器、无遮挡数量上限时与逐像素结果一致"""
+    rng = random.Random(11)
+    monitors = [Rect(0, 0, 30, 20), Rect(30, 5, 50, 35)]
+    for _ in range(30):
+        rects, visible = random_layout(rng, rng.randint(1, 20))
+        expected = raster(rects, visible, monitors)
+        assert visible_areas(rects, visible, monitors) == expected
+        assert occlusion._visible_areas_numpy(rects, visible, monitors) == expected
+        assert occlusion._visible_areas_python(rects, visible, monitors) == expected
+    print("✓ 双显示器与逐像素结果一致测试通过")
+
+
+def test_more_than_eight_occluders():
+    """测试超过 8 个遮挡窗口时仍然正确（原实现只统计前 8 个）"""
+    strips = [Rect(i * 10, 0, i * 10 + 10, 100) for i in range(10)]
+    rects = strips + [Rect(0, 0, 100, 100)]
+    for compute in (occlusion._visible_areas_numpy, occlusion._visible_areas_python):
+        visible, screen = compute(rects, [True] * len(rects), [Rect(0, 0, 100, 100)])
+        assert visible[-1] == 0 and screen[-1] == 100 * 100
+        assert visible[:10] == [1000] * 10
+    print("✓ 超过 8 个遮挡窗口测试通过")
+
+
+def test_empty_inputs():
+    """测试没有窗口或没有显示器"""
+    for compute in (occlusion._visible_areas_numpy, occlusion._visible_areas_python):
+        assert compute([], [], [Rect(0, 0, 10, 10)]) == ([], [])
+        assert compute([Rect(0, 0, 5, 5)], [True], []) == ([0], [0])
+        assert compute([Rect(0, 0, 5, 5)], [False], [Rect(0, 0, 10, 10)]) == ([0], [25])
+    print("✓ 无窗口或无显示器测试通过")
+
+
+if __name__ == "__main__":
+    test_matches_raster_on_two_monitors()
+    test_more_than_eight_occluders()
+    test_empty_inputs()
+    print("\n=== 所有测试完成 ===")
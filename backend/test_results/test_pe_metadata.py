@@ -0,0 +1,187 @@
+import sys
+import os
+import struct
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pe_metadata
+
+
+def _pad4(data):
+    return data + b"\0" * (-len(data) % 4)
+
+
+def _version_block(key, value=b"", value_type=0, children=b""):
+    """构造一个版本信息块：wLength, wValueLength, wType, szKey, 对齐, Value, 对齐, Children"""
+    body = _pad4(struct.pack("<HHH", 0, 0, 0) + (key + "\0").encode("utf-16-le"))[6:]
+    body += value
+    if children:
+        body = _pad4(struct.pack("<HHH", 0, 0, 0) + body)[6:] + children
+    value_length = len(value) // 2 if value_type == 1 else len(value)
+    return struct.pack("<HHH", 6 + len(body), value_length, value_type) + body
+
+
+def build_version_info(strings, translation=(0x0409, 0x04B0)):
+    table_key = f"{translation[0]:04x}{translation[1]:04x}"
+    entries = b"".join(
+        _pad4(_version_block(name, (value + "\0").encode("utf-16-le"), 1))
+        for name, value in strings.items()
+    )
+    string_file_info = _version_block("StringFileInfo", children=_pad4(_version_block(table_key, children=entries)))
+    var_file_info = _version_block(
+        "VarFileInfo", children=_version_block("Translation", struct.pack("<HH", *translation))
+    )
+    fixed = struct.pack("<13I", 0xFEEF04BD, 0x10000, 0x00010002, 0x00030004, 0x00010002, 0x00030004,
+                        0x3F, 0, 0x40004, 1, 0, 0, 0)
+    return _version_block("VS_VERSION_INFO", fixed, 0, _pad4(string_file_info) + var_file_info)
+
+
+def build_pe(strings=None, certificate=None, text_size=0x200, is_64bit=True):
+    """
+    构造一个最小可解析的 PE 文件（.text + .rsrc，可选证书表）
+    返回 bytes
+    """
+    file_align, section_align, headers_size = 0x200, 0x1000, 0x400
+    opt_size = 240 if is_64bit else 224
+
+    # 资源节：类型(16) -> 名称(1) -> 语言(0x409) -> 数据项 -> VS_VERSIONINFO
+    rsrc_rva = section_align + (text_size + section_align - 1) // section_align * section_align
+    rsrc = b""
+    if strings is not None:
+        version = build_version_info(strings)
+        directory = lambda entry_id, target: struct.pack("<IIHHHH", 0, 0, 0, 0, 0, 1) + struct.pack("<II", entry_id, target)
+        data_offset = 24 * 3 + 16
+        rsrc = directory(16, 0x80000000 | 24) + directory(1, 0x80000000 | 48) + directory(0x409, 72)
+        rsrc += struct.pack("<IIII", rsrc_rva + data_offset, len(version), 0, 0) + version
+    rsrc_raw = rsrc + b"\0" * (-len(rsrc) % file_align) if rsrc else b""
+    text_raw = b"\xCC" * text_size + b"\0" * (-text_size % file_align)
+
+    sections = [(b".text", text_size, section_align, len(text_raw), headers_size)]
+    if rsrc_raw:
+        sections.append((b".rsrc", len(rsrc), rsrc_rva, len(rsrc_raw), headers_size + len(text_raw)))
+    image_end = sections[-1][2] + sections[-1][1]
+    size_of_image = (image_end + section_align - 1) // section_align * section_align
+
+    body_end = headers_size + len(text_raw) + len(rsrc_raw)
+    cert_blob = b""
+    if certificate is not None:
+        entry = struct.pack("<IHH", 8 + len(certificate), 0x0200, 0x0002) + certificate
+        cert_blob = entry + b"\0" * (-len(entry) % 8)
+
+    directories = [(0, 0)] * 16
+    if rsrc:
+        directories[2] = (rsrc_rva, len(rsrc))
+    if cert_blob:
+        directories[4] = (body_end, len(cert_blob))
+
+    if is_64bit:
+        opt = struct.pack("<HBBIIIIIQIIHHHHHHIIIIHHQQQQII", 0x20B, 14, 0, len(text_raw), len(rsrc_raw), 0,
+                          section_align, section_align, 0x140000000, section_align, file_align,
+                          6, 0, 0, 0, 6, 0, 0, size_of_image, headers_size, 0, 2, 0x8160,
+                          0x100000, 0x1000, 0x100000, 0x1000, 0, 16)
+    else:
+        opt = struct.pack("<HBBIIIIIIIIIHHHHHHIIIIHHIIIIII", 0x10B, 14, 0, len(text_raw), len(rsrc_raw), 0,
+                          section_align, section_align, section_align * 2, 0x400000, section_align, file_align,
+                          6, 0, 0, 0, 6, 0, 0, size_of_image, headers_size, 0, 2, 0x8140,
+                          0x100000, 0x1000, 0x100000, 0x1000, 0, 16)
+    opt += b"".join(struct.pack("<II", *d) for d in directories)
+    assert len(opt) == opt_size
+
+    coff = struct.pack("<HHIIIHH", 0x8664 if is_64bit else 0x14C, len(sections), 0, 0, 0, opt_size, 0x22)
+    section_table = b"".join(
+        struct.pack("<8sIIIIIIHHI", name, vsize, vaddr, raw_size, raw_ptr, 0, 0, 0, 0, 0x60000020)
+        for name, vsize, vaddr, raw_size, raw_ptr in sections
+    )
+    dos = bytearray(0x80)
+    dos[0:2] = b"MZ"
+    struct.pack_into("<I", dos, 0x3C, 0x80)
+    headers = bytes(dos) + b"PE\0\0" + coff + opt + section_table
+    headers += b"\0" * (headers_size - len(headers))
+    return headers + text_raw + rsrc_raw + cert_blob
+
+
+def write_temp(data):
+    path = os.path.join(tempfile.mkdtemp(), "sample.exe")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+STRINGS = {"CompanyName": "Example Corp", "ProductName": "Example App", "FileVersion": "1.2.3.4"}
+
+
+def test_version_info_and_certificate():
+    """测试读取版本资源字符串和证书表（PE32+ 和 PE32）"""
+    for is_64bit in (True, False):
+        path = write_temp(build_pe(STRINGS, certificate=b"\x30\x03\x02\x01\x01", is_64bit=is_64bit))
+        meta = pe_metadata.extract_pe_metadata(path)
+        assert meta["is_64bit"] is is_64bit
+        info = meta["version_info"]
+        assert info["product_name"] == "Example App"
+        assert info["company_name"] == "Example Corp"
+        assert info["translations"] == ["040904b0"]
+        assert info["fixed"]["file_version"] == "1.2.3.4"
+        assert len(meta["certificates"]) == 1
+        cert = meta["certificates"][0]
+        assert cert["data"] == b"\x30\x03\x02\x01\x01" and cert["type"] == 2 and cert["revision"] == 0x200
+        assert meta["certificate_table"] == (cert["offset"], 16)
+    print("✓ 版本资源和证书表读取测试通过")
+
+
+def test_matches_pefile():
+    """与 pefile 的解析结果对照"""
+    try:
+        import pefile
+    except ImportError:
+        print("⚠ 未安装 pefile，跳过对照测试")
+        return
+    data = build_pe(STRINGS, certificate=b"\x30\x00")
+    path = write_temp(data)
+    meta = pe_metadata.extract_pe_metadata(path)
+    pe = pefile.PE(path)
+    try:
+        security = pe.OPTIONAL_HEADER.DATA_DIRECTORY[4]
+        assert meta["certificate_table"] == (security.VirtualAddress, security.Size)
+        assert meta["checksum_offset"] == pe.OPTIONAL_HEADER.get_field_absolute_offset("CheckSum")
+        assert meta["security_dir_offset"] == security.get_field_absolute_offset("VirtualAddress")
+        strings = {}
+        for file_info in pe.FileInfo[0]:
+            if file_info.Key == b"StringFileInfo":
+                for table in file_info.StringTable:
+                    strings.update({k.decode(): v.decode() for k, v in table.entries.items()})
+        assert strings == meta["version_info"]["strings"]
+    finally:
+        pe.close()
+    print("✓ 与 pefile 对照测试通过")
+
+
+def test_no_resources_or_signature():
+    """测试没有版本资源和签名的文件"""
+    meta = pe_metadata.parse_pe(build_pe())
+    assert meta["version_info"] == {}
+    assert meta["certificates"] == [] and meta["certificate_table"] is None
+    print("✓ 无版本资源和签名测试通过")
+
+
+def test_rejects_non_pe():
+    """测试非PE文件和截断文件"""
+    broken = [
+        lambda: pe_metadata.parse_pe(b"not a pe file" * 10),
+        lambda: pe_metadata.parse_pe(build_pe(STRINGS)[:0x90]),
+        lambda: pe_metadata.extract_pe_metadata(write_temp(b"")),
+    ]
+    for parse in broken:
+        try:
+            parse()
+        except pe_metadata.PEFormatError:
+            continue
+        raise AssertionError("应当抛出 PEFormatError")
+    print("✓ 非PE和截断文件测试通过")
+
+
+if __name__ == "__main__":
+    test_version_info_and_certificate()
+    test_matches_pefile()
+    test_no_resources_or_signature()
+    test_rejects_non_pe()
+    print("\n=== 所有测试完成 ===")
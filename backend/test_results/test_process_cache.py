@@ -0,0 +1,73 @@
+import sys
+import os
+import subprocess
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from process_cache import ProcessCache
+
+
+class ReusedProcess:
+    """模拟 PID 已被新进程复用：旧的 psutil.Process 不再存活"""
+
+    def is_running(self):
+        return False
+
+
+def test_get_caches_and_validates():
+    """测试同一进程只加载一次，之后只做存活检查"""
+    cache = ProcessCache()
+    info = cache.get(os.getpid())
+    assert info["pid"] == os.getpid() and info["name"]
+    assert info["key"] == (os.getpid(), info["create_time"])
+    assert cache.get(os.getpid()) is info
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+    assert cache.key(os.getpid()) == info["key"]
+    print("✓ 进程信息缓存与存活检查测试通过")
+
+
+def test_exit_and_pid_reuse_notify_listeners():
+    """测试进程退出和 PID 复用时不返回旧信息，并通知订阅者"""
+    cache = ProcessCache()
+    gone = []
+    cache.on_exit(gone.append)
+
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        info = cache.get(child.pid)
+        assert info is not None
+    finally:
+        child.kill()
+        child.wait()
+    assert cache.get(child.pid) is None
+    assert gone == [info["key"]] and cache.stats["exited"] == 1
+    assert cache.key(child.pid) is None
+
+    # 旧进程对象失效后重新加载，得到新的 key
+    own = cache.get(os.getpid())
+    cache._entries[os.getpid()] = (ReusedProcess(), dict(own, key=(os.getpid(), 0.0)))
+    assert cache.get(os.getpid())["key"] == own["key"]
+    assert gone[-1] == (os.getpid(), 0.0)
+    print("✓ 进程退出与 PID 复用测试通过")
+
+
+def test_lru_eviction_and_prune():
+    """测试超过上限时淘汰最久未用的进程，prune 清理已退出的进程"""
+    cache = ProcessCache(maxsize=1)
+    evicted = []
+    cache.on_exit(evicted.append)
+    own = cache.get(os.getpid())
+    parent = cache.get(os.getppid())
+    assert len(cache) == 1 and evicted == [own["key"]]
+    assert cache.stats["evicted"] == 1
+
+    cache._entries[os.getppid()] = (ReusedProcess(), parent)
+    assert cache.prune() == 1 and len(cache) == 0
+    assert evicted[-1] == parent["key"]
+    print("✓ LRU 淘汰与清理测试通过")
+
+
+if __name__ == "__main__":
+    test_get_caches_and_validates()
+    test_exit_and_pid_reuse_notify_listeners()
+    test_lru_eviction_and_prune()
+    print("\n=== 所有测试完成 ===")
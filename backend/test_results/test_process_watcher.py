@@ -0,0 +1,149 @@
+import sys
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil
+
+from process_watcher import ProcessWatcher
+from rule_matcher import RuleMatcher
+
+
+class CountingMatcher(RuleMatcher):
+    """记录 classify 调用次数的匹配器"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+    def classify(self, exe_name, title=None):
+        self.calls += 1
+        return super().classify(exe_name, title)
+
+
+def spawn(name):
+    """以指定程序名启动一个休眠进程（复制 sleep 可执行文件改名）"""
+    path = os.path.join(tempfile.mkdtemp(), name)
+    shutil.copy(shutil.which("sleep"), path)
+    proc = subprocess.Popen([path, "30"])
+    time.sleep(0.1)
+    return proc
+
+
+def test_only_new_processes_are_inspected():
+    """测试只读取新增进程，并维护进程名索引"""
+    matcher = RuleMatcher()
+    watcher = ProcessWatcher(lambda: matcher)
+    first = watcher.poll()
+    assert os.getpid() in first["started"] and first["killed"] == []
+    misses = watcher.processes.stats["misses"]
+
+    proc = spawn("idlegame")
+    try:
+        result = watcher.poll()
+        assert proc.pid in result["started"]
+        assert watcher.processes.stats["misses"] - misses <= len(result["started"])
+        assert watcher.pids_by_name("IdleGame") == [proc.pid]
+    finally:
+        proc.kill()
+        proc.wait()
+    assert proc.pid in watcher.poll()["exited"]
+    assert watcher.pids_by_name("idlegame") == []
+    print("✓ 只读取新增进程测试通过")
+
+
+def test_blacklisted_process_tree_killed_on_launch():
+    """测试黑名单程序启动时结束其进程树，其他进程不受影响"""
+    matcher = RuleMatcher(blacklist=[("badgame*", "")])
+    killed = []
+    watcher = ProcessWatcher(lambda: matcher, on_kill=lambda name, pids: killed.append((name, pids)))
+    watcher.poll()
+
+    bystander = spawn("goodtool")
+    parent = subprocess.Popen(["/bin/sh", "-c", "sleep 30 & wait"])
+    time.sleep(0.1)
+    children = psutil.Process(parent.pid).children()
+    try:
+        # 模拟黑名单进程名：只把 shell 父进程登记为 badgame
+        watcher.poll()
+        _, create_time = watcher._known[parent.pid]
+        watcher._known[parent.pid] = ("badgame.exe", create_time)
+        watcher._by_name.setdefault("badgame.exe", {})[parent.pid] = create_time
+
+        result = watcher.kill_matching("badgame.exe")
+        assert parent.pid in result and all(c.pid in result for c in children)
+        assert parent.wait(timeout=5) is not None
+        assert bystander.poll() is None
+        assert killed and killed[0][0] == "badgame.exe"
+
+        launched = spawn("badgame")
+        assert launched.pid in watcher.poll()["killed"]
+        assert launched.wait(timeout=5) is not None
+    finally:
+        for proc in (bystander, parent):
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+    print("✓ 黑名单进程树启动即结束测试通过")
+
+
+def test_rule_change_rechecks_running_processes():
+    """测试规则变化后对已运行的进程重新判断"""
+    rules = {"matcher": RuleMatcher()}
+    watcher = ProcessWatcher(lambda: rules["matcher"])
+    proc = spawn("latergame")
+    try:
+        watcher.poll()
+        assert proc.poll() is None
+        rules["matcher"] = RuleMatcher(blacklist=[("latergame", "")])
+        assert proc.pid in watcher.poll()["killed"]
+        assert proc.wait(timeout=5) is not None
+
+        # 保存其他设置会重建匹配器；程序名规则没变时不重新判断已运行的进程
+        rules["matcher"] = CountingMatcher(blacklist=[("latergame", "")], whitelist=[("", "某个标题")])
+        result = watcher.poll()
+        assert rules["matcher"].calls <= len(result["started"]) < len(watcher)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    print("✓ 规则变化后重新判断测试通过")
+
+
+def test_request_kill_runs_on_watcher_thread():
+    """测试结束请求由监视线程执行，调用方立即返回，只结束指定进程，同名进程不受影响"""
+    matcher = RuleMatcher()
+    watcher = ProcessWatcher(lambda: matcher, interval=30)
+    proc = spawn("titlegame")
+    sibling = spawn("titlegame")
+    try:
+        watcher.start()
+        start = time.monotonic()
+        watcher.request_kill(proc.pid, psutil.Process(proc.pid).create_time(), "titlegame")
+        assert time.monotonic() - start < 0.1
+        assert proc.wait(timeout=5) is not None
+        assert watcher.stats["killed"] == 1
+        assert sibling.poll() is None
+
+        # PID 被复用（创建时间不同）时不结束
+        watcher.stop()
+        watcher.request_kill(sibling.pid, 0.0, "titlegame")
+        assert sibling.poll() is None
+    finally:
+        watcher.stop()
+        for p in (proc, sibling):
+            if p.poll() is None:
+                p.kill()
+                p.wait()
+    print("✓ 结束请求只结束指定进程测试通过")
+
+
+if __name__ == "__main__":
+    test_only_new_processes_are_inspected()
+    test_blacklisted_process_tree_killed_on_launch()
+    test_rule_change_rechecks_running_processes()
+    test_request_kill_runs_on_watcher_thread()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,57 @@
+import sys
+import os
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+import db_utils
+import rollup
+
+def ts(*args):
+    return int(datetime(*args).timestamp())
+
+def test_split_by_day():
+    """测试跨零点的会话被拆到两天"""
+    parts = rollup.split_by_day(ts(2024, 3, 1, 23, 50), ts(2024, 3, 2, 0, 10))
+    assert parts == [("2024-03-01", 600), ("2024-03-02", 600)]
+    assert rollup.split_by_day(ts(2024, 3, 1, 10), ts(2024, 3, 1, 11)) == [("2024-03-01", 3600)]
+    assert rollup.split_by_day(ts(2024, 3, 1, 10), ts(2024, 3, 1, 10)) == []
+    print("✓ 按天拆分测试通过")
+
+def test_incremental_matches_rebuild():
+    """测试增量维护的汇总与全量重建结果一致"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    rows = [
+        db_utils._usage_row("a.exe", "A", 1200, "A", "文件名", end_ts=ts(2024, 3, 2, 0, 10)),
+        db_utils._usage_row("a.exe", "A", 300, "A", "文件名", end_ts=ts(2024, 3, 2, 9, 0)),
+        db_utils._usage_row("b.exe", "B", 60, "B", "文件名", end_ts=ts(2024, 3, 2, 9, 5)),
+        db_utils._usage_row("System", "挂机结束 - a.exe", 500, None, None, end_ts=ts(2024, 3, 2, 9, 10)),
+        db_utils._usage_row("b.exe", "B", 0, "B", "文件名", end_ts=ts(2024, 3, 2, 9, 20)),
+    ]
+    db_utils._insert_usage_rows(rows)
+
+    conn = db_pool.get_read_connection()
+    query = "SELECT unique_id, day, seconds, sessions FROM app_daily_usage ORDER BY unique_id, day"
+    incremental = [tuple(r) for r in conn.execute(query)]
+    assert incremental == [
+        ("A", "2024-03-01", 600, 1),
+        ("A", "2024-03-02", 900, 2),
+        ("B", "2024-03-02", 60, 1),
+    ], incremental
+
+    meta_query = "SELECT unique_id, exe_name, app_name, identifier_type, last_ts FROM app_usage_meta ORDER BY unique_id"
+    meta = [tuple(r) for r in conn.execute(meta_query)]
+    assert [m[0] for m in meta] == ["A", "B"]
+
+    rollup.rebuild_daily_usage()
+    assert [tuple(r) for r in conn.execute(query)] == incremental
+    assert [tuple(r) for r in conn.execute(meta_query)] == meta
+    assert db_utils.get_usage_totals("2024-03-02", "2024-03-02") == {"seconds": 960, "sessions": 3, "apps": 2}
+    print("✓ 增量汇总与重建一致")
+
+if __name__ == "__main__":
+    test_split_by_day()
+    test_incremental_matches_rebuild()
+    print("\n=== 所有测试完成 ===")
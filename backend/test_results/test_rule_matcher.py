@@ -0,0 +1,75 @@
+import sys
+import os
+import re
+import random
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rule_matcher import wildcard_match, PatternSet, RuleMatcher, build_matcher
+
+def naive_match(pattern, text):
+    """逐条匹配的参考实现"""
+    if not pattern or not text:
+        return False
+    regex = '^' + re.escape(pattern).replace(r'\*', '.*').replace(r'\?', '.') + '$'
+    return bool(re.search(regex, text, re.IGNORECASE))
+
+def test_wildcard_match():
+    """测试通配符匹配（含 monitor.py 旧实现中失效的 *）"""
+    assert wildcard_match("notepad.exe", "Notepad.exe")
+    assert not wildcard_match("notepad.exe", "notepad.exe.backup")
+    assert wildcard_match("*.exe", "calc.exe")
+    assert wildcard_match("C:\\Program Files\\*", "C:\\Program Files\\Google\\Chrome\\chrome.exe")
+    assert not wildcard_match("C:\\Program Files\\*", "C:\\Windows\\notepad.exe")
+    assert wildcard_match("game?.exe", "game1.exe") and not wildcard_match("game?.exe", "game12.exe")
+    assert not wildcard_match("", "a") and not wildcard_match("a", "")
+    print("✓ 通配符匹配测试通过")
+
+def test_pattern_set_equivalent():
+    """测试编译后的模式集合与逐条匹配结果一致"""
+    rng = random.Random(1)
+    alphabet = "ab.*?"
+    for _ in range(300):
+        patterns = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 5))) for _ in range(rng.randint(1, 6))]
+        compiled = PatternSet(patterns)
+        for _ in range(20):
+            text = "".join(rng.choice("abAB.") for _ in range(rng.randint(0, 6)))
+            expected = any(naive_match(p, text) for p in patterns)
+            assert compiled.matches(text) == expected, (patterns, text)
+    print("✓ 编译匹配等价测试通过")
+
+def test_whitelist_precedence():
+    """测试白名单优先于黑名单"""
+    matcher = build_matcher({
+        "blacklist": [{"exe_name": "*.exe", "app_name": ""}, {"exe_name": "", "app_name": "C:\\Games\\*"}],
+        "whitelist": [{"exe_name": "浏览器.exe", "app_name": ""}, {"exe_name": "", "app_name": "*\\notepad.exe"}],
+    })
+    assert matcher.classify("游戏.exe", "C:\\Games\\game.exe") == "blacklist"
+    assert matcher.classify("浏览器.exe", "C:\\Program Files\\Browser\\browser.exe") == "whitelist"
+    assert matcher.classify("记事本.exe", "C:\\Windows\\System32\\notepad.exe") == "whitelist"
+    assert matcher.classify("readme.txt", "D:\\docs") == "neutral"
+    # 只有标识符时不看标题模式
+    assert matcher.classify("C:\\Games\\x") == "neutral"
+    # 未设置 app_name 时用程序模式匹配标题（与 get_blacklist 旧逻辑一致）
+    assert build_matcher({"blacklist": [{"exe_name": "steam*"}]}).classify("x.exe", "Steam") == "blacklist"
+    print("✓ 白名单优先测试通过")
+
+def test_many_rules_fast():
+    """测试数千条规则时单次匹配仍然很快"""
+    blacklist = [(f"game{i}.exe", "") for i in range(3000)] + [(f"C:\\Games{i}\\*", "") for i in range(1000)]
+    matcher = RuleMatcher(blacklist, [("code.exe", "")])
+    start = time.perf_counter()
+    for _ in range(1000):
+        assert matcher.classify("game2999.exe", "title") == "blacklist"
+        assert matcher.classify("chrome.exe", "title") == "neutral"
+    elapsed = time.perf_counter() - start
+    print(f"  2000 次匹配（4000条规则）耗时 {elapsed * 1000:.1f} ms")
+    assert elapsed < 2.0
+    print("✓ 大量规则性能测试通过")
+
+if __name__ == "__main__":
+    test_wildcard_match()
+    test_pattern_set_equivalent()
+    test_whitelist_precedence()
+    test_many_rules_fast()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,156 @@
+import sys
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sampling_scheduler
+from sampling_scheduler import AdaptiveScheduler
+
+
+def test_backoff_and_activity():
+    """测试稳定时逐步放慢采样，挂机放宽上限，有活动时回到最短间隔"""
+    s = AdaptiveScheduler(min_interval=0.5, max_interval=4.0, idle_interval=16.0, backoff=2.0)
+    intervals = []
+    for _ in range(5):
+        s.stable()
+        intervals.append(s.interval)
+    assert intervals == [1.0, 2.0, 4.0, 4.0, 4.0]
+    assert s.stats["max_interval_reached"] == 3
+
+    # 挂机时上限放宽
+    s.set_idle(True)
+    s.stable()
+    s.stable()
+    assert s.interval == 16.0
+
+    # 退出挂机回到最短间隔
+    s.set_idle(False)
+    assert s.interval == 0.5
+    s.stable()
+    s.activity()
+    assert s.interval == 0.5
+    print("✓ 退避与活动恢复测试通过")
+
+
+def test_deadline_fires_on_time():
+    """测试定时任务按时触发，取消后不再触发"""
+    s = AdaptiveScheduler(min_interval=5.0, max_interval=5.0)
+    s.wait()  # 首次采样立即返回
+    s.stable()
+    fired = []
+    start = time.monotonic()
+    s.add_deadline(lambda: fired.append(time.monotonic()), delay=0.05, name="end")
+    assert s.wait() == "deadline"
+    assert fired and fired[0] - start < 0.5
+    assert s.get_stats()["deadline_lateness"] < 0.5
+
+    # 用 datetime 指定时刻，取消后不触发
+    handle = s.add_deadline(lambda: fired.append(0), at=datetime.now() + timedelta(seconds=0.05))
+    s.cancel(handle)
+    assert s.next_deadline() is None
+    s.wake()
+    assert s.wait() == "wake"
+    assert len(fired) == 1
+    print("✓ 定时任务按时触发测试通过")
+
+
+def test_wake_from_other_thread():
+    """测试其他线程调用 wake() 立即结束等待"""
+    s = AdaptiveScheduler(min_interval=10.0, max_interval=10.0)
+    s.wait()
+    s.stable()
+    timer = threading.Timer(0.05, s.wake)
+    timer.start()
+    start = time.monotonic()
+    assert s.wait() == "wake"
+    assert time.monotonic() - start < 1.0
+    assert s.get_stats()["wakes"] == 1
+    print("✓ 跨线程唤醒测试通过")
+
+
+def test_probe_wakes_immediately_when_idle():
+    """测试挂机时检测到输入立即唤醒并回到最短间隔"""
+    ticks = [0]
+    s = AdaptiveScheduler(min_interval=0.5, max_interval=10.0, idle_interval=30.0,
+                          probe=lambda: ticks[0], probe_interval=0.01)
+    s.wait()
+    s.set_idle(True)
+    s.stable()
+    threading.Timer(0.05, lambda: ticks.__setitem__(0, 1)).start()
+    start = time.monotonic()
+    assert s.wait() == "probe"
+    assert time.monotonic() - start < 1.0
+    assert s.interval == 0.5
+    assert s.get_stats()["probe_wakes"] == 1
+    print("✓ 挂机时输入立即唤醒测试通过")
+
+
+def test_input_caps_interval_when_active():
+    """测试持续有输入时采样间隔不超过 input_interval"""
+    ticks = [0]
+
+    def probe():
+        ticks[0] += 1  # 每次检查都有新输入
+        return ticks[0]
+
+    s = AdaptiveScheduler(min_interval=0.01, max_interval=10.0, probe=probe, probe_interval=0.01, input_interval=0.05)
+    s.wait()
+    s.interval = 10.0
+    s.stable()
+    start = time.monotonic()
+    assert s.wait() == "sample"
+    assert time.monotonic() - start < 1.0
+    assert s.interval <= 0.05
+    assert s.get_stats()["input_nudges"] >= 1
+    print("✓ 有输入时限制采样间隔测试通过")
+
+
+def test_probe_cuts_long_idle_sleep_short():
+    """测试挂机时的长间隔（奖励监控循环的配置）在有输入时立即结束"""
+    ticks = [0]
+    s = AdaptiveScheduler.from_settings({"sampling": {"probe_interval": 0.01}}, probe=lambda: ticks[0],
+                                        min_interval=1.0, max_interval=30.0, idle_interval=60.0)
+    s.wait()
+    s.set_idle(True)
+    for _ in range(10):
+        s.stable()
+    assert s.interval == 60.0
+    threading.Timer(0.05, lambda: ticks.__setitem__(0, 1)).start()
+    start = time.monotonic()
+    assert s.wait() == "probe"
+    assert time.monotonic() - start < 1.0
+    print("✓ 挂机长间隔被输入打断测试通过")
+
+
+def test_from_settings_and_stats():
+    """测试从设置读取参数（覆盖调用方默认值）和统计信息"""
+    s = AdaptiveScheduler.from_settings({"sampling": {"min_interval": "0.1", "max_interval": 2, "unknown": 1}},
+                                        name="unit")
+    assert s.min_interval == 0.1 and s.max_interval == 2.0
+    assert AdaptiveScheduler.from_settings(None).min_interval == sampling_scheduler.MIN_INTERVAL
+    # 调用方给的默认值会被设置覆盖
+    s2 = AdaptiveScheduler.from_settings({"sampling": {"max_interval": 8}}, max_interval=30.0, min_interval=1.0)
+    assert s2.max_interval == 8.0 and s2.min_interval == 1.0
+
+    sampling_scheduler.register(s)
+    s.wait()
+    s.activity()
+    s.wait()
+    stats = sampling_scheduler.get_stats()["unit"]
+    assert stats["samples"] == 1
+    assert stats["cpu_seconds"] >= 0
+    assert stats["name"] == "unit"
+    print("✓ 从设置创建与统计测试通过")
+
+
+if __name__ == "__main__":
+    test_backoff_and_activity()
+    test_deadline_fires_on_time()
+    test_wake_from_other_thread()
+    test_probe_wakes_immediately_when_idle()
+    test_input_caps_interval_when_active()
+    test_probe_cuts_long_idle_sleep_short()
+    test_from_settings_and_stats()
+    print("\n=== 所有测试完成 ===")
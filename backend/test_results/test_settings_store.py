@@ -0,0 +1,69 @@
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+import db_utils
+from settings_store import SettingsStore
+
+def test_reads_are_cached():
+    """测试重复读取不访问数据源"""
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return json.dumps({"blacklist": []})
+
+    store = SettingsStore(loader, refresh_interval=60)
+    for _ in range(100):
+        store.current()
+    assert len(calls) == 1 and store.version == 1
+    print("✓ 读取缓存测试通过")
+
+def test_version_and_subscribers():
+    """测试变更递增版本并通知订阅者，派生结构只在变更时重建"""
+    store = SettingsStore(lambda: json.dumps({"blacklist": ["a"]}), refresh_interval=60)
+    seen = []
+    store.subscribe(lambda version, data: seen.append((version, data["blacklist"])))
+    builds = []
+    rules = store.derive(lambda s: builds.append(1) or tuple(s["blacklist"]))
+
+    assert rules() == ("a",) and rules() == ("a",)
+    assert store.update({"blacklist": ["a"]}) == 1  # 内容未变，不递增
+    assert store.update({"blacklist": ["b"]}) == 2
+    assert rules() == ("b",)
+    assert len(builds) == 2
+    assert seen == [(1, ["a"]), (2, ["b"])]
+    print("✓ 版本与订阅测试通过")
+
+def test_get_returns_copy():
+    """测试 get 返回的副本被修改不会影响缓存"""
+    store = SettingsStore(lambda: json.dumps({"blacklist": ["a"]}), refresh_interval=60)
+    data = store.get()
+    data["blacklist"].append("b")
+    assert store.current()[1]["blacklist"] == ["a"]
+    print("✓ 副本隔离测试通过")
+
+def test_external_write_detected():
+    """测试其他连接写入的设置在刷新间隔后可见"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    version = db_utils.save_settings({"blacklist": [{"exe_name": "game.exe"}]})
+    assert db_utils.get_blacklist() == [("game.exe", "game.exe")]
+    assert db_utils.settings_store.version == version
+
+    with db_pool.write_transaction() as conn:
+        conn.execute("UPDATE settings SET data = ? WHERE id = 1", (json.dumps({"blacklist": []}),))
+    db_utils.settings_store.invalidate()  # 模拟刷新间隔已到
+    assert db_utils.get_blacklist() == []
+    assert db_utils.settings_store.version == version + 1
+    print("✓ 外部写入检测测试通过")
+
+if __name__ == "__main__":
+    test_reads_are_cached()
+    test_version_and_subscribers()
+    test_get_returns_copy()
+    test_external_write_detected()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,83 @@
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from title_extractor import best_window, extract_app_title
+
+
+def reference_extract(exe_name, window_title):
+    """原实现（逐个窗口逐字比较），用于对照"""
+    exe_base_name = exe_name.replace('.exe', '').replace('.EXE', '')
+    if exe_base_name.lower() in window_title.lower():
+        start_idx = window_title.lower().find(exe_base_name.lower())
+        return window_title[start_idx:start_idx + len(exe_base_name)].capitalize()
+    if len(exe_base_name) > 0:
+        best_match = exe_base_name
+        best_score = 0
+        for i in range(len(window_title) - len(exe_base_name) + 1):
+            substring = window_title[i:i + len(exe_base_name)]
+            score = sum(1 for a, b in zip(exe_base_name.lower(), substring.lower()) if a == b)
+            if score > best_score:
+                best_score = score
+                best_match = substring
+        if best_score >= len(exe_base_name) * 0.5:
+            return best_match.capitalize()
+    if " - " in window_title:
+        return window_title.split(" - ")[-1]
+    return exe_base_name.capitalize()
+
+
+CASES = [
+    ("Trae CN.exe", "预览 - 无标题 (工作区) - Trae CN"),
+    ("traea.exe", "预览 - 无标题 (工作区) - Traeasd CN"),
+    ("trae.exe", "预览 - 无标题 (工作区) - abc"),
+    ("trae.exe", "预览 无标题 (工作区)"),
+    ("chrome.exe", "GitHub - Google Chrome"),
+    ("msedge.exe", "新标签页 - 个人 - Microsoft​ Edge"),
+    ("Code.exe", "main.py - Time-Tracker - Visual Studio Code"),
+    ("notepad.exe", "无标题 - 记事本"),
+    ("x.exe", ""),
+    (".exe", "anything"),
+]
+
+
+def test_matches_original_rules():
+    """测试提取结果与原实现一致"""
+    for exe, title in CASES:
+        assert extract_app_title(exe, title) == reference_extract(exe, title), (exe, title)
+
+    rng = random.Random(3)
+    for _ in range(500):
+        exe = "".join(rng.choice("abcAB") for _ in range(rng.randint(1, 6))) + ".exe"
+        title = "".join(rng.choice("abcdAB -") for _ in range(rng.randint(0, 40)))
+        assert extract_app_title(exe, title) == reference_extract(exe, title), (exe, title)
+    print("✓ 提取结果与原实现一致测试通过")
+
+
+def test_best_window():
+    """测试相似窗口取相同字符最多且最靠前的位置"""
+    assert best_window("abc", "xxabxabc") == (5, 3)
+    assert best_window("abc", "abxabx") == (0, 2)
+    assert best_window("abc", "xyz") == (-1, 0)
+    assert best_window("abcd", "abc") == (-1, 0)
+    print("✓ 相似窗口位置测试通过")
+
+
+def test_repeated_titles_hit_cache():
+    """测试重复的 (程序名, 标题) 直接命中缓存"""
+    store = extract_app_title.cache
+    title = "repeated - Some Window"
+    extract_app_title("cache-test.exe", title)
+    hits = store.hits
+    for _ in range(10):
+        extract_app_title("cache-test.exe", title)
+    assert store.hits == hits + 10
+    print("✓ 重复标题命中缓存测试通过")
+
+
+if __name__ == "__main__":
+    test_matches_original_rules()
+    test_best_window()
+    test_repeated_titles_hit_cache()
+    print("\n=== 所有测试完成 ===")
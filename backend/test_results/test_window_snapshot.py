@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from window_snapshot import Rect, Window, WindowSnapshot, SnapshotProvider
+from enhanced_monitor import EnhancedMonitor
+
+SCREEN = Rect(0, 0, 1000, 1000)
+
+
+class FakeSource:
+    """构造的窗口布局（z-order 从上到下），记录枚举次数"""
+
+    def __init__(self, windows, foreground=None):
+        self._windows = windows
+        self._foreground = foreground
+        self.enumerations = 0
+
+    def windows(self):
+        self.enumerations += 1
+        return list(self._windows)
+
+    def foreground(self):
+        return self._foreground
+
+    def monitors(self):
+        return [SCREEN]
+
+
+def test_visible_area_with_occlusion():
+    """测试上方窗口遮挡、不可见窗口和屏幕裁剪"""
+    snapshot = WindowSnapshot([
+        Window(1, 10, True, Rect(0, 0, 500, 1000)),       # 遮住目标左半部分
+        Window(2, 11, False, Rect(0, 0, 1000, 1000)),     # 不可见，不遮挡
+        Window(3, 12, True, Rect(0, 0, 1000, 1000)),      # 目标
+        Window(4, 13, True, Rect(500, 500, 1500, 1500)),  # 一半在屏幕外
+    ], foreground=1, monitors=[SCREEN])
+
+    assert snapshot.foreground_pid == 10
+    assert snapshot.visible_area(3) == 500 * 1000
+    assert snapshot.visible_ratio(3) == 0.5
+    assert snapshot.visible_area(2) == 0
+    assert snapshot.screen_area(4) == 500 * 500
+    # 窗口 4 被上方的 1 和 3 完全遮住
+    assert snapshot.visible_area(4) == 0
+    assert snapshot.hwnds_for_pid(12) == [3]
+    assert snapshot.visible_area(999) == 0
+    print("✓ 遮挡、不可见窗口与屏幕裁剪测试通过")
+
+
+def test_monitors_share_one_snapshot_per_tick():
+    """测试同一周期内多个监控器只枚举一次窗口"""
+    windows = [Window(hwnd, 1000 + hwnd % 50, True, Rect(hwnd % 40 * 20, hwnd % 30 * 20, hwnd % 40 * 20 + 300, hwnd % 30 * 20 + 200))
+               for hwnd in range(1, 321)]
+    windows.append(Window(999, 7, True, Rect(0, 900, 1000, 1000)))  # 底部未被遮挡的窗口
+    source = FakeSource(windows, foreground=1)
+    provider = SnapshotProvider(source, max_age=60)
+    monitors = [EnhancedMonitor(pid, v_thresh=0.3, snapshots=provider) for pid in (1001, 7, 5)]
+
+    results = [m.should_count_once() for m in monitors]
+    assert results == [True, True, False]
+    assert source.enumerations == 1
+    assert provider.stats == {"captures": 1, "reuses": 2}
+
+    provider.capture()
+    assert source.enumerations == 2
+    print("✓ 多个监控器共用窗口快照测试通过")
+
+
+if __name__ == "__main__":
+    test_visible_area_with_occlusion()
+    test_monitors_share_one_snapshot_per_tick()
+    print("\n=== 所有测试完成 ===")
@@ -0,0 +1,98 @@
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+import db_utils
+import write_queue
+from write_queue import WriteBehindQueue
+
+def test_batch_by_size():
+    """测试达到批量大小时一次写盘"""
+    batches = []
+    q = WriteBehindQueue(batches.append, batch_size=10, flush_interval=60)
+    for i in range(10):
+        q.put(i)
+    for _ in range(100):
+        if batches:
+            break
+        time.sleep(0.01)
+    assert batches == [list(range(10))]
+    q.stop()
+    print("✓ 按数量写盘测试通过")
+
+def test_flush_on_stop():
+    """测试停止时写盘剩余数据"""
+    batches = []
+    q = WriteBehindQueue(batches.append, batch_size=100, flush_interval=60)
+    q.put("a")
+    q.put("b")
+    q.stop()
+    assert batches == [["a", "b"]]
+    print("✓ 停止时写盘测试通过")
+
+def test_retry_after_failure():
+    """测试写盘失败后保留数据"""
+    calls = []
+
+    def flaky(rows):
+        calls.append(list(rows))
+        if len(calls) == 1:
+            raise IOError("disk busy")
+
+    q = WriteBehindQueue(flaky, batch_size=100, flush_interval=60)
+    q.put(1)
+    assert q.flush() == 0
+    assert q.pending() == 1
+    assert q.flush() == 1
+    assert calls == [[1], [1]]
+    print("✓ 失败重试测试通过")
+
+def test_bounded_memory():
+    """测试积压时合并与丢弃"""
+    merge = lambda prev, row: prev + row if prev > 0 and row > 0 else None
+    q = WriteBehindQueue(lambda rows: None, batch_size=10 ** 6, flush_interval=60,
+                         soft_limit=3, hard_limit=5, merge_func=merge)
+    q._thread = object()  # 不启动后台线程
+    for v in [1, 1, 1, 1, 1]:
+        q.put(v)
+    assert q.pending() == 3 and q.stats["merged"] == 2
+    for v in [-1, -1, -1, -1]:
+        q.put(v)
+    assert q.pending() == 5 and q.stats["dropped"] == 2
+    print("✓ 内存上限测试通过")
+
+def test_log_usage_batched():
+    """测试 log_usage 通过队列写入数据库"""
+    db_pool.configure(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db_utils.init_db()
+    for i in range(5):
+        db_utils.log_usage("a.exe", f"A{i}", 1, "A", "文件名")
+    db_utils.log_usage("System", "挂机开始 - a.exe", 0)
+    db_utils.flush_usage()
+    logs = db_utils.get_recent_logs(10)
+    assert len(logs) == 6 and logs[0]["exe"] == "System"
+    print("✓ 使用记录批量写入测试通过")
+
+def test_stop_all_flushes_every_registered_queue():
+    """测试 stop_all 写盘所有已登记的队列（应用关闭时调用）"""
+    first, second = [], []
+    queues = [write_queue.register(WriteBehindQueue(first.extend, batch_size=100, flush_interval=60)),
+              write_queue.register(WriteBehindQueue(second.extend, batch_size=100, flush_interval=60))]
+    queues[0].put("usage")
+    queues[1].put("identity")
+    write_queue.stop_all()
+    assert first == ["usage"] and second == ["identity"]
+    assert all(q.pending() == 0 for q in queues)
+    print("✓ 统一停止测试通过")
+
+if __name__ == "__main__":
+    test_batch_by_size()
+    test_flush_on_stop()
+    test_retry_after_failure()
+    test_bounded_memory()
+    test_log_usage_batched()
+    test_stop_all_flushes_every_registered_queue()
+    print("\n=== 所有测试完成 ===")
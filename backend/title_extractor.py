@@ -0,0 +1,81 @@
+"""
+窗口标题提取
+每个监控周期和每次应用切换都会调用，同一 (程序名, 标题) 反复出现：
+结果按参数缓存，重复的标题只是一次字典查找；新标题的相似度扫描为线性时间
+"""
+
+from cache import cached
+
+TITLE_CACHE_SIZE = 2048   # 缓存的 (程序名, 标题) 组合数
+PARTIAL_MATCH_RATIO = 0.5  # 部分匹配时至少相同的字符比例
+
+
+def best_window(needle, haystack):
+    """
+    在 haystack 中找与 needle 等长、对应位置相同字符最多的窗口
+    返回 (起始位置, 相同字符数)，并列时取最靠前的；没有任何相同字符时返回 (-1, 0)
+
+    不逐个窗口逐字比较（O(n×m)）：先记下 needle 中每个字符出现的位置，
+    扫描 haystack 一遍，每个字符只给包含它的窗口加分，耗时与 haystack 长度加上相同字符对数成正比
+    （程序名中重复字符很少，实际为线性）
+    """
+    m = len(needle)
+    windows = len(haystack) - m + 1
+    if m == 0 or windows <= 0:
+        return -1, 0
+    positions = {}
+    for j, ch in enumerate(needle):
+        positions.setdefault(ch, []).append(j)
+    scores = [0] * windows
+    for k, ch in enumerate(haystack):
+        offsets = positions.get(ch)
+        if offsets is None:
+            continue
+        for j in offsets:
+            i = k - j
+            if 0 <= i < windows:
+                scores[i] += 1
+    best_score = max(scores)
+    if best_score == 0:
+        return -1, 0
+    return scores.index(best_score), best_score
+
+
+@cached(maxsize=TITLE_CACHE_SIZE, ttl=float("inf"))
+def extract_app_title(exe_name, window_title):
+    """
+    智能提取应用标题，按照指定规则处理
+    规则:
+    1. 窗口标题与程序名相同时，取相同部分并转为大写
+    2. 大小写选大写
+    3. 若只部分匹配，取最相似的部分
+    4. 若无相同，按优先级取标题：
+       - 最后一个"-"后的内容
+       - exe文件名
+    """
+    # 移除.exe扩展名
+    exe_base_name = exe_name.replace('.exe', '').replace('.EXE', '')
+    exe_lower = exe_base_name.lower()
+    title_lower = window_title.lower()
+
+    # 规则1: 窗口标题包含程序名（大小写不敏感），取相同部分，首字母大写
+    start_idx = title_lower.find(exe_lower)
+    if start_idx != -1:
+        return window_title[start_idx:start_idx + len(exe_base_name)].capitalize()
+
+    # 规则2: 若只部分匹配，取对应位置相同字符最多的子串
+    # 例如: 窗口标题"预览 - 无标题 (工作区) - Traeasd CN" 程序名"traea.exe" -> 返回"Traea"
+    # 大小写转换可能改变个别字符的长度，此时逐字符转换以保持位置对应
+    if len(title_lower) != len(window_title):
+        title_lower = "".join(ch.lower()[:1] for ch in window_title)
+    start_idx, score = best_window(exe_lower, title_lower)
+    if exe_base_name and score >= len(exe_base_name) * PARTIAL_MATCH_RATIO:
+        return window_title[start_idx:start_idx + len(exe_base_name)].capitalize()
+
+    # 规则3: 若无相同部分，按照优先顺序取标题
+    # 优先级1: 取最后一个"-"符号后的内容
+    if " - " in window_title:
+        return window_title.rsplit(" - ", 1)[-1]
+
+    # 优先级2: 取exe文件名（不包含扩展名）
+    return exe_base_name.capitalize()
@@ -0,0 +1,227 @@
+"""
+窗口快照
+每个检测周期只枚举一次顶层窗口（按 z-order 从上到下），同时取出所属进程、可见性和窗口矩形，
+同一周期内所有监控器的可见性计算都读这份快照，不再重复调用 EnumWindows/IsWindowVisible/GetWindowRect
+窗口数据源可以注入，非 Windows 环境下可以用构造的窗口布局测试
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from occlusion import Rect, visible_areas
+
+SNAPSHOT_MAX_AGE = 0.5  # 快照复用时间（秒），小于检测间隔，同一周期内共享
+# 桌面外壳窗口（壁纸、桌面图标层），铺满屏幕但不是用户在使用的应用
+SHELL_WINDOW_CLASSES = frozenset({"Progman", "WorkerW"})
+DWMWA_CLOAKED = 14
+
+Window = namedtuple("Window", "hwnd pid visible rect")
+
+
+# ------------------------------
+# 窗口数据源
+# ------------------------------
+class Win32WindowSource:
+    """
+    Windows 窗口数据源：一次 EnumWindows 回调中取出 pid、可见性和矩形
+    被 DWM 隐藏（cloaked：挂起的 UWP 应用、其他虚拟桌面上的窗口）的窗口和桌面外壳窗口按不可见处理，
+    既不遮挡其他窗口，也不会成为活动候选
+    """
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class RECT(ctypes.Structure):
+            _fields_ = [('left', wintypes.LONG),
+                        ('top', wintypes.LONG),
+                        ('right', wintypes.LONG),
+                        ('bottom', wintypes.LONG)]
+
+        self._ctypes = ctypes
+        self._wintypes = wintypes
+        self._RECT = RECT
+        self._user32 = ctypes.windll.user32
+        try:
+            self._dwmapi = ctypes.windll.dwmapi
+        except OSError:
+            self._dwmapi = None
+        self._enum_proc_type = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+
+    def windows(self):
+        """所有顶层窗口，按 z-order 从上到下"""
+        ctypes, user32 = self._ctypes, self._user32
+        result = []
+        pid = self._wintypes.DWORD()
+        r = self._RECT()
+
+        def enum_proc(hwnd, lparam):
+            user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+            visible = bool(user32.IsWindowVisible(hwnd)) and not self._hidden(hwnd)
+            rect = None
+            if user32.GetWindowRect(hwnd, ctypes.byref(r)):
+                rect = Rect(r.left, r.top, r.right, r.bottom)
+            result.append(Window(hwnd, pid.value, visible, rect))
+            return True
+
+        user32.EnumWindows(self._enum_proc_type(enum_proc), 0)
+        return result
+
+    def _hidden(self, hwnd):
+        """IsWindowVisible 为真但实际看不到、或不应参与计算的窗口：DWM 隐藏的窗口和桌面外壳窗口"""
+        ctypes = self._ctypes
+        class_name = ctypes.create_unicode_buffer(64)
+        if self._user32.GetClassNameW(hwnd, class_name, 64) and class_name.value in SHELL_WINDOW_CLASSES:
+            return True
+        if self._dwmapi is not None:
+            cloaked = self._wintypes.DWORD()
+            if self._dwmapi.DwmGetWindowAttribute(hwnd, DWMWA_CLOAKED, ctypes.byref(cloaked),
+                                                  ctypes.sizeof(cloaked)) == 0 and cloaked.value:
+                return True
+        return False
+
+    def foreground(self):
+        return self._user32.GetForegroundWindow() or None
+
+    def monitors(self):
+        """所有显示器的矩形区域（虚拟桌面坐标）"""
+        ctypes, wintypes = self._ctypes, self._wintypes
+        result = []
+
+        def monitor_proc(hmonitor, hdc, lprect, lparam):
+            r = lprect.contents
+            result.append(Rect(r.left, r.top, r.right, r.bottom))
+            return True
+
+        proc_type = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HMONITOR, wintypes.HDC,
+                                       ctypes.POINTER(self._RECT), wintypes.LPARAM)
+        if self._user32.EnumDisplayMonitors(None, None, proc_type(monitor_proc), 0) and result:
+            return result
+        # 枚举失败时退回主显示器
+        SM_CXSCREEN = 0
+        SM_CYSCREEN = 1
+        return [Rect(0, 0, self._user32.GetSystemMetrics(SM_CXSCREEN), self._user32.GetSystemMetrics(SM_CYSCREEN))]
+
+
+# ------------------------------
+# 快照
+# ------------------------------
+class WindowSnapshot:
+    """
+    某一时刻的顶层窗口列表（z-order 从上到下）和显示器布局
+    首次查询可见面积时由 occlusion 一次算出所有窗口的结果，之后都是查表
+    """
+
+    def __init__(self, windows, foreground=None, monitors=(), captured_at=None):
+        self.windows = list(windows)
+        self.monitors = list(monitors)
+        self.foreground = foreground
+        self.captured_at = time.monotonic() if captured_at is None else captured_at
+        self._by_hwnd = {}
+        self._order = {}
+        self._by_pid = {}
+        for i, window in enumerate(self.windows):
+            self._by_hwnd[window.hwnd] = window
+            self._order.setdefault(window.hwnd, i)
+            self._by_pid.setdefault(window.pid, []).append(window.hwnd)
+        self._areas = None
+
+    @classmethod
+    def capture(cls, source):
+        """从数据源取一次完整快照"""
+        return cls(source.windows(), source.foreground(), source.monitors())
+
+    @property
+    def foreground_pid(self):
+        window = self._by_hwnd.get(self.foreground)
+        return window.pid if window is not None else None
+
+    def pid_of(self, hwnd):
+        window = self._by_hwnd.get(hwnd)
+        return window.pid if window is not None else None
+
+    def hwnds_for_pid(self, pid):
+        """进程的所有顶层窗口句柄（z-order 从上到下）"""
+        return list(self._by_pid.get(pid, ()))
+
+    def windows_above(self, hwnd):
+        """在目标窗口之上的所有窗口（按 z-order）"""
+        return self.windows[:self._order.get(hwnd, 0)]
+
+    def _area(self, hwnd):
+        if self._areas is None:
+            visible, on_screen = visible_areas([w.rect for w in self.windows],
+                                               [w.visible for w in self.windows], self.monitors)
+            self._areas = list(zip(visible, on_screen))
+        i = self._order.get(hwnd)
+        return self._areas[i] if i is not None else (0, 0)
+
+    def screen_area(self, hwnd):
+        """窗口在显示器内的面积（不考虑遮挡和可见性）"""
+        return self._area(hwnd)[1]
+
+    def visible_area(self, hwnd):
+        """窗口的可见面积（扣除上方所有可见窗口的遮挡）"""
+        return self._area(hwnd)[0]
+
+    def visible_ratio(self, hwnd):
+        """可见面积占窗口（显示器内部分）面积的比例"""
+        visible, area = self._area(hwnd)
+        return visible / area if area > 0 else 0.0
+
+    def visible_pids(self, threshold):
+        """可见比例达到阈值的窗口所属进程 {pid: 最大可见比例}，只遍历一次窗口列表"""
+        result = {}
+        for window in self.windows:
+            if not window.visible:
+                continue
+            ratio = self.visible_ratio(window.hwnd)
+            if ratio >= threshold and ratio > result.get(window.pid, -1.0):
+                result[window.pid] = ratio
+        return result
+
+    def __len__(self):
+        return len(self.windows)
+
+
+class SnapshotProvider:
+    """按周期复用窗口快照：max_age 内的请求共用同一份快照"""
+
+    def __init__(self, source, max_age=SNAPSHOT_MAX_AGE):
+        self.source = source
+        self.max_age = max_age
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.stats = {"captures": 0, "reuses": 0}
+
+    def current(self):
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - snapshot.captured_at < self.max_age:
+                self.stats["reuses"] += 1
+                return snapshot
+            return self._capture()
+
+    def capture(self):
+        """强制重新获取快照"""
+        with self._lock:
+            return self._capture()
+
+    def _capture(self):
+        self._snapshot = WindowSnapshot.capture(self.source)
+        self.stats["captures"] += 1
+        return self._snapshot
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_snapshot_provider():
+    """进程内共享的窗口快照（Windows 窗口数据源）"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = SnapshotProvider(Win32WindowSource())
+        return _provider
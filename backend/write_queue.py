@@ -0,0 +1,146 @@
+import threading
+import time
+import atexit
+from collections import deque
+
+from logger import log_to_file
+
+# 默认批量参数
+BATCH_SIZE = 64           # 缓冲区达到该行数立即写盘
+FLUSH_INTERVAL = 2.0      # 最长缓冲时间（秒）
+SOFT_LIMIT = 1000         # 超过后开始合并相邻的相同记录
+HARD_LIMIT = 5000         # 超过后丢弃最旧的记录
+
+
+class WriteBehindQueue:
+    """
+    写后缓冲队列
+    生产者（监控线程）只把行放进内存队列，由后台线程按批次在一个事务中写入
+    - 行数达到 batch_size 或距上次写盘超过 flush_interval 时触发写盘
+    - 写盘失败时保留数据，下次重试
+    - 磁盘过慢导致积压时：超过 soft_limit 合并可合并的行，超过 hard_limit 丢弃最旧的行
+    - 进程退出前保证写盘
+    """
+
+    def __init__(self, flush_func, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 soft_limit=SOFT_LIMIT, hard_limit=HARD_LIMIT, merge_func=None, name="write-behind"):
+        """
+        Args:
+            flush_func: flush_func(rows)，在一个事务中写入一批行，失败时抛异常
+            merge_func: merge_func(prev, row)，能合并时返回合并后的行，否则返回 None
+        """
+        self.flush_func = flush_func
+        self.merge_func = merge_func
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.name = name
+        self._rows = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.stats = {"enqueued": 0, "flushed": 0, "batches": 0, "merged": 0, "dropped": 0, "errors": 0}
+
+    def start(self):
+        """启动后台写盘线程（重复调用无副作用）"""
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def put(self, row):
+        """放入一行，立即返回"""
+        with self._cond:
+            self.stats["enqueued"] += 1
+            if len(self._rows) >= self.soft_limit and self._rows and self.merge_func:
+                merged = self.merge_func(self._rows[-1], row)
+                if merged is not None:
+                    self._rows[-1] = merged
+                    self.stats["merged"] += 1
+                    return
+            if len(self._rows) >= self.hard_limit:
+                self._rows.popleft()
+                self.stats["dropped"] += 1
+            self._rows.append(row)
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify()
+        if self._thread is None:
+            self.start()
+
+    def pending(self):
+        """队列中尚未写盘的行数"""
+        with self._cond:
+            return len(self._rows)
+
+    def flush(self):
+        """把当前缓冲的所有行写盘，返回写入行数"""
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._rows)
+                self._rows.clear()
+            if not batch:
+                return 0
+            try:
+                self.flush_func(batch)
+            except Exception as e:
+                # 写盘失败：放回队首，等待下次重试
+                with self._cond:
+                    self._rows.extendleft(reversed(batch))
+                    while len(self._rows) > self.hard_limit:
+                        self._rows.popleft()
+                        self.stats["dropped"] += 1
+                    self.stats["errors"] += 1
+                log_to_file(f"批量写入失败，{len(batch)} 行等待重试: {str(e)}", "ERROR")
+                return 0
+            self.stats["flushed"] += len(batch)
+            self.stats["batches"] += 1
+            return len(batch)
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            with self._cond:
+                while not self._stopping and len(self._rows) < self.batch_size:
+                    remaining = self.flush_interval - (time.monotonic() - last_flush)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                stopping = self._stopping
+            self.flush()
+            last_flush = time.monotonic()
+            if stopping:
+                return
+
+    def stop(self, timeout=5.0):
+        """停止后台线程并写盘剩余数据"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # 线程超时或从未启动时，在调用方线程中补写
+        self.flush()
+
+
+_queues = []
+
+
+def register(queue):
+    """登记队列，进程退出时统一写盘"""
+    _queues.append(queue)
+    return queue
+
+
+@atexit.register
+def stop_all(timeout=5.0):
+    """停止所有已登记的队列并写盘（应用关闭时显式调用，atexit 只作兜底）"""
+    for queue in list(_queues):
+        try:
+            queue.stop(timeout)
+        except Exception as e:
+            log_to_file(f"写后队列停止失败: {queue.name} - {str(e)}", "ERROR")